@@ -0,0 +1,294 @@
+"""
+Control-loop latency and jitter benchmarks.
+
+Flies the main control loops against the simulated drone and measures,
+for each of them:
+
+    period      simulated time between two setpoints sent by the loop
+    jitter      standard deviation of that period
+    latency     wall-clock time from a sensor packet arriving to the
+                setpoint it caused, i.e. the time spent deciding
+    setpoint    setpoints sent by the loop per simulated second
+
+Period, jitter and rate come from the simulated clock, so they only change
+when the loop's behavior does. Latency is measured on the real clock and
+is what a slower controller, map or planner shows up in.
+
+Results are written as JSON next to this file and compared against the
+baseline committed with it, benchmark_baseline.json. A metric that got
+worse by more than its tolerance in METRICS (and by more than its absolute
+slack) is reported as a regression and the exit code is 1, as it is when
+the baseline, or a loop in it, is missing. The latencies are wall-clock
+times of the machine the baseline was stored on; re-store it on a much
+slower or faster one.
+
+Usage:
+    python benchmark_loops.py [loop ...]            run and compare against the baseline
+    python benchmark_loops.py baseline [loop ...]   run and store the results as the baseline
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import sim_drone
+from sim_drone import World
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = os.path.join(HERE, 'benchmark_results.json')
+BASELINE_PATH = os.path.join(HERE, 'benchmark_baseline.json')
+REPEATS = 5                 # Runs per loop, the median of each metric is kept
+SEED = 4331                 # Seeds the sensor noise, packet phases and the random module
+PUSH_AWAY_TIME = 20.0       # Seconds of simulated push-away flight
+RACE_TIME = 20.0            # Seconds of simulated race
+
+# Whether a higher value is better, the relative change beyond which it counts as a
+# regression and the absolute change that is always ignored. Metrics on the simulated
+# clock are deterministic, the wall-clock latencies vary by up to 70% between runs on a
+# busy machine, so only a doubling of them counts.
+METRICS = {
+    'period_ms': (False, 0.05, 1.0),
+    'period_p99_ms': (False, 0.05, 2.0),
+    'jitter_ms': (False, 0.2, 1.0),
+    'latency_p50_us': (False, 1.0, 20.0),
+    'latency_p99_us': (False, 1.0, 50.0),
+    'latency_max_us': (False, 2.0, 500.0),
+    'setpoint_rate_hz': (True, 0.05, 0.5),
+}
+
+Metrics = Dict[str, float]
+
+
+class LoopProbe:
+    """
+    Records every setpoint a loop sends from inside a sensor callback.
+
+    While active, the simulated LogConfig notes the real time each packet is
+    dispatched and the simulated MotionCommander notes every velocity
+    setpoint. A setpoint sent while a packet is being dispatched is one
+    iteration of an event-driven loop; setpoints sent from anywhere else
+    (takeoff, landing, the final stop) are only counted in total_setpoints.
+    Must be entered before the loop's log streams are started.
+    """
+
+    def __init__(self):
+        self.sim_times: List[float] = []    # Simulated time of each loop setpoint
+        self.latencies: List[float] = []    # Seconds from packet dispatch to the setpoint
+        self.packets = 0
+        self.total_setpoints = 0
+        self._dispatch_start: Optional[float] = None
+        self._saved = []
+
+    def __enter__(self):
+        probe = self
+        sample = sim_drone.LogConfig._sample
+        linear_motion = sim_drone.MotionCommander.start_linear_motion
+
+        def timed_sample(conf) -> None:
+            probe.packets += 1
+            outer = probe._dispatch_start
+            probe._dispatch_start = time.perf_counter()
+            try:
+                sample(conf)
+            finally:
+                probe._dispatch_start = outer
+
+        def timed_linear_motion(mc, *args, **kwargs) -> None:
+            probe.total_setpoints += 1
+            if probe._dispatch_start is not None:
+                probe.latencies.append(time.perf_counter() - probe._dispatch_start)
+                probe.sim_times.append(mc._cf.clock.now)
+            linear_motion(mc, *args, **kwargs)
+
+        self._saved = [(sim_drone.LogConfig, '_sample', sample),
+                       (sim_drone.MotionCommander, 'start_linear_motion', linear_motion)]
+        sim_drone.LogConfig._sample = timed_sample
+        sim_drone.MotionCommander.start_linear_motion = timed_linear_motion
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for owner, name, original in self._saved:
+            setattr(owner, name, original)
+        self._saved = []
+
+    def metrics(self) -> Metrics:
+        """Summarize the recorded iterations."""
+        times = np.asarray(self.sim_times)
+        latencies = np.asarray(self.latencies) * 1e6
+        periods = np.diff(times) * 1000.0
+        span = times[-1] - times[0] if len(times) > 1 else 0.0
+        return {
+            'iterations': len(times),
+            'period_ms': float(periods.mean()) if len(periods) else 0.0,
+            'period_p99_ms': float(np.percentile(periods, 99)) if len(periods) else 0.0,
+            'jitter_ms': float(periods.std()) if len(periods) else 0.0,
+            'latency_p50_us': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            'latency_p99_us': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            'latency_max_us': float(latencies.max()) if len(latencies) else 0.0,
+            'setpoint_rate_hz': (len(times) - 1) / span if span > 0 else 0.0,
+            'packets': self.packets,
+            'total_setpoints': self.total_setpoints,
+        }
+
+
+# Loops
+
+def _push_away(scf) -> None:
+    import proj3_part1_wes_alejandro as mission
+    with mission.MotionCommander(scf, default_height=0.3) as mc:
+        mission.fly_push_away(scf, mc, timeout=PUSH_AWAY_TIME)
+
+
+def _race(scf) -> None:
+    import proj3_part2_wes_alejandro as mission
+    with mission.MotionCommander(scf, default_height=mission.MINIMUM_HEIGHT) as mc:
+        mission.fly_race(scf, mc, race_time=RACE_TIME)
+
+
+def _path_follow(scf) -> None:
+    import project3_2 as mission
+    with mission.MotionCommander(scf, default_height=mission.FLIGHT_HEIGHT) as mc:
+        mission.follow_path(scf, mc)
+
+
+def _path_plan(scf) -> None:
+    import project3_2 as mission
+    with mission.MotionCommander(scf, default_height=mission.FLIGHT_HEIGHT) as mc:
+        mission.follow_planned_path(scf, mc)
+
+
+def _waypoints(scf) -> None:
+    import proj2_wes_alejandro as mission
+    mission.execute_waypoint_mission(scf, history=[])
+
+
+# name -> (mission module, loop, obstacles)
+LOOPS = {
+    'push_away': ('proj3_part1_wes_alejandro', _push_away, [(0.3, 0.0, 0.05)]),
+    'race': ('proj3_part2_wes_alejandro', _race, [(1.0, 0.05, 0.1), (2.0, -0.1, 0.1), (3.0, 0.1, 0.12)]),
+    'path_follow': ('project3_2', _path_follow, [(0.5, 0.0, 0.1)]),
+    'path_plan': ('project3_2', _path_plan, [(0.5, 0.0, 0.1)]),
+    'waypoints': ('proj2_wes_alejandro', _waypoints, []),
+}
+
+
+def run_loop(name: str) -> Metrics:
+    """
+    Fly one loop in the simulator with its output silenced.
+
+    Returns:
+        Metrics: loop metrics plus the simulated and wall-clock duration.
+    """
+    module_name, loop, obstacles = LOOPS[name]
+    module = __import__(module_name)
+    random.seed(SEED)
+    world = World(obstacles, seed=SEED)
+    with LoopProbe() as probe, contextlib.redirect_stdout(io.StringIO()):
+        _, sim_seconds, wall_seconds = sim_drone.run_simulated(loop, module, world=world)
+    metrics = probe.metrics()
+    metrics['sim_seconds'] = sim_seconds
+    metrics['wall_seconds'] = wall_seconds
+    return metrics
+
+
+def run_benchmarks(names: Optional[List[str]] = None, repeats: int = REPEATS) -> Dict[str, Metrics]:
+    """
+    Run every loop repeats times and keep the median of each metric.
+
+    Args:
+        names (List[str] or None): loops to run, all of LOOPS when None.
+        repeats (int): runs per loop.
+
+    Returns:
+        Dict[str, Metrics]: metrics per loop.
+    """
+    results = {}
+    for name in names or LOOPS:
+        runs = [run_loop(name) for _ in range(repeats)]
+        results[name] = {key: float(np.median([run[key] for run in runs])) for key in runs[0]}
+    return results
+
+
+def compare(results: Dict[str, Metrics], baseline: Dict[str, Metrics]) -> List[str]:
+    """
+    Print each loop's metrics next to the baseline.
+
+    Returns:
+        List[str]: 'loop.metric' for every regression beyond tolerance, and
+            for every metric the baseline does not have.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        old = baseline.get(name)
+        print(f"{name}: {metrics['iterations']:.0f} iterations in {metrics['sim_seconds']:.1f}s simulated, "
+              f"{metrics['wall_seconds'] * 1000:.0f}ms wall")
+        for key, (higher_is_better, tolerance, slack) in METRICS.items():
+            value = metrics[key]
+            if old is None or key not in old:
+                print(f"  {key:>17}: {value:10.2f}  NO BASELINE")
+                regressions.append(f'{name}.{key}')
+                continue
+            change = value - old[key]
+            worse = -change if higher_is_better else change
+            regressed = worse > slack and worse > tolerance * abs(old[key])
+            relative = f"{change / old[key] * 100:+.0f}%" if old[key] else 'n/a'
+            print(f"  {key:>17}: {value:10.2f}  baseline {old[key]:10.2f}  {relative:>6}"
+                  f"{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(f'{name}.{key}')
+    return regressions
+
+
+def write_results(results: Dict[str, Metrics], path: str) -> None:
+    document = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeats': REPEATS,
+        'loops': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load_results(path: str) -> Dict[str, Metrics]:
+    with open(path) as f:
+        return json.load(f)['loops']
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    save_baseline = bool(args) and args[0] == 'baseline'
+    names = args[1:] if save_baseline else args
+    unknown = [name for name in names if name not in LOOPS]
+    if unknown:
+        print(f"Unknown loops: {', '.join(unknown)}. Choose from {', '.join(LOOPS)}")
+        sys.exit(1)
+    if not save_baseline and not os.path.exists(BASELINE_PATH):
+        print(f"No baseline at {BASELINE_PATH}, run 'python {sys.argv[0]} baseline' to store one")
+        sys.exit(1)
+
+    results = run_benchmarks(names)
+    if save_baseline:
+        # Storing some of the loops keeps the others' baseline
+        stored = load_results(BASELINE_PATH) if names and os.path.exists(BASELINE_PATH) else {}
+        write_results({**stored, **results}, BASELINE_PATH)
+        for name, metrics in results.items():
+            print(f"{name}: " + ', '.join(f"{key} {metrics[key]:.2f}" for key in METRICS))
+        print(f"Baseline written to {BASELINE_PATH}")
+        sys.exit(0)
+
+    write_results(results, RESULTS_PATH)
+    regressions = compare(results, load_results(BASELINE_PATH))
+    print(f"Results written to {RESULTS_PATH}")
+    if regressions:
+        print(f"{len(regressions)} regressions or metrics without a baseline: {', '.join(regressions)}")
+        sys.exit(1)
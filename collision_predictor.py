@@ -0,0 +1,117 @@
+"""
+Time-to-collision prediction for the Multi-ranger directions.
+
+The reactive rules only act once a range is below a fixed distance, so
+how much room is left to stop depends on how fast the drone was going,
+and the cruise speed has to stay low for the worst case. CollisionPredictor
+instead works out, for all five directions at once, how fast each range is
+closing and how long until it reaches the safety margin:
+
+    closing rate    the faster of the measured range rate (smoothed, from
+                    consecutive readings) and the drone's own commanded
+                    velocity along the sensor axis, so static obstacles are
+                    predicted from the first reading and moving ones from
+                    their range rate
+    time to collision
+                    (range - margin) / closing rate
+    threat          when that time is shorter than the time it takes to
+                    stop: REACTION_TIME plus braking at DECELERATION
+
+It also gives the fastest safe speed towards each direction, the speed
+from which the drone can still stop at the margin. Faster flight then
+starts avoiding earlier, at the same margin from the obstacle.
+
+Example:
+    predictor = CollisionPredictor(MIN_DISTANCE)
+    predictor.update(sample, (vx, vy, vz))
+    if predictor.threat('front'):
+        ...
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+from range_events import DIRECTIONS, RangeSample
+
+REACTION_TIME = 0.4         # Seconds from a reading to the drone braking: sample period, filter delay, latency
+DECELERATION = 0.5          # m/s^2 the drone is assumed to brake with
+RATE_SMOOTHING = 0.5        # Weight of the newest range rate in the smoothed one
+MAX_RATE_GAP = 0.5          # Seconds between readings after which the range rate starts over
+
+# Body-frame unit vector each ranger looks along, in DIRECTIONS order
+DIRECTION_VECTORS = np.array([
+    (1.0, 0.0, 0.0),    # front
+    (-1.0, 0.0, 0.0),   # back
+    (0.0, 1.0, 0.0),    # left
+    (0.0, -1.0, 0.0),   # right
+    (0.0, 0.0, 1.0),    # up
+])
+INDEX = {name: i for i, name in enumerate(DIRECTIONS)}
+
+
+class CollisionPredictor:
+    """
+    Range rates, time to collision and safe speeds for every ranger direction.
+
+    Args:
+        margin (float): distance in meters to keep from obstacles.
+        reaction_time (float): seconds before braking starts.
+        deceleration (float): braking deceleration in m/s^2.
+    """
+
+    def __init__(self, margin: float, reaction_time: float = REACTION_TIME, deceleration: float = DECELERATION):
+        self.margin = margin
+        self.reaction_time = reaction_time
+        self.deceleration = deceleration
+        n = len(DIRECTIONS)
+        self.ranges = np.full(n, np.inf)
+        self.rates = np.zeros(n)                # Smoothed range rate in m/s, negative when closing
+        self.closing = np.zeros(n)              # Closing speed used for the prediction, m/s
+        self.time_to_collision = np.full(n, np.inf)
+        self.safe_speed = np.full(n, np.inf)    # Fastest speed towards each direction that can still stop
+        self.threats = np.zeros(n, dtype=bool)
+        self._last_time: Optional[float] = None
+
+    def update(self, sample: RangeSample, velocity: Tuple[float, float, float]) -> np.ndarray:
+        """
+        Update every direction from one sample.
+
+        Args:
+            sample (RangeSample): range readings, filtered or raw.
+            velocity (Tuple[float, float, float]): commanded body velocity in m/s.
+
+        Returns:
+            np.ndarray: time to collision in seconds per direction, inf when not closing.
+        """
+        ranges = np.array([np.inf if value is None else value for value in sample[1:]])
+        if self._last_time is not None and 0.0 < sample.timestamp - self._last_time <= MAX_RATE_GAP:
+            with np.errstate(invalid='ignore'):
+                measured = (ranges - self.ranges) / (sample.timestamp - self._last_time)
+            known = np.isfinite(measured)
+            self.rates = np.where(known, self.rates + RATE_SMOOTHING * (measured - self.rates), 0.0)
+        else:
+            self.rates[:] = 0.0
+        self.ranges = ranges
+        self._last_time = sample.timestamp
+
+        own = DIRECTION_VECTORS @ np.asarray(velocity, dtype=float)
+        self.closing = np.maximum(-self.rates, own)
+        free = np.maximum(ranges - self.margin, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.time_to_collision = np.where(self.closing > 0.0, free / self.closing, np.inf)
+        stopping_time = self.reaction_time + self.closing / (2.0 * self.deceleration)
+        self.threats = self.time_to_collision <= stopping_time
+
+        # Largest v with v * reaction_time + v^2 / (2 a) <= free
+        a, t = self.deceleration, self.reaction_time
+        self.safe_speed = a * (np.sqrt(t * t + 2.0 * free / a) - t)
+        return self.time_to_collision
+
+    def threat(self, direction: str) -> bool:
+        """True when the drone can no longer stop before the margin in a direction without acting now."""
+        return bool(self.threats[INDEX[direction]])
+
+    def speed_limit(self, direction: str) -> float:
+        """Fastest speed towards a direction from which the drone can still stop at the margin."""
+        return float(self.safe_speed[INDEX[direction]])
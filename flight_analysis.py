@@ -0,0 +1,220 @@
+"""
+Streaming flight-log analysis.
+
+plot_path_positions() only draws where the drone went. analyze_flight()
+reads a flight log (or a TelemetryRecorder file) one chunk at a time and
+reduces each chunk with vectorized NumPy into a handful of running totals,
+so memory use is the same for a one-minute hop and a five-hour recording:
+
+    path length         3D distance flown while airborne
+    coverage            share of the BOX_LIMIT square, in COVERAGE_CELL
+                        cells, that the drone flew over
+    avoidance events    times any horizontal ranger went from clear to
+                        closer than AVOID_DISTANCE
+    hover time          airborne time spent slower than HOVER_SPEED
+    battery drop        mean vbat of the first BATTERY_SAMPLES samples
+                        minus that of the last BATTERY_SAMPLES
+
+Only the channels the metrics need are decompressed. analyze_directory()
+spreads the files of a directory over a process pool.
+
+Usage:
+    python flight_analysis.py telemetry/flight.hdlog [BOX_LIMIT]
+    python flight_analysis.py telemetry/ [BOX_LIMIT] [WORKERS]
+"""
+
+import math
+import multiprocessing
+import os
+import sys
+from functools import partial
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from flight_log import FlightLog
+from telemetry_recorder import TelemetryRecorder
+
+BOX_LIMIT = 0.5             # Half width in meters of the square flown in
+COVERAGE_CELL = 0.05        # Meters per side of a coverage cell
+AVOID_DISTANCE = 0.2        # Horizontal range in meters that counts as an avoidance, same as MIN_DISTANCE
+HOVER_SPEED = 0.05          # m/s below which the drone counts as hovering
+AIRBORNE_HEIGHT = 0.05      # Meters above which the drone counts as flying
+BATTERY_SAMPLES = 50        # Samples averaged at each end for the battery drop
+CHUNK_ROWS = 4096           # Rows per chunk when streaming a TelemetryRecorder file
+EXTENSIONS = ('.hdlog', '.telem')
+
+CHANNELS = ('t', 'x', 'y', 'z', 'vx', 'vy', 'vz', 'front', 'back', 'left', 'right', 'vbat')
+HORIZONTAL = ('front', 'back', 'left', 'right')
+
+
+class FlightMetrics(NamedTuple):
+    path: str
+    rows: int
+    duration: float             # seconds
+    path_length: float          # meters
+    coverage: float             # fraction of the box, 0 to 1
+    avoidance_events: int
+    hover_time: float           # seconds
+    battery_drop: float         # volts
+
+    def print_report(self) -> None:
+        print(f"{os.path.basename(self.path)}: {self.duration:.1f}s, {self.path_length:.2f}m flown, "
+              f"{self.coverage * 100:.0f}% of the box covered, {self.avoidance_events} avoidance events, "
+              f"{self.hover_time:.1f}s hovering, battery -{self.battery_drop:.2f}V")
+
+
+def iter_chunks(path: str) -> Iterator[Dict[str, np.ndarray]]:
+    """The channels the metrics need, one chunk at a time, from a flight log or telemetry file."""
+    if path.endswith('.telem'):
+        with TelemetryRecorder(path, readonly=True) as telemetry:
+            for records in telemetry.records():
+                for start in range(0, len(records), CHUNK_ROWS):
+                    part = records[start:start + CHUNK_ROWS]
+                    yield {name: part[name].astype(np.float64) for name in CHANNELS}
+    else:
+        with FlightLog(path) as log:
+            yield from log.iter_chunks(CHANNELS)
+
+
+class FlightAnalyzer:
+    """
+    Running totals of the flight metrics, fed one chunk at a time.
+
+    Args:
+        box_limit (float): half width of the square coverage is measured in.
+    """
+
+    def __init__(self, box_limit: float = BOX_LIMIT):
+        self.box_limit = box_limit
+        cells = max(1, int(math.ceil(2 * box_limit / COVERAGE_CELL)))
+        self.visited = np.zeros((cells, cells), dtype=bool)
+        self.rows = 0
+        self.first_t: Optional[float] = None
+        self.last_t: Optional[float] = None
+        self.path_length = 0.0
+        self.hover_time = 0.0
+        self.avoidance_events = 0
+        self._last_point: Optional[np.ndarray] = None   # Previous chunk's last position, None when landed
+        self._last_close = False
+        self._last_hovering = False
+        self._battery_start: List[float] = []
+        self._battery_end = np.empty(0)
+
+    def update(self, chunk: Dict[str, np.ndarray]) -> None:
+        t = chunk['t']
+        if not len(t):
+            return
+        self.rows += len(t)
+        if self.first_t is None:
+            self.first_t = float(t[0])
+        airborne = chunk['z'] > AIRBORNE_HEIGHT
+
+        # Path length, joined to the previous chunk's last point
+        points = np.column_stack((chunk['x'], chunk['y'], chunk['z']))
+        steps = np.linalg.norm(np.diff(points, axis=0), axis=1)
+        self.path_length += float(steps[airborne[1:] & airborne[:-1]].sum())
+        if self._last_point is not None and airborne[0]:
+            self.path_length += float(np.linalg.norm(points[0] - self._last_point))
+        self._last_point = points[-1] if airborne[-1] else None
+
+        # Hover time, each sample holding until the next one, the last one until the next chunk
+        speed = np.sqrt(chunk['vx'] ** 2 + chunk['vy'] ** 2 + chunk['vz'] ** 2)
+        hovering = airborne & (speed < HOVER_SPEED)
+        if self._last_hovering:
+            self.hover_time += float(t[0]) - self.last_t
+        self.hover_time += float(np.diff(t)[hovering[:-1]].sum())
+        self._last_hovering = bool(hovering[-1])
+        self.last_t = float(t[-1])
+
+        # Coverage of the box
+        cells = self.visited.shape[0]
+        inside = airborne & (np.abs(chunk['x']) < self.box_limit) & (np.abs(chunk['y']) < self.box_limit)
+        i = ((chunk['x'][inside] + self.box_limit) / COVERAGE_CELL).astype(np.intp).clip(0, cells - 1)
+        j = ((chunk['y'][inside] + self.box_limit) / COVERAGE_CELL).astype(np.intp).clip(0, cells - 1)
+        self.visited[i, j] = True
+
+        # Avoidance events: onsets of anything horizontal closer than AVOID_DISTANCE
+        with np.errstate(invalid='ignore'):
+            close = np.column_stack([chunk[name] < AVOID_DISTANCE for name in HORIZONTAL]).any(axis=1)
+        close &= airborne
+        previous = np.concatenate(([self._last_close], close[:-1]))
+        self.avoidance_events += int((close & ~previous).sum())
+        self._last_close = bool(close[-1])
+
+        # Battery, the first and the latest BATTERY_SAMPLES valid readings
+        vbat = chunk['vbat'][~np.isnan(chunk['vbat'])]
+        if len(self._battery_start) < BATTERY_SAMPLES:
+            self._battery_start.extend(vbat[:BATTERY_SAMPLES - len(self._battery_start)].tolist())
+        self._battery_end = np.concatenate((self._battery_end, vbat))[-BATTERY_SAMPLES:]
+
+    def result(self, path: str = '') -> FlightMetrics:
+        duration = self.last_t - self.first_t if self.first_t is not None else 0.0
+        battery_drop = (float(np.mean(self._battery_start)) - float(self._battery_end.mean())
+                        if self._battery_start else 0.0)
+        return FlightMetrics(path, self.rows, duration, self.path_length, float(self.visited.mean()),
+                             self.avoidance_events, self.hover_time, battery_drop)
+
+
+def analyze_flight(path: str, box_limit: float = BOX_LIMIT) -> FlightMetrics:
+    """
+    Stream one recording through a FlightAnalyzer.
+
+    Args:
+        path (str): flight log (.hdlog) or TelemetryRecorder file (.telem).
+        box_limit (float): half width of the square coverage is measured in.
+
+    Returns:
+        FlightMetrics: the metrics of the whole flight.
+    """
+    analyzer = FlightAnalyzer(box_limit)
+    for chunk in iter_chunks(path):
+        analyzer.update(chunk)
+    return analyzer.result(path)
+
+
+def analyze_directory(directory: str, box_limit: float = BOX_LIMIT, workers: Optional[int] = None) -> List[FlightMetrics]:
+    """
+    Analyze every recording in a directory on a process pool.
+
+    A flight log and the telemetry file it was converted from are the same
+    flight, so only the flight log is analyzed when both are there.
+
+    Args:
+        directory (str): folder with .hdlog and .telem files.
+        box_limit (float): half width of the square coverage is measured in.
+        workers (int or None): processes, one per core when None.
+
+    Returns:
+        List[FlightMetrics]: one per flight, in file name order.
+    """
+    flights: Dict[str, str] = {}
+    for name in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(name)
+        if extension in EXTENSIONS and (stem not in flights or extension == '.hdlog'):
+            flights[stem] = os.path.join(directory, name)
+    with multiprocessing.Pool(workers) as pool:
+        metrics = pool.map(partial(analyze_flight, box_limit=box_limit), list(flights.values()), chunksize=1)
+    return metrics
+
+
+def print_summary(metrics: List[FlightMetrics]) -> None:
+    print(f"{'flight':<32} {'time':>7} {'path':>7} {'cover':>6} {'avoid':>5} {'hover':>7} {'battery':>8}")
+    for m in metrics:
+        print(f"{os.path.basename(m.path):<32} {m.duration:6.1f}s {m.path_length:6.2f}m {m.coverage * 100:5.0f}% "
+              f"{m.avoidance_events:5d} {m.hover_time:6.1f}s {-m.battery_drop:7.2f}V")
+    if len(metrics) > 1:
+        print(f"{len(metrics)} flights, {sum(m.duration for m in metrics):.0f}s and "
+              f"{sum(m.path_length for m in metrics):.1f}m in total")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3, 4):
+        print(__doc__)
+        sys.exit(1)
+    box = float(sys.argv[2]) if len(sys.argv) >= 3 else BOX_LIMIT
+    if os.path.isdir(sys.argv[1]):
+        workers = int(sys.argv[3]) if len(sys.argv) == 4 else None
+        print_summary(analyze_directory(sys.argv[1], box, workers))
+    else:
+        analyze_flight(sys.argv[1], box).print_report()
@@ -0,0 +1,370 @@
+"""
+Compressed columnar flight logs.
+
+A TelemetryRecorder file keeps every record at full width, and printed
+lines or tuple lists like `positions` are bigger still and slow to load
+back. A flight log stores each channel on its own, in chunks of
+CHUNK_ROWS rows:
+
+    1. quantized to integers (CHANNELS gives the resolution, e.g. 1 mm);
+       NaN repeats the previous value and is marked in a bitmap instead
+    2. delta encoded, the first value of the chunk absolute, so slowly
+       changing channels become runs of small numbers
+    3. stored in the narrowest integer type the deltas fit and zlib compressed
+
+An index at the end of the file lists, for every chunk, its time span and
+where each channel's block is. A reader only decompresses the blocks of the
+channels and chunks it asks for.
+
+File layout (little endian):
+    64 byte header: magic, version, channel count, rows per chunk
+    channel count * CHANNEL_DTYPE: name and scale of every channel
+    compressed blocks
+    chunk count * CHUNK_DTYPE: rows and time span of every chunk
+    chunk count * channel count * BLOCK_DTYPE: offset, size and width of every block
+    16 byte trailer: index offset, chunk count, magic
+
+Setpoints are the last velocity sent through commander(), repeated on
+every row until the next one.
+
+Usage:
+    python flight_log.py convert telemetry/flight.telem flight.hdlog
+    python flight_log.py show flight.hdlog [CHANNEL ...] [--window START END]
+    python flight_log.py csv flight.hdlog flight.csv
+"""
+
+import os
+import sys
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from telemetry_recorder import RECORD_DTYPE, TelemetryRecorder, TelemetrySource
+
+MAGIC = b'HDFLOG01'
+TRAILER_MAGIC = b'HDIX'
+VERSION = 1
+HEADER_SIZE = 64
+CHUNK_ROWS = 4096           # Rows per compressed chunk, ~80 s at 50 Hz
+COMPRESSION = 6             # zlib level
+HAS_NAN = 0x80              # Block width flag: a NaN bitmap precedes the deltas
+
+# Channel -> quantization scale (stored value = round(value * scale))
+CHANNELS = {
+    't': 1e6,                                       # microseconds
+    'x': 1e3, 'y': 1e3, 'z': 1e3,                   # millimeters
+    'vx': 1e3, 'vy': 1e3, 'vz': 1e3,                # mm/s
+    'front': 1e3, 'back': 1e3, 'left': 1e3, 'right': 1e3, 'up': 1e3,  # millimeters, as the deck reports them
+    'vbat': 1e3,                                    # millivolts
+    'sp_vx': 1e3, 'sp_vy': 1e3, 'sp_vz': 1e3,       # commanded mm/s
+    'sp_yaw': 1e1,                                  # commanded 0.1 degrees/s
+}
+SETPOINT_CHANNELS = ('sp_vx', 'sp_vy', 'sp_vz', 'sp_yaw')
+
+ROW_DTYPE = np.dtype(RECORD_DTYPE.descr + [(name, '<f4') for name in SETPOINT_CHANNELS])
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('channels', '<u4'),
+    ('chunk_rows', '<u4'),
+    ('reserved', 'V44'),
+])
+CHANNEL_DTYPE = np.dtype([('name', 'S16'), ('scale', '<f8')])
+CHUNK_DTYPE = np.dtype([('rows', '<u4'), ('t_start', '<f8'), ('t_end', '<f8')])
+BLOCK_DTYPE = np.dtype([('offset', '<u8'), ('size', '<u4'), ('width', 'u1')])
+TRAILER_DTYPE = np.dtype([('index_offset', '<u8'), ('chunks', '<u4'), ('magic', 'S4')])
+
+WIDTHS = (np.int8, np.int16, np.int32, np.int64)
+
+
+def _encode(values: np.ndarray, scale: float) -> Tuple[bytes, int]:
+    """Quantize, delta encode and compress one chunk of a channel."""
+    nan = np.isnan(values)
+    quantized = np.round(np.where(nan, 0.0, values) * scale).astype(np.int64)
+    width = 0
+    if nan.any():
+        # NaN repeats the last value, so it costs nothing in the deltas, and is marked in a bitmap
+        last = np.maximum.accumulate(np.where(nan, 0, np.arange(len(values))))
+        quantized = np.where(nan[last], 0, quantized[last])
+        width = HAS_NAN
+    deltas = np.diff(quantized, prepend=np.int64(0))
+    for code, dtype in enumerate(WIDTHS):
+        info = np.iinfo(dtype)
+        if info.min <= deltas.min() and deltas.max() <= info.max:
+            break
+    payload = deltas.astype(dtype).tobytes()
+    if width:
+        payload = np.packbits(nan).tobytes() + payload
+    return zlib.compress(payload, COMPRESSION), width | code
+
+
+def _decode(block: bytes, width: int, scale: float, rows: int) -> np.ndarray:
+    payload = zlib.decompress(block)
+    mask_size = (rows + 7) // 8 if width & HAS_NAN else 0
+    deltas = np.frombuffer(payload, dtype=WIDTHS[width & ~HAS_NAN], offset=mask_size)
+    values = np.cumsum(deltas, dtype=np.int64) / scale
+    if mask_size:
+        nan = np.unpackbits(np.frombuffer(payload, np.uint8, mask_size), count=rows).astype(bool)
+        values[nan] = np.nan
+    return values
+
+
+class FlightLogWriter(TelemetrySource):
+    """
+    Writes a flight log, one compressed chunk every chunk_rows rows.
+
+    Rows come from attach(), as with TelemetryRecorder, or from append()
+    and append_records(). Only the current chunk is kept in memory.
+
+    Args:
+        path (str): file to create.
+        chunk_rows (int): rows per chunk.
+    """
+
+    def __init__(self, path: str, chunk_rows: int = CHUNK_ROWS):
+        super().__init__()
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._file = open(path, 'wb')
+        header = np.zeros(1, HEADER_DTYPE)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['channels'] = len(CHANNELS)
+        header['chunk_rows'] = chunk_rows
+        channels = np.array(list(CHANNELS.items()), dtype=CHANNEL_DTYPE)
+        self._file.write(header.tobytes() + channels.tobytes())
+        self._buffer = np.zeros(chunk_rows, ROW_DTYPE)
+        self._fill = 0
+        self._setpoint = (0.0, 0.0, 0.0, 0.0)
+        self._chunks: List[tuple] = []
+        self._blocks: List[tuple] = []
+
+    # Writing
+
+    def command(self, vx: float, vy: float, vz: float, yaw_rate: float = 0.0) -> None:
+        """Record the velocity setpoint that applies from now on."""
+        self._setpoint = (vx, vy, vz, yaw_rate)
+
+    def commander(self, motion_commander) -> 'LoggedCommander':
+        """Wrap a MotionCommander so every start_linear_motion() is recorded."""
+        return LoggedCommander(motion_commander, self)
+
+    def append(self, t: float, x: float, y: float, z: float, vx: float, vy: float, vz: float,
+               front: float, back: float, left: float, right: float, up: float, vbat: float) -> None:
+        self._buffer[self._fill] = (t, x, y, z, vx, vy, vz, front, back, left, right, up, vbat) + self._setpoint
+        self._fill += 1
+        if self._fill == self.chunk_rows:
+            self._write_chunk(self._buffer)
+
+    def append_records(self, records: np.ndarray) -> None:
+        """Append TelemetryRecorder records, or rows with the setpoint channels too, in bulk."""
+        i = 0
+        while i < len(records):
+            take = min(len(records) - i, self.chunk_rows - self._fill)
+            part = self._buffer[self._fill:self._fill + take]
+            for name in records.dtype.names:
+                part[name] = records[name][i:i + take]
+            if 'sp_vx' not in records.dtype.names:
+                for name, value in zip(SETPOINT_CHANNELS, self._setpoint):
+                    part[name] = value
+            self._fill += take
+            i += take
+            if self._fill == self.chunk_rows:
+                self._write_chunk(self._buffer)
+
+    def _write_chunk(self, rows: np.ndarray) -> None:
+        rows = rows[:self._fill]
+        for name, scale in CHANNELS.items():
+            block, width = _encode(rows[name].astype(np.float64), scale)
+            self._blocks.append((self._file.tell(), len(block), width))
+            self._file.write(block)
+        self._chunks.append((len(rows), rows['t'][0], rows['t'][-1]))
+        self.rows += len(rows)
+        self._fill = 0
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.detach()
+        if self._fill:
+            self._write_chunk(self._buffer)
+        index_offset = self._file.tell()
+        self._file.write(np.array(self._chunks, dtype=CHUNK_DTYPE).tobytes())
+        self._file.write(np.array(self._blocks, dtype=BLOCK_DTYPE).tobytes())
+        trailer = np.array([(index_offset, len(self._chunks), TRAILER_MAGIC)], dtype=TRAILER_DTYPE)
+        self._file.write(trailer.tobytes())
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class LoggedCommander:
+    """MotionCommander wrapper that records every velocity setpoint in a flight log."""
+
+    def __init__(self, motion_commander, log: FlightLogWriter):
+        self.mc = motion_commander
+        self.log = log
+
+    def start_linear_motion(self, velocity_x_m: float, velocity_y_m: float, velocity_z_m: float,
+                            rate_yaw: float = 0.0) -> None:
+        self.log.command(velocity_x_m, velocity_y_m, velocity_z_m, rate_yaw)
+        self.mc.start_linear_motion(velocity_x_m, velocity_y_m, velocity_z_m, rate_yaw)
+
+    def stop(self) -> None:
+        self.start_linear_motion(0.0, 0.0, 0.0)
+
+    def __getattr__(self, name):
+        return getattr(self.mc, name)
+
+
+class FlightLog:
+    """
+    Reads a flight log, decompressing only the blocks that are asked for.
+
+    Args:
+        path (str): written by FlightLogWriter.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        header = np.frombuffer(self._file.read(HEADER_SIZE), HEADER_DTYPE)
+        if header['magic'][0] != MAGIC or header['version'][0] != VERSION:
+            raise ValueError(f'{path} is not a flight log')
+        count = int(header['channels'][0])
+        channels = np.frombuffer(self._file.read(count * CHANNEL_DTYPE.itemsize), CHANNEL_DTYPE)
+        self.channels: Dict[str, float] = {name.decode(): float(scale) for name, scale in channels}
+        self._file.seek(-TRAILER_DTYPE.itemsize, os.SEEK_END)
+        trailer = np.frombuffer(self._file.read(TRAILER_DTYPE.itemsize), TRAILER_DTYPE)
+        if trailer['magic'][0] != TRAILER_MAGIC:
+            raise ValueError(f'{path} was not closed properly, the index is missing')
+        chunks = int(trailer['chunks'][0])
+        self._file.seek(int(trailer['index_offset'][0]))
+        self.chunks = np.frombuffer(self._file.read(chunks * CHUNK_DTYPE.itemsize), CHUNK_DTYPE)
+        blocks = np.frombuffer(self._file.read(chunks * count * BLOCK_DTYPE.itemsize), BLOCK_DTYPE)
+        self._blocks = blocks.reshape(chunks, count)
+        self._column = {name: i for i, name in enumerate(self.channels)}
+
+    def __len__(self) -> int:
+        return int(self.chunks['rows'].sum())
+
+    @property
+    def duration(self) -> float:
+        return float(self.chunks['t_end'][-1] - self.chunks['t_start'][0]) if len(self.chunks) else 0.0
+
+    def _block(self, chunk: int, name: str) -> np.ndarray:
+        offset, size, width = self._blocks[chunk, self._column[name]]
+        self._file.seek(int(offset))
+        return _decode(self._file.read(int(size)), int(width), self.channels[name], int(self.chunks['rows'][chunk]))
+
+    def read(self, names: Optional[Iterable[str]] = None, start: Optional[float] = None,
+             end: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """
+        Load channels, optionally only the rows with start <= t <= end.
+
+        Args:
+            names (Iterable[str] or None): channels to load, all when None.
+            start (float or None): first time in seconds, the beginning when None.
+            end (float or None): last time in seconds, the end when None.
+
+        Returns:
+            Dict[str, np.ndarray]: one float64 array per channel, all of the same length.
+        """
+        names = list(names or self.channels)
+        for name in names:
+            if name not in self._column:
+                raise KeyError(f'{self.path} has no channel {name!r}')
+        low = -np.inf if start is None else start
+        high = np.inf if end is None else end
+        selected = np.flatnonzero((self.chunks['t_end'] >= low) & (self.chunks['t_start'] <= high))
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in names}
+        for chunk in selected:
+            t_start, t_end = self.chunks['t_start'][chunk], self.chunks['t_end'][chunk]
+            rows = slice(None)
+            if t_start < low or t_end > high:
+                # Only a chunk the window cuts through needs its times to find the rows
+                t = self._block(chunk, 't')
+                rows = slice(np.searchsorted(t, low, 'left'), np.searchsorted(t, high, 'right'))
+            for name in names:
+                parts[name].append(self._block(chunk, name)[rows])
+        return {name: np.concatenate(arrays) if arrays else np.empty(0) for name, arrays in parts.items()}
+
+    def iter_chunks(self, names: Optional[Sequence[str]] = None) -> Iterator[Dict[str, np.ndarray]]:
+        """The log one chunk at a time, so memory use does not grow with the flight length."""
+        names = list(names or self.channels)
+        for chunk in range(len(self.chunks)):
+            yield {name: self._block(chunk, name) for name in names}
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def convert_telemetry(telemetry_path: str, log_path: Optional[str] = None) -> str:
+    """
+    Compress a TelemetryRecorder file into a flight log.
+
+    Args:
+        telemetry_path (str): recording to convert.
+        log_path (str or None): output, the recording's path with a .hdlog extension when None.
+
+    Returns:
+        str: path of the flight log.
+    """
+    log_path = log_path or os.path.splitext(telemetry_path)[0] + '.hdlog'
+    with TelemetryRecorder(telemetry_path, readonly=True) as telemetry, FlightLogWriter(log_path) as log:
+        for records in telemetry.records():
+            log.append_records(records)
+    return log_path
+
+
+def export_csv(log_path: str, csv_path: str) -> None:
+    """Write a flight log out as CSV, one chunk at a time."""
+    with FlightLog(log_path) as log, open(csv_path, 'w') as f:
+        f.write(','.join(log.channels) + '\n')
+        for chunk in log.iter_chunks():
+            np.savetxt(f, np.column_stack(list(chunk.values())), delimiter=',', fmt='%.6f')
+
+
+def show(log_path: str, names: Sequence[str] = (), start: Optional[float] = None,
+         end: Optional[float] = None) -> None:
+    with FlightLog(log_path) as log:
+        size = os.path.getsize(log_path)
+        raw = len(log) * ROW_DTYPE.itemsize
+        print(f"{log_path}: {len(log)} rows over {log.duration:.1f}s in {len(log.chunks)} chunks, "
+              f"{size / 1024:.1f} KiB ({raw / max(size, 1):.1f}x smaller than the raw records)")
+        columns = log.read(names or None, start, end)
+        for name, values in columns.items():
+            known = values[~np.isnan(values)]
+            stats = f"min {known.min():.3f}, max {known.max():.3f}, mean {known.mean():.3f}" if len(known) else 'no data'
+            print(f"  {name:>7}: {len(values)} rows, {stats}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if len(args) in (2, 3) and args[0] == 'convert':
+        print(f"Wrote {convert_telemetry(*args[1:])}")
+    elif len(args) == 3 and args[0] == 'csv':
+        export_csv(args[1], args[2])
+    elif len(args) >= 2 and args[0] == 'show':
+        window = (None, None)
+        if '--window' in args:
+            i = args.index('--window')
+            window = (float(args[i + 1]), float(args[i + 2]))
+            args = args[:i] + args[i + 3:]
+        show(args[1], args[2:], *window)
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,177 @@
+"""
+Opt-in per-stage timing of the control loops.
+
+When profiling is enabled, the event and polling loops in range_events and
+fly_to() in state_estimate time each stage of every iteration:
+
+    range_read  turning a Multi-ranger packet into a RangeSample
+    state_read  turning a stateEstimate packet into a State
+    decide      the controller, i.e. the is_close() checks and the map/plan lookups
+    setpoint    the start_linear_motion() call
+    sleep       each sleep of the loop's thread
+
+Durations go into log-bucket histograms in the style of HdrHistogram: every
+power of two is split into SUB_BUCKETS linear buckets, so a value is stored
+with at most 1/SUB_BUCKETS relative error in a fixed list of counters that
+is allocated once. Recording is a subtraction, a bit_length() and an
+increment; with profiling off the loops only pay for one `if`.
+
+Enable it by setting DRONE_PROFILE=1 in the environment or by calling
+enable() before flying. report() prints p50/p99/max per stage; the mission
+scripts call it after landing, and on POSIX `kill -USR1 <pid>` prints it
+mid-flight.
+
+Example:
+    profile = instrumentation.enable()
+    ...
+    profile.report()
+"""
+
+import os
+import signal
+import threading
+from time import perf_counter_ns
+from typing import Dict, Optional
+
+SUB_BUCKET_BITS = 4                 # 16 buckets per power of two, values within 6.25%
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_EXPONENT = 36                   # Largest tracked duration is 2**36 ns (~69 s), longer ones are clamped
+BUCKETS = (MAX_EXPONENT - SUB_BUCKET_BITS + 1) * SUB_BUCKETS
+STAGES = ('range_read', 'state_read', 'decide', 'setpoint', 'sleep')
+ENV_VARIABLE = 'DRONE_PROFILE'
+
+
+class Histogram:
+    """
+    Fixed-size log-bucket histogram of durations in nanoseconds.
+
+    Args:
+        name (str): stage name used in the report.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        """Index of the bucket holding value."""
+        if value < 2 * SUB_BUCKETS:
+            return value if value > 0 else 0
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        return min(shift * SUB_BUCKETS + (value >> shift), BUCKETS - 1)
+
+    @staticmethod
+    def bucket_limit(index: int) -> int:
+        """Largest value that falls in bucket index."""
+        if index < 2 * SUB_BUCKETS:
+            return index
+        shift = index // SUB_BUCKETS - 1
+        return ((index - shift * SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        # Same as bucket(), inlined since this runs several times per iteration
+        if value < 2 * SUB_BUCKETS:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - SUB_BUCKET_BITS - 1
+            index = (shift << SUB_BUCKET_BITS) + (value >> shift)
+            if index >= BUCKETS:
+                index = BUCKETS - 1
+        self.counts[index] += 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def lap(self, start: int) -> int:
+        """Record the time since start and return the current time, both in perf_counter_ns()."""
+        now = perf_counter_ns()
+        self.record(now - start)
+        return now
+
+    def percentile(self, p: float) -> int:
+        """
+        Args:
+            p (float): percentile between 0 and 100.
+
+        Returns:
+            int: upper bound in nanoseconds of the bucket holding the percentile,
+                0 if nothing was recorded.
+        """
+        if not self.count:
+            return 0
+        rank = max(1, int(p / 100.0 * self.count + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.bucket_limit(index), self.max)
+        return self.max
+
+    def reset(self) -> None:
+        self.counts[:] = [0] * BUCKETS
+        self.count = 0
+        self.max = 0
+
+
+class Profile:
+    """One histogram per stage, all allocated up front."""
+
+    def __init__(self):
+        self.stages: Dict[str, Histogram] = {name: Histogram(name) for name in STAGES}
+
+    def stage(self, name: str) -> Histogram:
+        return self.stages[name]
+
+    @staticmethod
+    def now() -> int:
+        return perf_counter_ns()
+
+    def report(self) -> None:
+        print('Stage timings (p50 / p99 / max):')
+        for histogram in self.stages.values():
+            if not histogram.count:
+                continue
+            print(f"  {histogram.name:>10}: {histogram.percentile(50) / 1000:9.1f}us "
+                  f"{histogram.percentile(99) / 1000:9.1f}us {histogram.max / 1000:9.1f}us "
+                  f"over {histogram.count} iterations")
+
+    def reset(self) -> None:
+        for histogram in self.stages.values():
+            histogram.reset()
+
+
+# Profile the loops record into, None while profiling is off
+active: Optional[Profile] = None
+
+
+def enable() -> Profile:
+    """
+    Start profiling the loops started from now on.
+
+    Returns:
+        Profile: the active profile.
+    """
+    global active
+    if active is None:
+        active = Profile()
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, lambda signum, frame: report())
+    return active
+
+
+def disable() -> None:
+    global active
+    active = None
+
+
+def report() -> None:
+    """Print the active profile, if profiling is on."""
+    if active is not None:
+        active.report()
+
+
+if os.environ.get(ENV_VARIABLE, '') not in ('', '0'):
+    enable()
@@ -0,0 +1,228 @@
+"""
+Live path plot that updates while the drone flies.
+
+The control thread only appends to a TelemetryRecorder; the plot reads
+views of that ring buffer from the GUI thread on a fixed timer, slicing
+each frame up to one snapshot of the write counter. Only the
+artists that change (path, current position, height trace) are redrawn,
+using blitting. Each frame only looks at the records added since the
+previous one, and the path history is compacted with
+Largest-Triangle-Three-Buckets (LTTB) whenever it doubles, so the frame
+cost stays flat however long the flight gets.
+
+Example:
+    with TelemetryRecorder(default_path('flight')) as recorder:
+        recorder.attach(scf)
+        run_with_live_plot(execute_waypoint_mission, scf, recorder, BOX_LIMIT)
+"""
+
+import threading
+from time import perf_counter_ns
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+
+from instrumentation import Histogram
+from telemetry_recorder import TelemetryRecorder
+
+FPS = 30                    # Target redraw rate
+MAX_PLOT_POINTS = 1000      # Points of path history kept after decimation
+HEIGHT_POINTS = 300         # Points of the height trace after decimation
+HEIGHT_WINDOW = 30.0        # Seconds of height history shown
+TELEMETRY_RATE = 50         # Records per second written by the recorder
+VIEW_MARGIN = 0.1           # Meters of space around the flight box
+CLOSE_POLL = 100            # Milliseconds between checks whether the mission is over
+
+
+def lttb(a: np.ndarray, b: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point and, from each of threshold - 2 buckets,
+    the point spanning the largest triangle with the previously kept point
+    and the average of the next bucket. Works on time series (t, value) and
+    on 2D paths (x, y) alike.
+
+    Args:
+        a (np.ndarray): first coordinate of the points.
+        b (np.ndarray): second coordinate of the points.
+        threshold (int): number of points to keep.
+
+    Returns:
+        np.ndarray: indices of the kept points, increasing.
+    """
+    n = len(a)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # Average of every bucket, used as the third corner of the triangle
+    sums_a = np.add.reduceat(a[1:n - 1], edges[:-1] - 1)
+    sums_b = np.add.reduceat(b[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_a = np.append(sums_a / counts, a[-1])
+    avg_b = np.append(sums_b / counts, b[-1])
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    prev = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((a[prev] - avg_a[i + 1]) * (b[lo:hi] - b[prev])
+                      - (a[prev] - a[lo:hi]) * (avg_b[i + 1] - b[prev]))
+        prev = lo + int(np.argmax(area))
+        kept[i + 1] = prev
+    return kept
+
+
+class LivePathPlot:
+    """
+    Top-down path and height trace fed from a TelemetryRecorder.
+
+    Args:
+        recorder (TelemetryRecorder): recording the current flight.
+        box_limit (float): half width of the flight area, sets the view.
+        max_points (int): points of path history kept after decimation.
+    """
+
+    def __init__(self, recorder: TelemetryRecorder, box_limit: float, max_points: int = MAX_PLOT_POINTS):
+        self.recorder = recorder
+        self.max_points = max_points
+        self.frame_times = Histogram('frame')
+        self.done = threading.Event()   # Set by the mission thread, the window closes on the next check
+        self._limit = box_limit + VIEW_MARGIN
+
+        self.fig, (self.ax_path, self.ax_height) = plt.subplots(1, 2, figsize=(11, 5))
+        self.ax_path.set_title("Drone Path (top view)")
+        self.ax_path.set_xlabel("X Position (m)")
+        self.ax_path.set_ylabel("Y Position (m)")
+        self.ax_path.set_aspect('equal')
+        self.ax_path.set_xlim(-self._limit, self._limit)
+        self.ax_path.set_ylim(-self._limit, self._limit)
+        self.ax_height.set_title("Height")
+        self.ax_height.set_xlabel("Time (s)")
+        self.ax_height.set_ylabel("Z Position (m)")
+        self.ax_height.set_xlim(0, HEIGHT_WINDOW)
+        self.ax_height.set_ylim(0, 1.0)
+
+        self.path_line, = self.ax_path.plot([], [], color='tab:blue', animated=True)
+        self.position, = self.ax_path.plot([], [], 'o', color='red', animated=True)
+        self.height_line, = self.ax_height.plot([], [], color='tab:green', animated=True)
+        self._animation = None
+        self._close_timer = None
+
+        self._seen = 0
+        self._t0 = None
+        self._path_x = np.empty(0)
+        self._path_y = np.empty(0)
+
+    def _new_records(self, written: int) -> Optional[np.ndarray]:
+        """Records from the previous frame's snapshot up to written, copied out of the ring."""
+        start, self._seen = self._seen, written
+        if written <= start:
+            return None
+        return np.concatenate(self.recorder.between(start, written))
+
+    def update(self, frame=None) -> Tuple:
+        """Refresh the animated artists; returns the ones that changed."""
+        start = perf_counter_ns()
+        written = self.recorder.written
+        new = self._new_records(written)
+        if new is None:
+            return self.path_line, self.position, self.height_line
+        if self._t0 is None:
+            self._t0 = new['t'][0]
+
+        self._path_x = np.concatenate((self._path_x, new['x']))
+        self._path_y = np.concatenate((self._path_y, new['y']))
+        if len(self._path_x) > 2 * self.max_points:
+            keep = lttb(self._path_x, self._path_y, self.max_points)
+            self._path_x, self._path_y = self._path_x[keep], self._path_y[keep]
+        x, y = self._path_x, self._path_y
+        self.path_line.set_data(x, y)
+        self.position.set_data([x[-1]], [y[-1]])
+
+        recent = np.concatenate(self.recorder.between(written - int(HEIGHT_WINDOW * TELEMETRY_RATE), written))
+        t, z = recent['t'] - self._t0, recent['z']
+        in_window = t >= t[-1] - HEIGHT_WINDOW
+        t, z = t[in_window], z[in_window]
+        keep = lttb(t, z, HEIGHT_POINTS)
+        self.height_line.set_data(t[keep], z[keep])
+
+        if self._rescale(x, y, t[-1], z):
+            # Axis limits are part of the cached background, so redraw it once
+            self.fig.canvas.draw_idle()
+        self.frame_times.lap(start)
+        return self.path_line, self.position, self.height_line
+
+    def _rescale(self, x: np.ndarray, y: np.ndarray, now: float, z: np.ndarray) -> bool:
+        changed = False
+        extent = max(np.abs(x[-1]), np.abs(y[-1])) + VIEW_MARGIN
+        if extent > self._limit:
+            self._limit = extent * 1.5
+            self.ax_path.set_xlim(-self._limit, self._limit)
+            self.ax_path.set_ylim(-self._limit, self._limit)
+            changed = True
+        if now > self.ax_height.get_xlim()[1]:
+            self.ax_height.set_xlim(now - HEIGHT_WINDOW / 2, now + HEIGHT_WINDOW / 2)
+            changed = True
+        if len(z) and z.max() > self.ax_height.get_ylim()[1]:
+            self.ax_height.set_ylim(0, z.max() * 1.5)
+            changed = True
+        return changed
+
+    def start(self) -> None:
+        self._animation = FuncAnimation(self.fig, self.update, interval=1000 / FPS, blit=True,
+                                        cache_frame_data=False)
+        # GUI backends may only be touched from this thread, so the mission thread
+        # sets done and a timer on this thread closes the window
+        self._close_timer = self.fig.canvas.new_timer(interval=CLOSE_POLL)
+        self._close_timer.add_callback(self.close_if_done)
+        self._close_timer.start()
+
+    def close_if_done(self) -> None:
+        """Close the window once done is set. Call from the GUI thread only."""
+        if self.done.is_set():
+            if self._close_timer is not None:
+                self._close_timer.stop()
+            plt.close(self.fig)
+
+    def report(self) -> None:
+        frames = self.frame_times
+        if frames.count:
+            print(f"Live plot: {frames.count} frames, update p50 {frames.percentile(50) / 1e6:.1f}ms, "
+                  f"max {frames.max / 1e6:.1f}ms")
+
+
+def run_with_live_plot(mission: Callable, scf, recorder: TelemetryRecorder, box_limit: float):
+    """
+    Fly mission(scf) on a worker thread while the plot runs on this one.
+
+    matplotlib has to stay on the main thread, so the mission is moved off
+    it. The window closes itself when the mission is over; the mission
+    thread only signals that, the closing happens on this thread.
+
+    Returns:
+        Any: whatever mission returned.
+    """
+    result = {}
+
+    def fly():
+        try:
+            result['value'] = mission(scf)
+        except BaseException as e:
+            result['error'] = e
+        finally:
+            plot.done.set()
+
+    plot = LivePathPlot(recorder, box_limit)
+    plot.start()
+    worker = threading.Thread(target=fly, name='mission', daemon=True)
+    worker.start()
+    plt.show()
+    worker.join()
+    plot.report()
+    if 'error' in result:
+        raise result['error']
+    return result.get('value')
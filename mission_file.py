@@ -0,0 +1,382 @@
+"""
+Precompiled mission files.
+
+A mission is compiled once, on the ground, into a sequence of motion
+primitives: hold a body-frame velocity and yaw rate for a duration. The
+compiler integrates the pose the drone will follow and rejects the mission
+if any point of it leaves the geofence, so nothing is planned or checked at
+launch. Flying the file is a single read followed by one setpoint per
+primitive, run by MissionRuntime so the obstacle and battery watchers stay
+active.
+
+File layout (little endian):
+    64 byte header: magic, version, record size, primitive count, CRC32 of
+        the records, geofence, takeoff height, planned duration, name
+    count * PRIMITIVE_DTYPE.itemsize bytes of primitives
+
+Usage:
+    python mission_file.py compile every_direction every_direction.mission
+    python mission_file.py compile waypoints waypoints.mission [seed]
+    python mission_file.py show waypoints.mission
+    python mission_file.py fly waypoints.mission
+"""
+
+import math
+import sys
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from mission_runtime import run_mission
+
+MAGIC = b'HDMISSN1'
+VERSION = 1
+HEADER_SIZE = 64
+GEOFENCE_STEP = 0.01        # Meters between the points checked against the geofence
+MIN_HEIGHT = 0.1            # Lowest height a mission may fly at
+MAX_HEIGHT = 1.5            # Highest height a mission may fly at
+VELOCITY = 0.2              # Default speeds, same as MotionCommander
+RATE = 360.0 / 5
+
+# Primitive kinds, only used for display; every primitive is flown the same way
+HOVER, MOVE, TURN, ARC = range(4)
+KIND_NAMES = ('hover', 'move', 'turn', 'arc')
+
+PRIMITIVE_DTYPE = np.dtype([
+    ('kind', 'u1'),
+    ('t', '<f4'),                                       # start, seconds after takeoff
+    ('duration', '<f4'),                                # seconds
+    ('vx', '<f4'), ('vy', '<f4'), ('vz', '<f4'),        # body-frame velocity in m/s
+    ('yaw_rate', '<f4'),                                # degrees/s
+    ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),           # planned pose at the end, world frame
+    ('yaw', '<f4'),                                     # degrees
+])
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('record_size', '<u4'),
+    ('count', '<u4'),
+    ('crc', '<u4'),
+    ('box_limit', '<f4'),
+    ('height', '<f4'),
+    ('duration', '<f8'),
+    ('name', 'S24'),
+])
+
+Pose = Tuple[float, float, float, float]    # x, y, z in meters, yaw in degrees
+
+
+class GeofenceError(ValueError):
+    """A mission leaves its geofence."""
+
+
+def _advance(pose: Pose, vx: float, vy: float, vz: float, yaw_rate: float, t: float) -> Pose:
+    """Pose after holding a body-frame velocity and yaw rate for t seconds."""
+    x, y, z, yaw = pose
+    theta0 = math.radians(yaw)
+    if yaw_rate == 0.0:
+        c, s = math.cos(theta0), math.sin(theta0)
+        return x + (vx * c - vy * s) * t, y + (vx * s + vy * c) * t, z + vz * t, yaw
+    omega = math.radians(yaw_rate)
+    theta1 = theta0 + omega * t
+    sin_d = (math.sin(theta1) - math.sin(theta0)) / omega
+    cos_d = (math.cos(theta0) - math.cos(theta1)) / omega
+    return (x + vx * sin_d - vy * cos_d, y + vx * cos_d + vy * sin_d, z + vz * t,
+            yaw + yaw_rate * t)
+
+
+class MissionBuilder:
+    """
+    Compiles MotionCommander-style moves into primitives, checking each one
+    against the geofence as it is added.
+
+    Args:
+        name (str): stored in the file header.
+        box_limit (float): the drone must stay within |x|, |y| <= box_limit of the takeoff point.
+        height (float): takeoff height in meters.
+    """
+
+    def __init__(self, name: str, box_limit: float, height: float):
+        self.name = name
+        self.box_limit = box_limit
+        self.height = height
+        self.pose: Pose = (0.0, 0.0, height, 0.0)
+        self.time = 0.0
+        self._primitives: List[tuple] = []
+        self._check(self.pose, 'takeoff')
+
+    def _check(self, pose: Pose, what: str) -> None:
+        x, y, z, _ = pose
+        limit = self.box_limit + 1e-6
+        if abs(x) > limit or abs(y) > limit:
+            raise GeofenceError(f'{self.name}: {what} reaches ({x:.2f}, {y:.2f}), '
+                                f'outside the {self.box_limit}m box')
+        if not MIN_HEIGHT - 1e-6 <= z <= MAX_HEIGHT + 1e-6:
+            raise GeofenceError(f'{self.name}: {what} reaches height {z:.2f}m, '
+                                f'outside {MIN_HEIGHT}-{MAX_HEIGHT}m')
+
+    def primitive(self, kind: int, vx: float, vy: float, vz: float, yaw_rate: float, duration: float) -> None:
+        """Hold a body-frame velocity and yaw rate for duration seconds."""
+        if duration <= 0:
+            return
+        speed = math.sqrt(vx * vx + vy * vy + vz * vz)
+        steps = max(1, math.ceil(speed * duration / GEOFENCE_STEP))
+        what = f'primitive {len(self._primitives)} ({KIND_NAMES[kind]})'
+        for i in range(1, steps + 1):
+            self._check(_advance(self.pose, vx, vy, vz, yaw_rate, duration * i / steps), what)
+        self.pose = _advance(self.pose, vx, vy, vz, yaw_rate, duration)
+        self._primitives.append((kind, self.time, duration, vx, vy, vz, yaw_rate) + self.pose)
+        self.time += duration
+
+    # Same moves as MotionCommander
+
+    def hover(self, seconds: float) -> None:
+        self.primitive(HOVER, 0.0, 0.0, 0.0, 0.0, seconds)
+
+    def move_distance(self, distance_x_m: float, distance_y_m: float, distance_z_m: float,
+                      velocity: float = VELOCITY) -> None:
+        distance = math.sqrt(distance_x_m ** 2 + distance_y_m ** 2 + distance_z_m ** 2)
+        if distance == 0:
+            return
+        duration = distance / velocity
+        self.primitive(MOVE, distance_x_m / duration, distance_y_m / duration, distance_z_m / duration,
+                       0.0, duration)
+
+    def forward(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        self.move_distance(distance_m, 0.0, 0.0, velocity)
+
+    def back(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        self.move_distance(-distance_m, 0.0, 0.0, velocity)
+
+    def left(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        self.move_distance(0.0, distance_m, 0.0, velocity)
+
+    def right(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        self.move_distance(0.0, -distance_m, 0.0, velocity)
+
+    def up(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        self.move_distance(0.0, 0.0, distance_m, velocity)
+
+    def down(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        self.move_distance(0.0, 0.0, -distance_m, velocity)
+
+    def turn_left(self, angle_degrees: float, rate: float = RATE) -> None:
+        self.primitive(TURN, 0.0, 0.0, 0.0, rate, angle_degrees / rate)
+
+    def turn_right(self, angle_degrees: float, rate: float = RATE) -> None:
+        self.primitive(TURN, 0.0, 0.0, 0.0, -rate, angle_degrees / rate)
+
+    def circle_left(self, radius_m: float, velocity: float = VELOCITY, angle_degrees: float = 360.0) -> None:
+        circumference = 2 * radius_m * math.pi
+        self.primitive(ARC, velocity, 0.0, 0.0, 360.0 * velocity / circumference,
+                       circumference * angle_degrees / 360.0 / velocity)
+
+    def circle_right(self, radius_m: float, velocity: float = VELOCITY, angle_degrees: float = 360.0) -> None:
+        circumference = 2 * radius_m * math.pi
+        self.primitive(ARC, velocity, 0.0, 0.0, -360.0 * velocity / circumference,
+                       circumference * angle_degrees / 360.0 / velocity)
+
+    def goto(self, x: float, y: float, velocity: float = VELOCITY) -> None:
+        """Fly straight to a world-frame point at constant height."""
+        px, py, _, yaw = self.pose
+        dx, dy = x - px, y - py
+        c, s = math.cos(math.radians(yaw)), math.sin(math.radians(yaw))
+        # World displacement into the body frame
+        self.move_distance(dx * c + dy * s, -dx * s + dy * c, 0.0, velocity)
+
+    def compile(self) -> 'Mission':
+        records = np.array(self._primitives, dtype=PRIMITIVE_DTYPE)
+        return Mission(self.name, self.box_limit, self.height, self.time, records)
+
+
+class Mission:
+    """
+    Compiled mission.
+
+    Args:
+        name (str): mission name.
+        box_limit (float): geofence it was checked against.
+        height (float): takeoff height in meters.
+        duration (float): planned seconds from takeoff to landing.
+        primitives (np.ndarray): PRIMITIVE_DTYPE records.
+    """
+
+    def __init__(self, name: str, box_limit: float, height: float, duration: float, primitives: np.ndarray):
+        self.name = name
+        self.box_limit = box_limit
+        self.height = height
+        self.duration = duration
+        self.primitives = primitives
+
+    def __len__(self) -> int:
+        return len(self.primitives)
+
+    def save(self, path: str) -> None:
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['record_size'] = PRIMITIVE_DTYPE.itemsize
+        header['count'] = len(self.primitives)
+        header['crc'] = zlib.crc32(self.primitives.tobytes())
+        header['box_limit'] = self.box_limit
+        header['height'] = self.height
+        header['duration'] = self.duration
+        header['name'] = self.name.encode()[:HEADER_DTYPE['name'].itemsize]
+        with open(path, 'wb') as f:
+            f.write(header.tobytes().ljust(HEADER_SIZE, b'\0'))
+            f.write(self.primitives.tobytes())
+
+    def report(self) -> None:
+        print(f"Mission '{self.name}': {len(self)} primitives, {self.duration:.1f}s, "
+              f"height {self.height}m, geofence {self.box_limit}m")
+        for p in self.primitives:
+            print(f"  {p['t']:6.2f}s {KIND_NAMES[p['kind']]:>5} {p['duration']:5.2f}s "
+                  f"v=({p['vx']:+.2f}, {p['vy']:+.2f}, {p['vz']:+.2f}) yaw rate {p['yaw_rate']:+6.1f} "
+                  f"-> ({p['x']:+.2f}, {p['y']:+.2f}, {p['z']:.2f}) yaw {p['yaw']:.0f}")
+
+
+def load_mission(path: str, mmap: bool = False) -> Mission:
+    """
+    Read a compiled mission.
+
+    Args:
+        path (str): mission file.
+        mmap (bool): map the file instead of reading it; the primitives then
+            alias the file.
+
+    Returns:
+        Mission: the mission, as checked when it was compiled.
+    """
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        with open(path, 'rb') as f:
+            data = np.frombuffer(f.read(), dtype=np.uint8)
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f'{path} is not a mission file')
+    header = data[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)[0]
+    if header['magic'] != MAGIC or header['record_size'] != PRIMITIVE_DTYPE.itemsize:
+        raise ValueError(f'{path} is not a mission file')
+    if header['version'] != VERSION:
+        raise ValueError(f'{path} has version {header["version"]}, expected {VERSION}')
+    end = HEADER_SIZE + int(header['count']) * PRIMITIVE_DTYPE.itemsize
+    if len(data) != end:
+        raise ValueError(f'{path} is truncated')
+    primitives = data[HEADER_SIZE:end].view(PRIMITIVE_DTYPE)
+    if zlib.crc32(primitives.tobytes()) != header['crc']:
+        raise ValueError(f'{path} is corrupted')
+    return Mission(header['name'].decode(), float(header['box_limit']), float(header['height']),
+                   float(header['duration']), primitives)
+
+
+async def replay(rt, mission: Mission) -> None:
+    """
+    Fly the primitives of mission with a MissionRuntime. Each one ends at its
+    planned time after the start, so rounding to ticks does not add up.
+    """
+    start = rt.now
+    try:
+        for p in mission.primitives:
+            rt.mc.start_linear_motion(float(p['vx']), float(p['vy']), float(p['vz']), float(p['yaw_rate']))
+            await rt.wait(start + float(p['t'] + p['duration']) - rt.now)
+        print(f"Mission '{mission.name}' flown in {rt.now - start:.2f}s (planned {mission.duration:.2f}s)")
+    finally:
+        rt.mc.stop()
+
+
+def fly_mission(scf, mission: Mission) -> Optional[str]:
+    """
+    Take off, fly a compiled mission under the runtime's watchers and land.
+
+    Returns:
+        str or None: why the mission was interrupted, None when it finished.
+    """
+    return run_mission(scf, lambda rt: replay(rt, mission), mission.height)
+
+
+# Missions that can be compiled from the command line
+
+def compile_every_direction() -> Mission:
+    """SimpleFlight's move_every_direction as a mission file."""
+    import SimpleFlight as flight
+
+    b = MissionBuilder('every_direction', flight.BOX_LIMIT, flight.DEFAULT_HEIGHT)
+    b.hover(3)
+    b.forward(0.3)
+    b.hover(1)
+    b.up(0.1)
+    b.hover(1)
+    b.circle_right(0.1, velocity=0.5, angle_degrees=270)
+    b.down(0.3)
+    b.hover(1)
+    b.left(0.3, velocity=0.4)
+    b.hover(1)
+    b.forward(0.3)
+    return b.compile()
+
+
+def compile_waypoints(seed: int = 0) -> Mission:
+    """
+    execute_waypoint_mission's boxes with the waypoints drawn and ordered
+    now instead of at launch.
+    """
+    import random
+    import proj2_wes_alejandro as waypoints
+    from path_order import order_waypoints
+
+    rng = random.Random(seed)
+    b = MissionBuilder(f'waypoints-{seed}', waypoints.BOX_LIMIT, waypoints.DEFAULT_HEIGHT)
+    current = waypoints.INIT_POS
+    for box in range(waypoints.NUMBER_OF_BOXES):
+        dummy = waypoints.generate_dummy_waypoints(waypoints.MAX_DUMMY, seed=seed * 1000 + box)
+        destination = (rng.choice([-waypoints.BOX_LIMIT, waypoints.BOX_LIMIT]),
+                       rng.choice([-waypoints.BOX_LIMIT, waypoints.BOX_LIMIT]))
+        dummy, _ = order_waypoints(dummy, current, destination, waypoints.MAX_VEL)
+        for x, y in dummy + [destination]:
+            b.goto(x, y, waypoints.MAX_VEL)
+        current = destination
+    return b.compile()
+
+
+MISSIONS: Dict[str, Callable[..., Mission]] = {
+    'every_direction': compile_every_direction,
+    'waypoints': compile_waypoints,
+}
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 2 else None
+    if command == 'compile' and len(sys.argv) >= 4 and sys.argv[2] in MISSIONS:
+        args = [int(a) for a in sys.argv[4:]]
+        try:
+            mission = MISSIONS[sys.argv[2]](*args)
+        except GeofenceError as e:
+            print(f'Not compiled: {e}')
+            sys.exit(1)
+        mission.save(sys.argv[3])
+        mission.report()
+    elif command == 'show':
+        load_mission(sys.argv[2]).report()
+    elif command == 'fly':
+        import cflib.crtp
+        from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
+        from cflib.utils import uri_helper
+
+        from preflight import require_decks
+        from toc_cache import make_crazyflie
+
+        mission = load_mission(sys.argv[2])
+        uri = sys.argv[3] if len(sys.argv) > 3 else uri_helper.uri_from_env(default='radio://0/80/2M/E7E7E7E7E7')
+        cflib.crtp.init_drivers()
+        with SyncCrazyflie(uri, cf=make_crazyflie()) as scf:
+            require_decks(scf)
+            scf.cf.platform.send_arming_request(True)
+            time.sleep(1.0)  # Wait for arming process to complete
+            reason = fly_mission(scf, mission)
+        print(f"Mission {'interrupted: ' + reason if reason else 'complete'}")
+    else:
+        print(__doc__)
+        sys.exit(1)
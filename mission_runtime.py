@@ -0,0 +1,316 @@
+"""
+Asyncio mission runtime with sensor supervision.
+
+MotionCommander's blocking moves (mc.forward(), mc.circle_right(), ...) hold
+the thread until the move is over, so nothing looks at the rangers or the
+battery in the meantime. MissionRuntime turns every maneuver into a
+coroutine that starts the motion and then waits, tick by tick, for it to
+finish. Missions are written as `async def mission(rt)` and await the
+maneuvers in order, or spawn() several tasks that run side by side.
+
+Watchers are conditions checked on every tick. The first one that becomes
+true stops the drone and cancels the mission, including the maneuver it is
+in the middle of, so an obstacle or a low battery interrupts a move within
+one tick instead of after it.
+
+Everything runs off a single tick source: each tick is one time.sleep(TICK)
+on the runtime's thread, then the watchers are checked and every task
+waiting for the tick is woken. asyncio's own timers are never used, so in
+the simulator, where time.sleep() advances the virtual clock and delivers
+the log packets, missions run exactly as they do against a real drone.
+
+Example:
+    async def square(rt):
+        for _ in range(4):
+            await rt.forward(0.5)
+            await rt.turn_left(90)
+
+    reason = run_mission(scf, square, height=0.5)
+    if reason:
+        print(f'Mission interrupted: {reason}')
+"""
+
+import asyncio
+import math
+import threading
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple
+
+from cflib.crazyflie.log import LogConfig
+from cflib.positioning.motion_commander import MotionCommander
+
+from range_events import DIRECTIONS, RangeEventStream
+
+TICK = 0.01                 # Seconds per control tick
+VELOCITY = 0.2              # Default maneuver speed, same as MotionCommander
+RATE = 360.0 / 5            # Default turn rate in degrees/s, same as MotionCommander
+OBSTACLE_DISTANCE = 0.2     # Anything closer than this in meters interrupts the mission
+LOW_BATTERY = 3.2           # Battery voltage below which the mission is interrupted
+BATTERY_PERIOD_MS = 500     # pm.vbat log period
+
+Condition = Callable[[], bool]
+Mission = Callable[['MissionRuntime'], Awaitable[Any]]
+
+
+class BatteryMonitor:
+    """
+    Keeps the latest battery voltage from the pm log group.
+
+    Args:
+        scf (SyncCrazyflie): connected Crazyflie.
+        period_ms (int): log period in milliseconds.
+    """
+
+    def __init__(self, scf, period_ms: int = BATTERY_PERIOD_MS):
+        self._cf = scf.cf
+        self._log_config = LogConfig('battery', period_ms)
+        self._log_config.add_variable('pm.vbat', 'float')
+        self._log_config.data_received_cb.add_callback(self._data_received)
+        self.voltage: Optional[float] = None
+
+    def _data_received(self, timestamp, data, logconf) -> None:
+        self.voltage = data['pm.vbat']
+
+    def start(self) -> None:
+        self._cf.log.add_config(self._log_config)
+        self._log_config.start()
+
+    def stop(self) -> None:
+        self._log_config.delete()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def obstacle_within(ranges: RangeEventStream, distance: float = OBSTACLE_DISTANCE,
+                    directions: Sequence[str] = DIRECTIONS) -> Condition:
+    """Condition that is true while a ranger in directions reads less than distance."""
+    def close() -> bool:
+        sample = ranges.latest
+        if sample is None:
+            return False
+        for name in directions:
+            value = getattr(sample, name)
+            if value is not None and value < distance:
+                return True
+        return False
+    return close
+
+
+def battery_below(battery: BatteryMonitor, voltage: float = LOW_BATTERY) -> Condition:
+    """Condition that is true once the reported battery voltage drops below voltage."""
+    return lambda: battery.voltage is not None and battery.voltage < voltage
+
+
+class MissionRuntime:
+    """
+    Runs an async mission on a flying drone, one tick at a time.
+
+    Args:
+        motion_commander (MotionCommander): commander of the flying drone.
+        tick (float): seconds per control tick.
+    """
+
+    def __init__(self, motion_commander, tick: float = TICK):
+        self.mc = motion_commander
+        self.tick = tick
+        self.ticks = 0
+        self.interrupted: Optional[str] = None      # Reason of the watcher that stopped the mission
+        self.interrupted_at: Optional[float] = None
+        self._watchers: List[Tuple[Condition, str]] = []
+        self._tasks: List[asyncio.Task] = []
+        self._next_tick: Optional[asyncio.Future] = None
+
+    @property
+    def now(self) -> float:
+        return time.time()
+
+    # Supervision
+
+    def watch(self, condition: Condition, reason: str) -> None:
+        """Interrupt the mission with reason on the first tick condition() is true."""
+        self._watchers.append((condition, reason))
+
+    def spawn(self, coroutine: Awaitable) -> asyncio.Task:
+        """Run coroutine alongside the mission. It is cancelled with the mission."""
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.append(task)
+        return task
+
+    async def run_blocking(self, function: Callable, *args) -> Any:
+        """
+        Call a blocking function, e.g. input(), on a worker thread while the ticks go on.
+
+        The thread is a daemon that feeds a future instead of a thread of the
+        loop's executor, which asyncio.run() would wait for: an interrupted
+        mission lands right away and leaves the call to finish on its own.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def settle(result: Any, error: Optional[BaseException]) -> None:
+            if future.done():
+                return  # Cancelled by an interrupt in the meantime
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+        def worker() -> None:
+            try:
+                result, error = function(*args), None
+            except BaseException as exc:
+                result, error = None, exc
+            try:
+                loop.call_soon_threadsafe(settle, result, error)
+            except RuntimeError:
+                pass  # The mission is over and its loop closed
+
+        threading.Thread(target=worker, name='run_blocking', daemon=True).start()
+        return await future
+
+    def _interrupt(self, reason: str) -> None:
+        self.interrupted = reason
+        self.interrupted_at = self.now
+        self.mc.stop()
+        for task in self._tasks:
+            task.cancel()
+
+    # Waiting
+
+    async def next_tick(self) -> float:
+        """Wait for the next tick and return its time."""
+        return await asyncio.shield(self._next_tick)
+
+    async def wait(self, seconds: float) -> None:
+        """Wait for seconds, rounded up to whole ticks."""
+        deadline = self.now + seconds
+        while self.now < deadline - 1e-9:
+            await self.next_tick()
+
+    async def hover(self, seconds: float) -> None:
+        self.mc.stop()
+        await self.wait(seconds)
+
+    # Maneuvers, same arguments as the blocking MotionCommander ones
+
+    async def _hold(self, seconds: float) -> None:
+        """Keep the motion that was just started for seconds, stopping when done or cancelled."""
+        try:
+            await self.wait(seconds)
+        finally:
+            self.mc.stop()
+
+    async def move_distance(self, distance_x_m: float, distance_y_m: float, distance_z_m: float,
+                            velocity: float = VELOCITY) -> None:
+        distance = math.sqrt(distance_x_m ** 2 + distance_y_m ** 2 + distance_z_m ** 2)
+        if distance == 0:
+            return
+        duration = distance / velocity
+        self.mc.start_linear_motion(distance_x_m / duration, distance_y_m / duration, distance_z_m / duration)
+        await self._hold(duration)
+
+    async def forward(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        await self.move_distance(distance_m, 0.0, 0.0, velocity)
+
+    async def back(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        await self.move_distance(-distance_m, 0.0, 0.0, velocity)
+
+    async def left(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        await self.move_distance(0.0, distance_m, 0.0, velocity)
+
+    async def right(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        await self.move_distance(0.0, -distance_m, 0.0, velocity)
+
+    async def up(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        await self.move_distance(0.0, 0.0, distance_m, velocity)
+
+    async def down(self, distance_m: float, velocity: float = VELOCITY) -> None:
+        await self.move_distance(0.0, 0.0, -distance_m, velocity)
+
+    async def turn_left(self, angle_degrees: float, rate: float = RATE) -> None:
+        self.mc.start_turn_left(rate)
+        await self._hold(angle_degrees / rate)
+
+    async def turn_right(self, angle_degrees: float, rate: float = RATE) -> None:
+        self.mc.start_turn_right(rate)
+        await self._hold(angle_degrees / rate)
+
+    async def circle_left(self, radius_m: float, velocity: float = VELOCITY, angle_degrees: float = 360.0) -> None:
+        self.mc.start_circle_left(radius_m, velocity)
+        await self._hold(2 * radius_m * math.pi * angle_degrees / 360.0 / velocity)
+
+    async def circle_right(self, radius_m: float, velocity: float = VELOCITY, angle_degrees: float = 360.0) -> None:
+        self.mc.start_circle_right(radius_m, velocity)
+        await self._hold(2 * radius_m * math.pi * angle_degrees / 360.0 / velocity)
+
+    # Running
+
+    def run(self, mission: Mission) -> Optional[str]:
+        """
+        Fly mission(self) until it returns or a watcher interrupts it.
+
+        Returns:
+            str or None: reason of the watcher that interrupted the mission,
+                None when it ran to the end.
+        """
+        return asyncio.run(self._run(mission))
+
+    async def _run(self, mission: Mission) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        self._next_tick = loop.create_future()
+        main = self.spawn(mission(self))
+        await asyncio.sleep(0)  # Let the mission start its first maneuver
+        while not main.done():
+            time.sleep(self.tick)
+            self.ticks += 1
+            if self.interrupted is None:
+                for condition, reason in self._watchers:
+                    if condition():
+                        self._interrupt(reason)
+                        break
+            tick, self._next_tick = self._next_tick, loop.create_future()
+            tick.set_result(self.now)
+            await asyncio.sleep(0)  # Every task woken by the tick runs up to its next await
+        for task in self._tasks:
+            task.cancel()
+        try:
+            await main
+        except asyncio.CancelledError:
+            if self.interrupted is None:
+                raise
+        return self.interrupted
+
+
+def run_mission(scf, mission: Mission, height: float = 0.3,
+                obstacle_distance: Optional[float] = OBSTACLE_DISTANCE,
+                low_battery: Optional[float] = LOW_BATTERY) -> Optional[str]:
+    """
+    Take off, fly mission under supervision and land.
+
+    Args:
+        scf (SyncCrazyflie): connected Crazyflie with Flow and Multi-ranger decks.
+        mission (Mission): `async def mission(rt)` using the MissionRuntime.
+        height (float): takeoff height in meters.
+        obstacle_distance (float or None): interrupt when anything is closer, None to not watch.
+        low_battery (float or None): interrupt below this voltage, None to not watch.
+
+    Returns:
+        str or None: why the mission was interrupted, None when it finished.
+    """
+    with MotionCommander(scf, default_height=height) as mc, \
+            RangeEventStream(scf) as ranges, BatteryMonitor(scf) as battery:
+        runtime = MissionRuntime(mc)
+        if obstacle_distance is not None:
+            runtime.watch(obstacle_within(ranges, obstacle_distance), 'obstacle')
+        if low_battery is not None:
+            runtime.watch(battery_below(battery, low_battery), 'low battery')
+        reason = runtime.run(mission)
+        if reason is not None:
+            print(f'Mission interrupted ({reason}) after {runtime.ticks} ticks - landing')
+        mc.stop()
+    return reason
@@ -0,0 +1,338 @@
+"""
+Parallel Monte Carlo mission simulator.
+
+Runs thousands of seeded missions in the simulator on a process pool and
+streams one row of metrics per run into a columnar results directory:
+
+    <directory>/schema.json     column names and dtypes, rows written
+    <directory>/<column>.bin    the column's values, little endian, one after another
+
+Each column is appended to in blocks while the runs come in, so memory use
+does not depend on the number of runs, and a column can be read on its own
+(and memory-mapped) with load_columns().
+
+Every run is seeded from its index, so the results do not depend on how the
+runs were spread over the workers, and a surprising row can be flown again
+with run_once(). Workers only send back a tuple of numbers and take runs in
+chunks, so the pool scales with the number of cores.
+
+Scenarios:
+    waypoints   execute_waypoint_mission() for every setting of waypoint_settings()
+    avoider     project3_2's reactive PathFollower through random obstacles
+
+Usage:
+    python monte_carlo.py waypoints RUNS_PER_SETTING DIRECTORY [WORKERS]
+    python monte_carlo.py avoider RUNS DIRECTORY [WORKERS]
+    python monte_carlo.py summary DIRECTORY
+"""
+
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+import sim_drone
+from sim_drone import World
+
+CHUNK_SIZE = 16             # Runs handed to a worker at a time
+FLUSH_ROWS = 4096           # Rows buffered before they are appended to the column files
+SWEEP = {                   # waypoints: values tried for each proj2 setting
+    'box_limit': (0.2, 0.3, 0.5),
+    'max_dummy': (2, 4, 8),
+    'move_duration': (2.0, 4.0),     # Only used by the stop-and-go flight
+    'smooth': (False, True),        # SMOOTH_TRAJECTORY
+}
+UNUSED_MOVE_DURATION = 0.0  # move_duration recorded for smooth runs, which do not use it
+AVOIDER_TIMEOUT = 60.0      # Simulated seconds before a reactive run counts as stuck
+AVOIDER_OBSTACLES = 3       # At most this many obstacles between the start and the goal
+AVOIDER_NOISE = 0.01        # Range noise in meters
+
+Row = Tuple[float, ...]
+
+# Scenario -> columns and their dtypes, in the order the run functions return them
+COLUMNS = {
+    'waypoints': [('seed', '<i8'), ('box_limit', '<f4'), ('max_dummy', '<i4'), ('move_duration', '<f4'),
+                  ('smooth', 'u1'), ('sim_seconds', '<f8'), ('wall_seconds', '<f8'), ('waypoints', '<i4'),
+                  ('timeouts', '<i4'), ('collisions', '<i4')],
+    'avoider': [('seed', '<i8'), ('obstacles', '<i4'), ('reached', 'u1'), ('collisions', '<i4'),
+                ('sim_seconds', '<f8'), ('wall_seconds', '<f8'), ('distance', '<f4'),
+                ('final_x', '<f4'), ('final_y', '<f4')],
+}
+
+
+# Runs
+
+@contextlib.contextmanager
+def _patched(module, **values):
+    """Temporarily set module attributes."""
+    saved = {name: getattr(module, name) for name in values}
+    for name, value in values.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+def run_waypoints(seed: int, box_limit: float, max_dummy: int, move_duration: float, smooth: bool) -> Row:
+    """
+    Fly execute_waypoint_mission() once with the given proj2 settings.
+
+    A timeout is a fly_to() that gave up on its waypoint, or a smooth
+    trajectory that did not reach its last waypoint. move_duration is
+    left at the mission's value for smooth runs.
+    """
+    import proj2_wes_alejandro as mission
+
+    random.seed(seed)
+    seeds = np.random.default_rng(seed)
+    generate = mission.generate_dummy_waypoints
+    fly_to = mission.fly_to
+    fly_trajectory = mission.fly_trajectory
+    timeouts = 0
+
+    def seeded_waypoints(num_points, distribution='uniform', seed=None):
+        return generate(num_points, distribution, int(seeds.integers(2 ** 32)))
+
+    def counted_fly_to(*args, **kwargs):
+        nonlocal timeouts
+        reached = fly_to(*args, **kwargs)
+        timeouts += not reached
+        return reached
+
+    def counted_fly_trajectory(*args, **kwargs):
+        nonlocal timeouts
+        report = fly_trajectory(*args, **kwargs)
+        timeouts += not report.reached
+        return report
+
+    def fly(scf):
+        return mission.execute_waypoint_mission(scf, history=[]), scf.cf.drone.collisions
+
+    settings = dict(BOX_LIMIT=box_limit, MAX_DUMMY=max_dummy, SMOOTH_TRAJECTORY=bool(smooth))
+    if not smooth:
+        settings['MOVE_DURATION'] = move_duration
+    with _patched(mission, **settings, generate_dummy_waypoints=seeded_waypoints,
+                  fly_to=counted_fly_to, fly_trajectory=counted_fly_trajectory):
+        (flown, collisions), sim_seconds, wall_seconds = sim_drone.run_simulated(fly, mission,
+                                                                                 world=World(seed=seed))
+    return (seed, box_limit, max_dummy, move_duration, smooth, sim_seconds, wall_seconds, flown, timeouts,
+            collisions)
+
+
+def random_obstacles(rng: random.Random, count: int) -> List[Tuple[float, float, float]]:
+    """Obstacles between the start and a goal 1 m ahead, clear of both."""
+    return [(rng.uniform(0.3, 0.8), rng.uniform(-0.2, 0.2), rng.uniform(0.04, 0.1)) for _ in range(count)]
+
+
+def run_avoider(seed: int) -> Row:
+    """Fly project3_2's reactive path follower once through random obstacles."""
+    import project3_2 as mission
+
+    rng = random.Random(seed)
+    obstacles = random_obstacles(rng, rng.randint(0, AVOIDER_OBSTACLES))
+    world = World(obstacles, noise=AVOIDER_NOISE, seed=seed)
+
+    def fly(scf):
+        with mission.MotionCommander(scf, default_height=mission.FLIGHT_HEIGHT) as mc:
+            follower = mission.follow_path(scf, mc, timeout=AVOIDER_TIMEOUT)
+            drone = scf.cf.drone
+            return follower, drone.collisions, drone.x, drone.y
+
+    (follower, collisions, x, y), sim_seconds, wall_seconds = sim_drone.run_simulated(fly, mission, world=world)
+    reached = follower.distance_traveled >= follower.target_distance
+    return (seed, len(obstacles), reached, collisions, sim_seconds, wall_seconds,
+            follower.odometry.path_length, x, y)
+
+
+SCENARIOS = {
+    'waypoints': run_waypoints,
+    'avoider': run_avoider,
+}
+
+
+def run_once(task: Tuple[str, tuple]) -> Row:
+    """Run one (scenario, arguments) task with the mission output silenced."""
+    scenario, args = task
+    with contextlib.redirect_stdout(io.StringIO()):
+        return SCENARIOS[scenario](*args)
+
+
+# Columnar results
+
+class ColumnWriter:
+    """
+    Appends rows to one binary file per column.
+
+    Args:
+        directory (str): created if needed; existing columns are replaced.
+        columns (Sequence[Tuple[str, str]]): column names and numpy dtypes.
+    """
+
+    def __init__(self, directory: str, columns: Sequence[Tuple[str, str]]):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dtype = np.dtype(list(columns))
+        self.rows = 0
+        self._buffer: List[Row] = []
+        self._files = {name: open(os.path.join(directory, name + '.bin'), 'wb') for name, _ in columns}
+
+    def append(self, row: Row) -> None:
+        self._buffer.append(row)
+        if len(self._buffer) >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        block = np.array(self._buffer, dtype=self.dtype)
+        for name, f in self._files.items():
+            f.write(np.ascontiguousarray(block[name]).tobytes())
+            f.flush()
+        self.rows += len(block)
+        self._buffer = []
+        self._write_schema()
+
+    def _write_schema(self) -> None:
+        schema = {'rows': self.rows, 'columns': [[name, self.dtype[name].str] for name in self.dtype.names]}
+        with open(os.path.join(self.directory, 'schema.json'), 'w') as f:
+            json.dump(schema, f, indent=2)
+
+    def close(self) -> None:
+        self.flush()
+        self._write_schema()
+        for f in self._files.values():
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def load_columns(directory: str, names: Iterable[str] = None, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Read columns of a results directory.
+
+    Args:
+        directory (str): written by ColumnWriter.
+        names (Iterable[str] or None): columns to read, all when None.
+        mmap (bool): map the files instead of reading them.
+
+    Returns:
+        Dict[str, np.ndarray]: one array per column, all of the same length.
+    """
+    with open(os.path.join(directory, 'schema.json')) as f:
+        schema = json.load(f)
+    dtypes = dict(schema['columns'])
+    columns = {}
+    for name in names or dtypes:
+        path = os.path.join(directory, name + '.bin')
+        if mmap and schema['rows']:
+            columns[name] = np.memmap(path, dtype=dtypes[name], mode='r', shape=(schema['rows'],))
+        else:
+            columns[name] = np.fromfile(path, dtype=dtypes[name], count=schema['rows'])
+    return columns
+
+
+# Driver
+
+def waypoint_settings() -> List[Tuple[float, int, float, bool]]:
+    """
+    Every (box_limit, max_dummy, move_duration, smooth) setting of the SWEEP.
+
+    Smooth runs do not use move_duration, so they are flown once per box and
+    dummy setting, with UNUSED_MOVE_DURATION recorded.
+    """
+    settings = []
+    for box_limit, max_dummy, smooth in itertools.product(SWEEP['box_limit'], SWEEP['max_dummy'], SWEEP['smooth']):
+        durations = (UNUSED_MOVE_DURATION,) if smooth else SWEEP['move_duration']
+        settings.extend((box_limit, max_dummy, move_duration, smooth) for move_duration in durations)
+    return settings
+
+
+def tasks(scenario: str, runs: int) -> Iterator[Tuple[str, tuple]]:
+    """Every run of a scenario, seeded by its index."""
+    if scenario == 'waypoints':
+        settings = waypoint_settings()
+        for seed in range(runs * len(settings)):
+            yield scenario, (seed,) + settings[seed % len(settings)]
+    else:
+        for seed in range(runs):
+            yield scenario, (seed,)
+
+
+def run_monte_carlo(scenario: str, runs: int, directory: str, workers: int = None) -> int:
+    """
+    Run a scenario on a process pool and stream the rows to directory.
+
+    Args:
+        scenario (str): 'waypoints' (runs per waypoint_settings() entry) or 'avoider'.
+        runs (int): number of runs, per setting for 'waypoints'.
+        directory (str): results directory.
+        workers (int or None): processes, one per core when None.
+
+    Returns:
+        int: rows written.
+    """
+    start = time.perf_counter()
+    total = runs * len(waypoint_settings()) if scenario == 'waypoints' else runs
+    with ColumnWriter(directory, COLUMNS[scenario]) as writer, multiprocessing.Pool(workers) as pool:
+        for done, row in enumerate(pool.imap_unordered(run_once, tasks(scenario, runs), CHUNK_SIZE), 1):
+            writer.append(row)
+            if done % 1000 == 0 or done == total:
+                elapsed = time.perf_counter() - start
+                print(f"{done}/{total} runs, {done / elapsed:.0f} runs/s")
+    return writer.rows
+
+
+def summary(directory: str) -> None:
+    """Print per-setting statistics of a results directory."""
+    columns = load_columns(directory)
+    if 'reached' in columns:
+        reached = columns['reached'].astype(bool)
+        collided = columns['collisions'] > 0
+        print(f"{len(reached)} runs: goal missed in {(~reached).mean() * 100:.1f}%, "
+              f"collided in {collided.mean() * 100:.1f}%")
+        for count in np.unique(columns['obstacles']):
+            mask = columns['obstacles'] == count
+            seconds = columns['sim_seconds'][mask & reached]
+            mean = f"{seconds.mean():.1f}s to the goal" if len(seconds) else 'never reached'
+            print(f"  {count} obstacles: {mask.sum()} runs, missed {(~reached[mask]).mean() * 100:5.1f}%, "
+                  f"collided {collided[mask].mean() * 100:5.1f}%, {mean}")
+        return
+
+    keys = np.stack([columns[name] for name in SWEEP], axis=1)
+    settings, inverse = np.unique(keys, axis=0, return_inverse=True)
+    print(f"{len(keys)} runs over {len(settings)} settings")
+    print(f"{'box':>5} {'dummy':>5} {'move':>7} {'smooth':>6} {'runs':>6} {'mean':>7} {'p95':>7} {'timeouts':>8}")
+    for i, (box_limit, max_dummy, move_duration, smooth) in enumerate(settings):
+        mask = inverse.ravel() == i
+        seconds = columns['sim_seconds'][mask]
+        timeouts = columns['timeouts'][mask] / np.maximum(columns['waypoints'][mask], 1)
+        move = f"{'-':>7}" if smooth else f"{move_duration:6.1f}s"
+        print(f"{box_limit:5.2f} {max_dummy:5.0f} {move} {'yes' if smooth else 'no':>6} {mask.sum():6d} "
+              f"{seconds.mean():6.1f}s {np.percentile(seconds, 95):6.1f}s {timeouts.mean() * 100:7.1f}%")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == 'summary':
+        summary(sys.argv[2])
+    elif len(sys.argv) in (4, 5) and sys.argv[1] in SCENARIOS:
+        workers = int(sys.argv[4]) if len(sys.argv) == 5 else None
+        rows = run_monte_carlo(sys.argv[1], int(sys.argv[2]), sys.argv[3], workers)
+        print(f"{rows} rows written to {sys.argv[3]}")
+        summary(sys.argv[3])
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,218 @@
+"""
+Sparse occupancy grid built from Multi-ranger readings.
+
+The avoidance controllers used to look at each range sample once and then
+forget it. OccupancyGrid keeps what the rangers have seen: every reading is
+cast as a ray from the estimated position, the cells it passes through are
+marked free and the cell where it ends is marked occupied. Cells are kept
+in a dict keyed by their integer (ix, iy, iz) index, so an update or lookup
+is constant time and memory only grows with the space that has been seen.
+
+Each cell stores log-odds, so one stray reading is undone by the next ray
+that passes through the same cell.
+
+Like fly_to(), the mapping assumes the drone has not yawed since takeoff,
+so body and world axes line up. Pass yaw to integrate() if it has.
+
+Example:
+    grid = OccupancyGrid()
+    with StateEstimate(scf) as estimate, RangeEventStream(scf) as ranges:
+        ranges.add_handler(OccupancyMapper(grid, estimate))
+        ...
+        if grid.obstacle_distance(estimate.position, (1, 0, 0), 0.3) is not None:
+            print('Something is mapped just ahead')
+"""
+
+import math
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from range_events import DIRECTIONS, RangeSample
+
+RESOLUTION = 0.05           # Cell size in meters
+MAX_RANGE = 4.0             # Readings beyond this are not trusted
+FREE_RANGE = 2.0            # Meters cleared along a ray that reported nothing in range
+LOG_ODDS_HIT = 0.85         # Added to the cell a ray ended in
+LOG_ODDS_MISS = -0.4        # Added to every cell a ray passed through
+LOG_ODDS_MIN = -2.0         # Clamping keeps cells quick to change their mind
+LOG_ODDS_MAX = 3.5
+OCCUPIED_THRESHOLD = 0.5    # Log-odds above which a cell counts as occupied
+
+Cell = Tuple[int, int, int]
+Vector = Tuple[float, float, float]
+
+# Direction of each ranger in the body frame
+BODY_DIRECTIONS = {
+    'front': (1.0, 0.0, 0.0),
+    'back': (-1.0, 0.0, 0.0),
+    'left': (0.0, 1.0, 0.0),
+    'right': (0.0, -1.0, 0.0),
+    'up': (0.0, 0.0, 1.0),
+}
+
+
+class OccupancyGrid:
+    """
+    Hash-based 3D occupancy grid.
+
+    Args:
+        resolution (float): cell size in meters.
+    """
+
+    def __init__(self, resolution: float = RESOLUTION):
+        self.resolution = resolution
+        self.cells: Dict[Cell, float] = {}
+        self.rays = 0
+        self.updates = 0
+        self._listeners: List[Callable[[Cell, bool], None]] = []
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def key(self, x: float, y: float, z: float) -> Cell:
+        """Index of the cell containing a point."""
+        r = self.resolution
+        return math.floor(x / r), math.floor(y / r), math.floor(z / r)
+
+    def center(self, cell: Cell) -> Vector:
+        r = self.resolution
+        return (cell[0] + 0.5) * r, (cell[1] + 0.5) * r, (cell[2] + 0.5) * r
+
+    def add_listener(self, listener: Callable[[Cell, bool], None]) -> None:
+        """Call listener(cell, occupied) whenever a cell becomes occupied or stops being occupied."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Cell, bool], None]) -> None:
+        self._listeners.remove(listener)
+
+    # Updating
+
+    def update_cell(self, cell: Cell, delta: float) -> None:
+        old = self.cells.get(cell, 0.0)
+        new = min(LOG_ODDS_MAX, max(LOG_ODDS_MIN, old + delta))
+        self.cells[cell] = new
+        self.updates += 1
+        if (old > OCCUPIED_THRESHOLD) != (new > OCCUPIED_THRESHOLD):
+            for listener in self._listeners:
+                listener(cell, new > OCCUPIED_THRESHOLD)
+
+    def _traverse(self, origin: Vector, direction: Vector, length: float) -> Iterator[Tuple[Cell, float]]:
+        """
+        Cells a ray passes through, in order, with the distance at which it
+        enters each of them (Amanatides & Woo voxel traversal).
+        """
+        r = self.resolution
+        cell = list(self.key(*origin))
+        step = [0, 0, 0]
+        t_max = [math.inf] * 3
+        t_delta = [math.inf] * 3
+        for i in range(3):
+            d = direction[i]
+            if d > 0:
+                step[i] = 1
+                t_max[i] = ((cell[i] + 1) * r - origin[i]) / d
+                t_delta[i] = r / d
+            elif d < 0:
+                step[i] = -1
+                t_max[i] = (cell[i] * r - origin[i]) / d
+                t_delta[i] = -r / d
+        t = 0.0
+        while t < length:
+            yield (cell[0], cell[1], cell[2]), t
+            axis = min(range(3), key=t_max.__getitem__)
+            t = t_max[axis]
+            cell[axis] += step[axis]
+            t_max[axis] += t_delta[axis]
+
+    def insert_ray(self, origin: Vector, direction: Vector, distance: Optional[float]) -> None:
+        """
+        Clear the cells along a reading and mark where it ended.
+
+        Args:
+            origin (Vector): sensor position in meters.
+            direction (Vector): unit vector the sensor points along.
+            distance (float or None): measured distance, None when out of range.
+        """
+        self.rays += 1
+        if distance is None or distance > MAX_RANGE:
+            for cell, _ in self._traverse(origin, direction, FREE_RANGE):
+                self.update_cell(cell, LOG_ODDS_MISS)
+            return
+        hit = self.key(*(o + d * distance for o, d in zip(origin, direction)))
+        for cell, _ in self._traverse(origin, direction, distance):
+            if cell == hit:
+                break
+            self.update_cell(cell, LOG_ODDS_MISS)
+        self.update_cell(hit, LOG_ODDS_HIT)
+
+    def integrate(self, sample: RangeSample, position: Vector, yaw: float = 0.0) -> None:
+        """
+        Add every reading of a Multi-ranger sample.
+
+        Args:
+            sample (RangeSample): ranges in meters.
+            position (Vector): estimated x, y, z of the drone in meters.
+            yaw (float): heading in degrees, 0 when the drone has not turned.
+        """
+        c, s = math.cos(math.radians(yaw)), math.sin(math.radians(yaw))
+        for name in DIRECTIONS:
+            bx, by, bz = BODY_DIRECTIONS[name]
+            self.insert_ray(position, (c * bx - s * by, s * bx + c * by, bz), getattr(sample, name))
+
+    # Queries
+
+    def log_odds(self, x: float, y: float, z: float) -> float:
+        """Log-odds of the cell containing a point, 0.0 when never seen."""
+        return self.cells.get(self.key(x, y, z), 0.0)
+
+    def is_occupied(self, x: float, y: float, z: float) -> bool:
+        return self.cells.get(self.key(x, y, z), 0.0) > OCCUPIED_THRESHOLD
+
+    def is_free(self, x: float, y: float, z: float) -> bool:
+        """True only for cells seen to be free, unknown cells are not free."""
+        return self.cells.get(self.key(x, y, z), 0.0) < 0.0
+
+    def obstacle_distance(self, origin: Vector, direction: Vector, max_distance: float) -> Optional[float]:
+        """
+        Walk the map from origin along direction.
+
+        Returns:
+            float or None: distance to the first occupied cell, None if there
+                is none within max_distance.
+        """
+        cells = self.cells
+        for cell, t in self._traverse(origin, direction, max_distance):
+            if cells.get(cell, 0.0) > OCCUPIED_THRESHOLD:
+                return t
+        return None
+
+    def occupied_cells(self) -> List[Cell]:
+        return [cell for cell, value in self.cells.items() if value > OCCUPIED_THRESHOLD]
+
+    def report(self) -> None:
+        occupied = len(self.occupied_cells())
+        print(f"Map: {len(self.cells)} cells seen ({occupied} occupied) from {self.rays} rays, "
+              f"{self.updates} cell updates at {self.resolution * 100:.0f}cm")
+
+
+class OccupancyMapper:
+    """
+    RangeEventStream handler that adds every sample to a grid at the
+    latest estimated position. Register it before the controller's handler
+    so the controller sees the updated map.
+
+    Args:
+        grid (OccupancyGrid): map to update.
+        estimate (StateEstimate): started state estimate stream.
+    """
+
+    def __init__(self, grid: OccupancyGrid, estimate):
+        self.grid = grid
+        self.estimate = estimate
+        self.skipped = 0    # Samples that arrived before the first position
+
+    def __call__(self, sample: RangeSample) -> None:
+        position = self.estimate.position
+        if position is None:
+            self.skipped += 1
+            return
+        self.grid.integrate(sample, position)
@@ -0,0 +1,134 @@
+"""
+Odometry from the onboard state estimate.
+
+The path-following mission used to judge progress by adding up the
+forward velocity it had asked for, and only while no obstacle was in
+view, so it stopped at the wrong place. Odometry instead follows the
+stateEstimate position at ODOMETRY_PERIOD_MS and integrates the
+displacement that actually happened.
+
+It also integrates the velocity setpoints the mission sends, which is
+where open-loop dead reckoning would think the drone is. report() compares
+the two and the straight line to the goal, which shows how far the
+estimate and the commands drift apart over a flight.
+
+Example:
+    with StateEstimate(scf, ODOMETRY_PERIOD_MS) as estimate, Odometry(estimate, goal=(1.0, 0.0)) as odometry:
+        ...
+        odometry.command(vx, vy, 0.0)
+        if odometry.displacement[0] >= 1.0:
+            print('One meter forward')
+    odometry.report()
+"""
+
+import math
+from typing import Optional, Tuple
+
+from state_estimate import State, StateEstimate
+
+ODOMETRY_PERIOD_MS = 10     # stateEstimate log period used for odometry (100 Hz)
+
+Point = Tuple[float, float]
+Vector = Tuple[float, float, float]
+
+
+class Odometry:
+    """
+    Integrates the displacement reported by a StateEstimate stream.
+
+    Args:
+        estimate (StateEstimate): stream to follow, started by the caller.
+        goal (Point or None): goal relative to the starting point, the
+            cross-track error is measured against the line towards it.
+    """
+
+    def __init__(self, estimate: StateEstimate, goal: Optional[Point] = None):
+        self.estimate = estimate
+        self.goal = goal
+        self.origin: Optional[State] = None
+        self.last: Optional[State] = None
+        self.path_length = 0.0          # meters flown along the estimated track
+        self.max_cross_track = 0.0      # meters off the line from the origin to the goal
+        self.max_drift = 0.0            # largest distance between estimated and commanded position
+        self.samples = 0
+        self._commanded = (0.0, 0.0, 0.0)
+        self._dead_reckoned = [0.0, 0.0, 0.0]
+        self._heading: Optional[Point] = None  # Unit vector towards the goal, for the cross-track error
+        if goal is not None and math.hypot(*goal) > 0:
+            length = math.hypot(*goal)
+            self._heading = goal[0] / length, goal[1] / length
+
+    # Input
+
+    def start(self) -> None:
+        self.estimate.add_callback(self._on_state)
+
+    def stop(self) -> None:
+        self.estimate.remove_callback(self._on_state)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def command(self, vx: float, vy: float, vz: float) -> None:
+        """Note the velocity setpoint just sent, in m/s."""
+        self._commanded = (vx, vy, vz)
+
+    def _on_state(self, state: State) -> None:
+        self.samples += 1
+        last = self.last
+        self.last = state
+        if last is None:
+            self.origin = state
+            return
+        self.path_length += math.sqrt((state.x - last.x) ** 2 + (state.y - last.y) ** 2
+                                      + (state.z - last.z) ** 2)
+        dt = state.timestamp - last.timestamp
+        for i, v in enumerate(self._commanded):
+            self._dead_reckoned[i] += v * dt
+
+        dx, dy, dz = self.displacement
+        cx, cy, cz = self._dead_reckoned
+        self.max_drift = max(self.max_drift, math.sqrt((dx - cx) ** 2 + (dy - cy) ** 2 + (dz - cz) ** 2))
+        if self._heading is not None:
+            hx, hy = self._heading
+            self.max_cross_track = max(self.max_cross_track, abs(dx * hy - dy * hx))
+
+    # Output
+
+    @property
+    def displacement(self) -> Vector:
+        """Net x, y, z movement since the first sample, in meters."""
+        if self.origin is None:
+            return 0.0, 0.0, 0.0
+        return self.last.x - self.origin.x, self.last.y - self.origin.y, self.last.z - self.origin.z
+
+    @property
+    def commanded_displacement(self) -> Vector:
+        """Net movement the velocity setpoints alone add up to, in meters."""
+        return tuple(self._dead_reckoned)
+
+    @property
+    def drift(self) -> float:
+        """Current distance between the estimated and the commanded displacement."""
+        (dx, dy, dz), (cx, cy, cz) = self.displacement, self._dead_reckoned
+        return math.sqrt((dx - cx) ** 2 + (dy - cy) ** 2 + (dz - cz) ** 2)
+
+    def report(self) -> None:
+        """Print the flown path against the commanded one and the goal."""
+        if self.origin is None:
+            print('Odometry: no state estimate received')
+            return
+        dx, dy, _ = self.displacement
+        cx, cy, _ = self._dead_reckoned
+        duration = self.last.timestamp - self.origin.timestamp
+        rate = self.drift / duration if duration > 0 else 0.0
+        print(f"Odometry: {self.path_length:.2f}m flown over {self.samples} samples, "
+              f"net ({dx:.2f}, {dy:.2f})m, commanded ({cx:.2f}, {cy:.2f})m")
+        print(f"Odometry: drift from commands {self.drift:.2f}m ({rate * 100:.1f}cm/s), "
+              f"max {self.max_drift:.2f}m, max cross-track {self.max_cross_track:.2f}m")
+        if self.goal is not None:
+            print(f"Odometry: ended {math.hypot(self.goal[0] - dx, self.goal[1] - dy):.2f}m from the goal")
@@ -0,0 +1,342 @@
+"""
+Incremental grid path planner (D* Lite) on top of an OccupancyGrid.
+
+The planner works on the horizontal slice of the map at flight height.
+Cells within CLEARANCE of an occupied map cell can not be entered, so the
+drone's body stays clear of obstacles. Cells within INFLATION of one can
+be entered but cost NEAR_COST times as much, so plans keep a margin when
+there is room and the drone can still get out when an obstacle turns up
+right next to it (the Multi-ranger only looks in four directions, so an
+obstacle off to the side is often found late). Cells that have never been
+seen count as free, so the first plan is a straight line and it bends as
+obstacles show up.
+
+D* Lite (Koenig & Likhachev, 2002) searches from the goal towards the
+drone and keeps its search tree between plans. When the map changes only
+the cells whose cost changed are put back on the queue, so replanning
+touches the part of the path near the new obstacle rather than starting
+over. The planner listens to the grid, so it learns about changes as soon
+as the map does. Each replan() stops after REPLAN_BUDGET and carries on
+at the next call, so one call never holds up the control loop for long,
+even when a new wall means a long detour or no path at all.
+
+Example:
+    planner = DStarLite(grid, start=estimate.position, goal=(1.0, 0.0))
+    planner.update_start(estimate.position)
+    if planner.replan():
+        waypoint = planner.next_waypoint()
+"""
+
+import heapq
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from occupancy_grid import Cell, OccupancyGrid, Vector
+
+CLEARANCE = 0.1             # Meters from an obstacle the drone's center may never come
+INFLATION = 0.25            # Meters from an obstacle within which cells cost extra
+NEAR_COST = 3.0             # Cost factor of cells between CLEARANCE and INFLATION
+PLAN_MARGIN = 1.0           # Meters around start and goal the planner may use
+LAYERS = 1                  # Map layers above and below flight height that also count
+LOOKAHEAD = 0.15            # Meters along the path to the waypoint handed to the controller
+REPLAN_BUDGET = 0.003       # Seconds of search per replan() call; the rest waits for the next call
+
+Cell2 = Tuple[int, int]
+Point = Tuple[float, float]
+
+SQRT2 = math.sqrt(2)
+NEIGHBOURS = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+              (1, 1, SQRT2), (1, -1, SQRT2), (-1, 1, SQRT2), (-1, -1, SQRT2)]
+
+
+class DStarLite:
+    """
+    D* Lite on the flight-height slice of an occupancy grid.
+
+    Steps cost 1 cell straight and sqrt(2) diagonally, times the cost
+    factor of the cell stepped into: 1 in open space, NEAR_COST near an
+    obstacle and infinite within CLEARANCE of one.
+
+    Args:
+        grid (OccupancyGrid): map to plan on, listened to for changes.
+        start (Vector): current x, y, z of the drone; z sets the flight height.
+        goal (Point): x, y to reach.
+        margin (float): meters around start and goal the search may use.
+    """
+
+    def __init__(self, grid: OccupancyGrid, start: Vector, goal: Point, margin: float = PLAN_MARGIN):
+        self.grid = grid
+        self.start = self._cell(start)
+        self.goal = self._cell(goal)
+        layer = grid.key(*start)[2]
+        self._layers = range(layer - LAYERS, layer + LAYERS + 1)
+        m = int(math.ceil(margin / grid.resolution))
+        self._lo = (min(self.start[0], self.goal[0]) - m, min(self.start[1], self.goal[1]) - m)
+        self._hi = (max(self.start[0], self.goal[0]) + m, max(self.start[1], self.goal[1]) + m)
+        # Cells around an occupied column that it affects, and whether they are within CLEARANCE
+        n = int(math.ceil(INFLATION / grid.resolution))
+        r2 = grid.resolution ** 2
+        self._offsets = [(dx, dy, (dx * dx + dy * dy) * r2 <= CLEARANCE ** 2)
+                         for dx in range(-n, n + 1) for dy in range(-n, n + 1)
+                         if (dx * dx + dy * dy) * r2 <= INFLATION ** 2]
+
+        self._columns: Dict[Cell2, int] = {}    # Occupied map cells in the flight layers per column
+        self._lethal: Dict[Cell2, int] = {}     # Occupied columns within CLEARANCE of a cell
+        self._near: Dict[Cell2, int] = {}       # Occupied columns within INFLATION of a cell
+        self._factor: Dict[Cell2, float] = {}   # Cost factor of every cell that is not 1
+        self._changed: Dict[Cell2, float] = {}  # Cells whose cost changed since the last plan,
+                                                # with their cost factor at that plan
+
+        self.g: Dict[Cell2, float] = {}
+        self.rhs: Dict[Cell2, float] = {self.goal: 0.0}
+        self._km = 0.0
+        self._last = self.start
+        self._heap: List[Tuple[Tuple[float, float], Cell2]] = []
+        self._open: Dict[Cell2, Tuple[float, float]] = {}
+        self._push(self.goal)
+
+        self.expansions = 0
+        self.replan_times: List[float] = []
+        self.searching = False  # The last replan() ran out of time before finishing
+
+        for cell in grid.occupied_cells():
+            self._map_changed(cell, True)
+        self._changed.clear()  # Nothing has been searched yet, so there is nothing to repair
+        grid.add_listener(self._map_changed)
+
+    def close(self) -> None:
+        """Stop listening to the grid."""
+        self.grid.remove_listener(self._map_changed)
+
+    def _cell(self, point) -> Cell2:
+        r = self.grid.resolution
+        return math.floor(point[0] / r), math.floor(point[1] / r)
+
+    def center(self, cell: Cell2) -> Point:
+        r = self.grid.resolution
+        return (cell[0] + 0.5) * r, (cell[1] + 0.5) * r
+
+    # Map changes
+
+    def cost_factor(self, cell: Cell2) -> float:
+        return self._factor.get(cell, 1.0)
+
+    def _map_changed(self, cell: Cell, occupied: bool) -> None:
+        if cell[2] not in self._layers:
+            return
+        column = cell[0], cell[1]
+        count = self._columns.get(column, 0) + (1 if occupied else -1)
+        self._columns[column] = count
+        if count != (1 if occupied else 0):
+            return  # The column was already (or is still) occupied
+        step = 1 if occupied else -1
+        lethal, near, factor, changed = self._lethal, self._near, self._factor, self._changed
+        for dx, dy, within_clearance in self._offsets:
+            around = column[0] + dx, column[1] + dy
+            if around not in changed:
+                changed[around] = factor.get(around, 1.0)
+            near[around] = near.get(around, 0) + step
+            if within_clearance:
+                lethal[around] = lethal.get(around, 0) + step
+            if lethal.get(around, 0):
+                factor[around] = math.inf
+            elif near[around]:
+                factor[around] = NEAR_COST
+            else:
+                factor.pop(around, None)
+
+    # Search
+
+    def _heuristic(self, a: Cell2, b: Cell2) -> float:
+        dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+        return dx + dy + (SQRT2 - 2) * min(dx, dy)
+
+    def _key(self, cell: Cell2) -> Tuple[float, float]:
+        m = min(self.g.get(cell, math.inf), self.rhs.get(cell, math.inf))
+        return m + self._heuristic(self.start, cell) + self._km, m
+
+    def _push(self, cell: Cell2) -> None:
+        key = self._key(cell)
+        self._open[cell] = key
+        heapq.heappush(self._heap, (key, cell))
+
+    def _neighbours(self, cell: Cell2):
+        lo, hi = self._lo, self._hi
+        for dx, dy, cost in NEIGHBOURS:
+            x, y = cell[0] + dx, cell[1] + dy
+            if lo[0] <= x <= hi[0] and lo[1] <= y <= hi[1]:
+                yield (x, y), cost
+
+    def _best_rhs(self, cell: Cell2) -> float:
+        """Cheapest way from cell to the goal through one of its neighbours."""
+        g, factor = self.g, self._factor
+        inf = math.inf
+        (lo_x, lo_y), (hi_x, hi_y) = self._lo, self._hi
+        cx, cy = cell
+        best = inf
+        for dx, dy, cost in NEIGHBOURS:
+            x, y = cx + dx, cy + dy
+            if lo_x <= x <= hi_x and lo_y <= y <= hi_y:
+                succ = x, y
+                value = g.get(succ, inf)
+                if value != inf:
+                    value += cost * factor.get(succ, 1.0)
+                    if value < best:
+                        best = value
+        return best
+
+    def _update_vertex(self, cell: Cell2) -> None:
+        if self.g.get(cell, math.inf) != self.rhs.get(cell, math.inf):
+            self._push(cell)
+        else:
+            self._open.pop(cell, None)
+
+    def _top(self):
+        """Lowest key still on the queue, dropping stale heap entries."""
+        heap, open_ = self._heap, self._open
+        while heap:
+            key, cell = heap[0]
+            if open_.get(cell) == key:
+                return key, cell
+            heapq.heappop(heap)
+        return None
+
+    def _compute_shortest_path(self, deadline: float) -> bool:
+        """Process the queue until the start is consistent; False if the deadline came first."""
+        g, rhs, goal, factors = self.g, self.rhs, self.goal, self._factor
+        heap, open_ = self._heap, self._open
+        (lo_x, lo_y), (hi_x, hi_y) = self._lo, self._hi
+        start, km = self.start, self._km
+        inf = math.inf
+        while True:
+            top = self._top()
+            if top is None:
+                return True
+            key_old, cell = top
+            start_g, start_rhs = g.get(start, inf), rhs.get(start, inf)
+            if start_rhs == start_g and key_old >= (start_g + km, start_g):
+                return True
+            if not self.expansions % 16 and time.perf_counter() > deadline:
+                return False
+            self.expansions += 1
+            key_new = self._key(cell)
+            if key_old < key_new:
+                self._push(cell)
+                continue
+            # Every neighbour is a predecessor, and they all pay this cell's factor to enter it
+            factor = factors.get(cell, 1.0)
+            cx, cy = cell
+            if g.get(cell, inf) > rhs.get(cell, inf):
+                g[cell] = value = rhs[cell]
+                del open_[cell]
+                heapq.heappop(heap)
+                if factor == inf:
+                    continue
+                for dx, dy, cost in NEIGHBOURS:
+                    x, y = cx + dx, cy + dy
+                    if lo_x <= x <= hi_x and lo_y <= y <= hi_y:
+                        pred = x, y
+                        through = cost * factor + value
+                        if pred != goal and through < rhs.get(pred, inf):
+                            rhs[pred] = through
+                            if g.get(pred, inf) != through:
+                                self._push(pred)
+                            else:
+                                open_.pop(pred, None)
+            else:
+                g_old = g.get(cell, inf)
+                g[cell] = inf
+                if factor != inf:
+                    for dx, dy, cost in NEIGHBOURS:
+                        x, y = cx + dx, cy + dy
+                        if lo_x <= x <= hi_x and lo_y <= y <= hi_y:
+                            pred = x, y
+                            if pred != goal and rhs.get(pred, inf) == cost * factor + g_old:
+                                rhs[pred] = self._best_rhs(pred)
+                                self._update_vertex(pred)
+                if cell != goal:
+                    rhs[cell] = self._best_rhs(cell)
+                self._update_vertex(cell)
+
+    def update_start(self, position) -> None:
+        """Move the start to the drone's current position."""
+        self.start = self._cell(position)
+
+    def replan(self, budget: float = REPLAN_BUDGET) -> bool:
+        """
+        Bring the plan up to date with the start position and the map.
+
+        Args:
+            budget (float): seconds of search before returning.
+
+        Returns:
+            bool: True if a path to the goal exists. False if there is none,
+                or if the search is not finished yet (searching is then True).
+        """
+        begin = time.perf_counter()
+        if self.start != self._last:
+            self._km += self._heuristic(self._last, self.start)
+            self._last = self.start
+        changed, self._changed = self._changed, {}
+        g, rhs, goal = self.g, self.rhs, self.goal
+        inf = math.inf
+        for cell, old_factor in changed.items():
+            new_factor = self.cost_factor(cell)
+            if new_factor == old_factor:
+                continue  # Blocked and cleared again since the last plan
+            # Entering cell got cheaper or dearer, which changes its neighbours' costs
+            value = g.get(cell, inf)
+            if value == inf:
+                continue  # Not part of the search tree, so no rhs depends on it
+            for pred, cost in self._neighbours(cell):
+                if pred == goal:
+                    continue
+                if new_factor < old_factor:
+                    if cost * new_factor + value < rhs.get(pred, inf):
+                        rhs[pred] = cost * new_factor + value
+                elif rhs.get(pred, inf) == cost * old_factor + value:
+                    rhs[pred] = self._best_rhs(pred)
+                self._update_vertex(pred)
+        self.searching = not self._compute_shortest_path(begin + budget)
+        self.replan_times.append(time.perf_counter() - begin)
+        return not self.searching and rhs.get(self.start, inf) < inf
+
+    # Results
+
+    def path(self) -> List[Cell2]:
+        """Cells from the start to the goal along the current plan, empty if there is none."""
+        if self.searching or self.rhs.get(self.start, math.inf) == math.inf:
+            return []
+        g = self.g
+        cells = [self.start]
+        cell = self.start
+        visited = {cell}
+        while cell != self.goal:
+            best, best_cost = None, math.inf
+            for succ, cost in self._neighbours(cell):
+                value = cost * self.cost_factor(succ) + g.get(succ, math.inf)
+                if value < best_cost:
+                    best, best_cost = succ, value
+            if best is None or best in visited:
+                break
+            visited.add(best)
+            cells.append(best)
+            cell = best
+        return cells
+
+    def next_waypoint(self, lookahead: float = LOOKAHEAD) -> Optional[Point]:
+        """Point on the plan about lookahead meters ahead of the start, None if there is no plan."""
+        cells = self.path()
+        if not cells:
+            return None
+        steps = max(1, int(round(lookahead / self.grid.resolution)))
+        return self.center(cells[min(steps, len(cells) - 1)])
+
+    def report(self) -> None:
+        if not self.replan_times:
+            return
+        times = sorted(self.replan_times)
+        p50 = times[len(times) // 2] * 1000
+        print(f"Planner: {len(times)} replans, {self.expansions} expansions, "
+              f"replan p50 {p50:.2f}ms, max {times[-1] * 1000:.2f}ms")
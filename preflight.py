@@ -0,0 +1,83 @@
+"""
+Preflight deck detection.
+
+The scripts used to sleep for a second after registering the deck
+callbacks and then wait on a single event that either deck could set, so
+a missing Multi-ranger went unnoticed. check_decks() waits for each
+required deck on its own and returns the moment every one of them has
+reported. A deck reporting "not attached" ends the check straight away.
+"""
+
+import sys
+import time
+from threading import Event
+from typing import Dict, List, NamedTuple, Sequence
+
+REQUIRED_DECKS = ('bcFlow2', 'bcMultiranger')
+DECK_TIMEOUT = 5.0          # Seconds to wait for every deck to report
+
+
+class PreflightResult(NamedTuple):
+    attached: List[str]
+    missing: List[str]
+    elapsed: float          # seconds the check took
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing
+
+
+def check_decks(scf, required: Sequence[str] = REQUIRED_DECKS, timeout: float = DECK_TIMEOUT) -> PreflightResult:
+    """
+    Wait until every required deck has reported whether it is attached.
+
+    Args:
+        scf (SyncCrazyflie): connected Crazyflie.
+        required (Sequence[str]): deck parameter names in the deck group.
+        timeout (float): seconds to wait before counting silent decks as missing.
+
+    Returns:
+        PreflightResult: attached and missing decks and how long the check took.
+    """
+    start = time.time()
+    attached: Dict[str, bool] = {}
+    done = Event()      # Every deck has reported, or one is missing
+
+    def deck_reported(deck: str, value_str) -> None:
+        attached[deck] = bool(int(value_str))
+        if not attached[deck] or len(attached) == len(required):
+            done.set()
+
+    # Values that were already downloaded when the link came up need no waiting
+    known = getattr(scf.cf.param, 'values', {}).get('deck', {})
+    callbacks = {}
+    for name in required:
+        if name in known:
+            deck_reported(name, known[name])
+        else:
+            callbacks[name] = lambda full_name, value, deck=name: deck_reported(deck, value)
+            scf.cf.param.add_update_callback(group='deck', name=name, cb=callbacks[name])
+    try:
+        if callbacks:
+            done.wait(timeout)
+    finally:
+        for name, callback in callbacks.items():
+            scf.cf.param.remove_update_callback(group='deck', name=name, cb=callback)
+
+    found = [name for name in required if attached.get(name)]
+    missing = [name for name in required if not attached.get(name)]
+    return PreflightResult(found, missing, time.time() - start)
+
+
+def require_decks(scf, required: Sequence[str] = REQUIRED_DECKS, timeout: float = DECK_TIMEOUT) -> PreflightResult:
+    """
+    Run check_decks(), print the outcome and exit if any deck is missing.
+    """
+    result = check_decks(scf, required, timeout)
+    for name in result.attached:
+        print(f'Deck {name} is attached!')
+    if not result.ok:
+        print(f"Missing decks: {', '.join(result.missing)}! Exiting... (preflight took {result.elapsed:.2f}s)")
+        sys.exit(1)
+    print(f'Preflight passed in {result.elapsed:.2f}s')
+    return result
@@ -1,11 +1,9 @@
+import asyncio
 import logging
-import sys
 import time
 import random
-from threading import Event
 
 import cflib.crtp
-from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.log import LogConfig
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
 from cflib.positioning.motion_commander import MotionCommander
@@ -14,7 +12,19 @@ from cflib.utils import uri_helper
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 
-from typing import List, Any, Dict, Tuple
+from typing import List, Any, Dict, Optional, Tuple
+
+from mission_runtime import run_mission
+from path_order import order_waypoints
+from range_events import LatencyRecorder
+from state_estimate import StateEstimate, fly_to
+from flight_analysis import analyze_flight
+from flight_log import convert_telemetry
+from telemetry_recorder import TelemetryRecorder, default_path
+from preflight import require_decks
+from toc_cache import make_crazyflie
+from trajectory import fly_trajectory
+from waypoint_gen import generate_waypoints, waypoints_to_list
 
 # The following script initiates the drone, checks for the necessary sensor decks,
 # and executes a simple takeoff and landing maneuver.
@@ -25,10 +35,6 @@ from typing import List, Any, Dict, Tuple
 # REMEMBER TO UNCOMMENT
 URI = uri_helper.uri_from_env(default='radio://0/80/2M/E7E7E7E7E7')
 
-# # Event used to detect if the necessary deck it attached.
-# REMEMBER TO UNCOMMENT
-deck_attached_event = Event()
-
 # # Set logging level to suppress detailed debug logs
 # REMEMBER TO UNCOMMENT
 logging.basicConfig(level=logging.ERROR)
@@ -36,33 +42,31 @@ logging.basicConfig(level=logging.ERROR)
 DEFAULT_HEIGHT = 0.5    # Default flight height in meters
 BOX_LIMIT = 0.2         # Defines movement constraints
 MAX_VEL = 0.5           # Defines the Maximum velocity of the drone.
-MOVE_DURATION = 4       # Defines the seconds the drone stays in the destination before moving to a new destination.
+MOVE_DURATION = 4       # Defines the maximum seconds the drone tries to reach a destination before moving to a new destination.
+ARRIVAL_TOLERANCE = 0.05  # Defines how close (m) the drone must get to a destination to count as arrived.
 MAX_RUN_TIME = 30       # Defines the maximum run time for the drone.
 INIT_POS = (0.0, 0.0)
 MAX_DUMMY = 2
 NUMBER_OF_BOXES = 2
+SMOOTH_TRAJECTORY = True  # Fly all boxes as one continuous spline instead of stopping at every waypoint
+MANEUVER_QUEUE = 2      # Round maneuvers the player may get ahead of the drone in drone_game
 
 positions = []
 
 
-def generate_dummy_waypoints(num_points: int) -> List[Tuple[float, float]]:
+def generate_dummy_waypoints(num_points: int, distribution: str = 'uniform', seed: Optional[int] = None) -> List[Tuple[float, float]]:
     """
     Generate n dummy waypoints within the current box constraints
     
     Args:
         num_points (int): amount of random points to generate
+        distribution (str): 'uniform', 'jittered' or 'poisson' (see waypoint_gen)
+        seed (int or None): seed for repeatable waypoints
         
     Returns:
         w_points (List[Tuple[float, float]]): random generated points to traverse 
     """
-    w_points = []
-    
-    for _ in range(num_points):
-        x = random.uniform(-BOX_LIMIT, BOX_LIMIT)
-        y = random.uniform(-BOX_LIMIT, BOX_LIMIT)
-        w_points.append((x, y))
-    
-    return w_points
+    return waypoints_to_list(generate_waypoints(num_points, BOX_LIMIT, distribution, seed))
 
 def get_next_destination() -> Tuple[float, float]:
     """
@@ -78,91 +82,128 @@ def get_next_destination() -> Tuple[float, float]:
     y = random.choice([-BOX_LIMIT, BOX_LIMIT])
     return (x, y)
 
-def create_path_with_waypoints_and_destination():
+def create_path_with_waypoints_and_destination(start: Tuple[float, float] = INIT_POS):
     """
     Create a complete path that includes:
-    1. Dummy waypoints within current box
+    1. Dummy waypoints within current box, ordered for the shortest flight
     2. Final destination (next box location)
+
+    Args:
+        start (Tuple[float, float]): position the path starts from
     """
     path = []
     
-    # Start at initial position
-    path.append(INIT_POS)
+    # Start at the current position
+    path.append(start)
     
     # Generate dummy waypoints for current box
     dummy_waypoints = generate_dummy_waypoints(MAX_DUMMY)
     
+    # Get next destination (could be center of next box)
+    next_destination = get_next_destination()
+
+    # Visit the dummy waypoints in the order that gives the shortest path to the destination
+    dummy_waypoints, report = order_waypoints(dummy_waypoints, start, next_destination, MAX_VEL)
+    print(f"Path length {report.original_length:.2f}m -> {report.ordered_length:.2f}m "
+          f"(~{report.time_saved:.1f}s saved at {MAX_VEL} m/s)")
+
     # Add dummy waypoints to path
     for waypoint in dummy_waypoints:
         path.append(waypoint)
     
-    # Get next destination (could be center of next box)
-    next_destination = get_next_destination()
     path.append(next_destination)
     
     return path, dummy_waypoints, next_destination
 
-def execute_waypoint_mission(scf):
+def fly_boxes_smoothly(mc, estimate: StateEstimate, current_position: Tuple[float, float], history: list) -> int:
     """
-    Execute the mission with dummy waypoints and final destination
+    Plan every box up front and fly all their waypoints as one continuous trajectory.
+
+    Args:
+        mc (MotionCommander): commander of the flying drone
+        estimate (StateEstimate): started state estimate stream
+        current_position (Tuple[float, float]): where the first box starts
+        history (list): where to record the visited points
+
+    Returns:
+        int: number of waypoints flown
+    """
+    waypoints = []
+    for _ in range(NUMBER_OF_BOXES):
+        _, dummy_waypoints, final_destination = create_path_with_waypoints_and_destination(current_position)
+        waypoints += list(dummy_waypoints) + [final_destination]
+        current_position = final_destination
+    history.extend(waypoints)
+    print(f"Flying {len(waypoints)} waypoints in {NUMBER_OF_BOXES} boxes as one trajectory...")
+    report = fly_trajectory(mc, estimate, waypoints, MAX_VEL)
+    report.print_report()
+    return len(waypoints)
+
+
+def execute_waypoint_mission(scf, history: Optional[list] = None) -> int:
+    """
+    Execute the mission with dummy waypoints and final destination.
+    Each point is flown to until the state estimate says it was reached, or all
+    of them are flown through as one smooth trajectory with SMOOTH_TRAJECTORY.
+
+    Args:
+        scf (SyncCrazyflie): connected Crazyflie
+        history (list or None): where to record the visited points, the global positions list when None
+
+    Returns:
+        int: number of waypoints flown
     """
-    positions.append((0, 0, 0))  # Starting position
+    if history is None:
+        history = positions
+    flown = 0
+    history.append((0, 0, 0))  # Starting position
+    current_position = INIT_POS
     
-    with MotionCommander(scf, default_height=DEFAULT_HEIGHT) as mc:
+    with MotionCommander(scf, default_height=DEFAULT_HEIGHT) as mc, StateEstimate(scf) as estimate:
         print("Starting waypoint mission...")
+        if SMOOTH_TRAJECTORY:
+            flown = fly_boxes_smoothly(mc, estimate, current_position, history)
+            mc.stop()
+            return flown
         
         # First destination: Run waypoint mission from current location
         for NUMBER_OF_BOXES in range(0, 2):  # Run mission twice
             print(f"\n=== MISSION {NUMBER_OF_BOXES} ===")
 
             # Create path for current mission
-            full_path, dummy_waypoints, final_destination = create_path_with_waypoints_and_destination()
+            full_path, dummy_waypoints, final_destination = create_path_with_waypoints_and_destination(current_position)
             
             # Loop through dummy waypoints
             print(f"Visiting {len(dummy_waypoints)} dummy waypoints...")
             for i, waypoint in enumerate(dummy_waypoints):
                 x, y = waypoint
-                positions.append((x, y))
+                history.append((x, y))
                 print(f"Moving to dummy waypoint {i+1}/{len(dummy_waypoints)}: ({x:.2f}, {y:.2f})")
                 
-                mc.start_linear_motion(x, y, 0)
-                time.sleep(MOVE_DURATION)
+                if not fly_to(mc, estimate, (x, y), MAX_VEL, ARRIVAL_TOLERANCE, MOVE_DURATION):
+                    print(f"Waypoint not reached within {MOVE_DURATION}s, moving on")
+                flown += 1
             
             # Move to final destination
             dest_x, dest_y = final_destination
-            positions.append((dest_x, dest_y))
+            history.append((dest_x, dest_y))
             print(f"Moving to final destination: ({dest_x:.2f}, {dest_y:.2f})")
             
-            mc.start_linear_motion(dest_x, dest_y, 0)
-            time.sleep(MOVE_DURATION)
+            if not fly_to(mc, estimate, (dest_x, dest_y), MAX_VEL, ARRIVAL_TOLERANCE, MOVE_DURATION):
+                print(f"Destination not reached within {MOVE_DURATION}s, moving on")
+            flown += 1
+            current_position = final_destination
 
             print(f"Box {NUMBER_OF_BOXES} completed!")
 
         print("\nAll Boxes completed!")
         mc.stop() 
 
+    return flown
+
     ##################################################
     # -------------- UNCOMMENT THIS ---------------------
 
-def param_deck_flow(name, value_str):
-    """
-    --------------------------------------
-    Callback function that checks if a specific sensor deck is attached.
-
-    Args:
-        name (str): The name of the deck parameter.
-        value_str (str): The value as a string, indicating whether the deck is detected.
-
-    If the deck is detected, an event is triggered.
-    """
-    value = int(value_str)
-    if value:
-        deck_attached_event.set()
-        print(f'Deck {name} is attached!')
-    else:
-        print(f'Deck {name} is NOT attached!')
-
-
 # def move_box_limit(scf):
 #     start = time.time()
 #     positions.append((0, 0, 0))
@@ -230,39 +271,73 @@ def plot_path_positions():
 #         mc.stop()
 choices = ['r', 'p', 's']
 
-def drone_game(scf):
-    with MotionCommander(scf, default_height=DEFAULT_HEIGHT) as mc:
-        wins = 0
-        losses = 0
-
-        while wins < 2 and losses < 2:
-            user_choice = input("Enter your choice for Rock, Paper, or Scissors (R, S, P): ").lower()
-            drone_choice = random.choice(choices)
-
-            print(f"You chose {user_choice}, Drone chose {drone_choice}.")
-
-            if user_choice == drone_choice:
-                print('This round is a tie!')
-            elif (user_choice == 'r' and drone_choice == 's') or (user_choice == 'p' and drone_choice == 'r') or (user_choice == 's' and drone_choice == 'p'):
-                print('You win this round!')
-                wins += 1
-                mc.up(0.1)
-                mc.circle_left(0.1)
-            else:
-                print('You lose this round!')
-                losses += 1
-                mc.down(0.1)
-                mc.circle_right(0.1)
-
-            print(f"Score: Wins = {wins}, Losses = {losses}")
-
-        print("Game over!")
-        if wins == 2:
-            print("Congratulations! You won the game.")
+async def fly_maneuvers(rt, maneuvers: asyncio.Queue, latency: LatencyRecorder):
+    """
+    Fly the round maneuvers in the order they were queued, until None arrives.
+
+    Args:
+        rt (MissionRuntime): runtime of the flying drone.
+        maneuvers (asyncio.Queue): (won, time the answer was read) per round.
+        latency (LatencyRecorder): receives the time from each answer to its maneuver starting.
+    """
+    while True:
+        command = await maneuvers.get()
+        if command is None:
+            return
+        won, answered = command
+        latency.record(rt.now - answered)
+        if won:
+            await rt.up(0.1)
+            await rt.circle_left(0.1)
+        else:
+            await rt.down(0.1)
+            await rt.circle_right(0.1)
+
+
+async def game_rounds(rt):
+    wins = 0
+    losses = 0
+    # Maneuvers are flown by their own task, so the next prompt does not wait for them
+    maneuvers = asyncio.Queue(MANEUVER_QUEUE)
+    latency = LatencyRecorder()
+    flying = rt.spawn(fly_maneuvers(rt, maneuvers, latency))
+
+    while wins < 2 and losses < 2:
+        # Ask on a worker thread so the drone stays supervised while the player thinks
+        user_choice = (await rt.run_blocking(input, "Enter your choice for Rock, Paper, or Scissors (R, S, P): ")).lower()
+        answered = rt.now
+        drone_choice = random.choice(choices)
+
+        print(f"You chose {user_choice}, Drone chose {drone_choice}.")
+
+        if user_choice == drone_choice:
+            print('This round is a tie!')
+        elif (user_choice == 'r' and drone_choice == 's') or (user_choice == 'p' and drone_choice == 'r') or (user_choice == 's' and drone_choice == 'p'):
+            print('You win this round!')
+            wins += 1
+            await maneuvers.put((True, answered))  # Waits only if MANEUVER_QUEUE rounds are still to be flown
         else:
-            print("Better luck next time! The drone won.")
+            print('You lose this round!')
+            losses += 1
+            await maneuvers.put((False, answered))
+
+        print(f"Score: Wins = {wins}, Losses = {losses}")
 
-        mc.stop()
+    # Let the last maneuvers finish before announcing the result
+    await maneuvers.put(None)
+    await flying
+
+    print("Game over!")
+    if wins == 2:
+        print("Congratulations! You won the game.")
+    else:
+        print("Better luck next time! The drone won.")
+    latency.report('input-to-motion')
+
+
+def drone_game(scf):
+    # Obstacles and a low battery interrupt the current move and land the drone
+    return run_mission(scf, game_rounds, DEFAULT_HEIGHT)
 
 # -------------------------------------------------------
 
@@ -271,20 +346,22 @@ if __name__ == '__main__':
  cflib.crtp.init_drivers()
 
  print("Connecting to Crazyflie...")
- with SyncCrazyflie(URI, cf=Crazyflie(rw_cache='./cache')) as scf:
+ with SyncCrazyflie(URI, cf=make_crazyflie()) as scf:
     print("Connected!")
 
-    # Add Callbacks to check if required decks are attached.
-    scf.cf.param.add_update_callback(group="deck", name="bcFlow2", cb=param_deck_flow)
-    scf.cf.param.add_update_callback(group="deck", name="bcMultiranger", cb=param_deck_flow)
+    # Wait until every required deck has reported, exits if one is missing
+    require_decks(scf)
 
-    time.sleep(1)
+    # Record the full flight (estimate, ranges, battery)
+    with TelemetryRecorder(default_path(time.strftime('game_%Y%m%d_%H%M%S'))) as recorder:
+        recorder.attach(scf)
 
-    if not deck_attached_event.wait(timeout=5):
-        print('No flow deck detected! Exiting...')
-        sys.exit(1)
+        # move_box_limit(scf)  # Original random movement
+        # execute_waypoint_mission(scf)
+        # plot_path_positions()
+        drone_game(scf)
 
-    # move_box_limit(scf)  # Original random movement
-    # execute_waypoint_mission(scf)
-    # plot_path_positions()
-    drone_game(scf)
\ No newline at end of file
+    # Keep a compressed copy of the recording for later analysis
+    log_path = convert_telemetry(recorder.path)
+    print(f"Flight log written to {log_path}")
+    analyze_flight(log_path, BOX_LIMIT).print_report()
@@ -11,14 +11,20 @@ Crazyflie.
 """
 
 import logging
-import sys
 import time
+from typing import Optional
+
 import cflib.crtp
-from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
 from cflib.positioning.motion_commander import MotionCommander
 from cflib.utils import uri_helper
-from cflib.utils.multiranger import Multiranger
+
+import instrumentation
+from range_events import LatencyRecorder, RangeEventStream, RangeSample, run_event_loop
+from range_filter import RangeFilter
+from preflight import require_decks
+from setpoints import SetpointSender
+from toc_cache import make_crazyflie
 
 # Define the default URI for communication with the Crazyflie
 URI = uri_helper.uri_from_env(default='radio://0/80/2M/E7E7E7E7E5')
@@ -26,6 +32,10 @@ URI = uri_helper.uri_from_env(default='radio://0/80/2M/E7E7E7E7E5')
 # Only output errors from the logging framework
 logging.basicConfig(level=logging.ERROR)
 
+VELOCITY = 0.5  # Movement speed in meters per second
+MIN_DISTANCE = 0.2  # Minimum allowed distance in meters
+FILTER_RANGES = True  # Filter the readings and use hysteresis instead of the raw single cutoff
+
 
 # ---------------------------------------------------------------------------
 def is_close(range_value):
@@ -38,7 +48,6 @@ def is_close(range_value):
     Returns:
         bool: True if the object is closer than the minimum distance, otherwise False.
     """
-    MIN_DISTANCE = 0.2  # Minimum allowed distance in meters
     if range_value is None:
         return False
     else:
@@ -46,48 +55,88 @@ def is_close(range_value):
 # ---------------------------------------------------------------------------
 
 
+def push_away(sample: RangeSample, range_filter: Optional[RangeFilter] = None):
+    """
+    Compute the velocity that moves the drone away from nearby objects.
+
+    Args:
+        sample (RangeSample): latest Multi-ranger distances.
+        range_filter (RangeFilter or None): decides what is close when given, updated with sample.
+
+    Returns:
+        tuple or None: (vx, vy, vz) setpoint, or None when an object above ends the demo.
+    """
+    if range_filter is not None:
+        range_filter.update(sample)
+        close = range_filter.is_close
+    else:
+        close = lambda direction: is_close(getattr(sample, direction))
+
+    # If an object is detected above, stop flying
+    if close('up'):
+        return None
+
+    velocity_x = 0.0  # Initial horizontal velocity in X-axis
+    velocity_y = 0.0  # Initial horizontal velocity in Y-axis
+
+    # Adjust velocity based on proximity to obstacles
+    if close('front'):  # Object detected in front
+        velocity_x -= VELOCITY  # Move backward
+    if close('back'):  # Object detected behind
+        velocity_x += VELOCITY  # Move forward
+    if close('left'):  # Object detected on the left
+        velocity_y -= VELOCITY  # Move right
+    if close('right'):  # Object detected on the right
+        velocity_y += VELOCITY  # Move left
+
+    return velocity_x, velocity_y, 0.0
+
+
+def fly_push_away(scf, motion_commander, latency=None, timeout=None, filter_ranges: bool = FILTER_RANGES):
+    """
+    Run the push-away demo, reacting to every range sample as it arrives.
+
+    Args:
+        scf (SyncCrazyflie): connected Crazyflie with a Multi-ranger deck.
+        motion_commander (MotionCommander): commander of the flying drone.
+        latency (LatencyRecorder or None): collects sample-to-setpoint latency.
+        timeout (float or None): stop after this many seconds, only when the hand above ends it if None.
+        filter_ranges (bool): react to filtered readings with hysteresis instead of raw ones.
+    """
+    controller = push_away
+    if filter_ranges:
+        range_filter = RangeFilter(MIN_DISTANCE)
+        controller = lambda sample: push_away(sample, range_filter)
+    with RangeEventStream(scf) as ranges:
+        run_event_loop(ranges, motion_commander, controller, latency, timeout)
+
+
 if __name__ == '__main__':
     # Initialize the low-level drivers for Crazyflie communication
     cflib.crtp.init_drivers()
 
-    # Create a Crazyflie object with a cache for parameters
-    cf = Crazyflie(rw_cache='./cache')
+    # Create a Crazyflie object using the shared TOC cache
+    cf = make_crazyflie()
 
     # Establish a synchronous connection to the Crazyflie
     with SyncCrazyflie(URI, cf=cf) as scf:
+        # Both the Flow deck and the Multi-ranger are needed, exits if one is missing
+        require_decks(scf)
+
         # Send an arming request to enable the drone for flight
         scf.cf.platform.send_arming_request(True)
         time.sleep(1.0)  # Wait for arming process to complete
 
         # Enter motion control mode
         with MotionCommander(scf) as motion_commander:
-            # Activate the Multi-ranger deck for distance sensing
-            with Multiranger(scf) as multiranger:
-                keep_flying = True  # Flag to control the flight loop
-
-                while keep_flying:
-                    VELOCITY = 0.5  # Movement speed in meters per second
-                    velocity_x = 0.0  # Initial horizontal velocity in X-axis
-                    velocity_y = 0.0  # Initial horizontal velocity in Y-axis
-
-                    # Adjust velocity based on proximity to obstacles
-                    if is_close(multiranger.front):  # Object detected in front
-                        velocity_x -= VELOCITY  # Move backward
-                    if is_close(multiranger.back):  # Object detected behind
-                        velocity_x += VELOCITY  # Move forward
-                    if is_close(multiranger.left):  # Object detected on the left
-                        velocity_y -= VELOCITY  # Move right
-                    if is_close(multiranger.right):  # Object detected on the right
-                        velocity_y += VELOCITY  # Move left
-
-                    # If an object is detected above, stop flying
-                    if is_close(multiranger.up):
-                        keep_flying = False
-
-                    # Apply calculated velocity values to move the drone
-                    motion_commander.start_linear_motion(velocity_x, velocity_y, 0)
-
-                    # Short delay before checking sensors again
-                    time.sleep(0.1)
-
-                print('Demo terminated!')
+            latency = LatencyRecorder()
+            # Only send a setpoint when the velocity changes, or as a keep-alive
+            setpoints = SetpointSender(motion_commander)
+            fly_push_away(scf, setpoints, latency)
+
+            print('Demo terminated!')
+            latency.report()
+            setpoints.report()
+
+        # Per-stage loop timings, only when DRONE_PROFILE is set
+        instrumentation.report()
@@ -8,15 +8,25 @@ The demo is ended by either pressing Ctrl-C or by holding your hand above the
 Crazyflie.
 """
 import logging
-import sys
 import time
 import cflib.crtp
-from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
 from cflib.positioning.motion_commander import MotionCommander
 from cflib.utils import uri_helper
-from cflib.utils.multiranger import Multiranger
 import random
+from typing import Optional
+
+from collision_predictor import CollisionPredictor
+from flight_log import FlightLogWriter
+from occupancy_grid import BODY_DIRECTIONS, OccupancyGrid, OccupancyMapper
+import instrumentation
+from range_events import LatencyRecorder, RangeEventStream, RangeSample, run_event_loop
+from range_filter import RangeFilter
+from state_estimate import StateEstimate
+from preflight import require_decks
+from setpoints import SetpointSender
+from telemetry_recorder import default_path
+from toc_cache import make_crazyflie
 
 # Define the default URI for communication with the Crazyflie
 URI = uri_helper.uri_from_env(default='radio://0/80/2M/E7E7E7E7E5')
@@ -26,7 +36,15 @@ VELOCITY = 0.1           # Velocity of the drone
 MINIMUM_HEIGHT = 0.3
 AVOID_LATERAL = 0.5
 SIDESTEP_TIME = 1
+MIN_DISTANCE = 0.2       # Minimum allowed distance in meters
+FILTER_RANGES = True     # Filter the readings and use hysteresis instead of the raw single cutoff
+PREDICTIVE_AVOIDANCE = True  # Avoid by time to collision, which allows the faster PREDICTIVE_VELOCITY
+PREDICTIVE_VELOCITY = 0.3  # Cruise speed with predictive avoidance
 LOOP_DT = 0.1            # main loop sleep time
+RACE_TIME = 190          # Seconds of forward flight needed to cover the race distance
+RACE_DISTANCE = RACE_TIME * VELOCITY  # Meters of forward flight in the race
+MAP_CLEARANCE = 0.2      # Mapped obstacles closer than this count as close, same as is_close()
+MAP_LOOKAHEAD = 10.0     # Meters of map checked when comparing the two sides
 
 # Only output errors from the logging framework
 logging.basicConfig(level=logging.ERROR)
@@ -40,85 +58,191 @@ Returns:
     bool: True if the object is closer than the minimum distance, otherwise False.
 """
 def is_close(range):
-    MIN_DISTANCE = 0.2  # Minimum allowed distance in meters
     if range is None:  # If no valid distance is detected, return False
         return False
     else:
         return range < MIN_DISTANCE  # Return True if the object is within the limit
 
 """---------------------------------------------------------------------------"""
+class RaceController:
+    """
+    Decides the race setpoint for each range sample.
+
+    The drone cruises forward at the cruise speed. When something is in front it
+    sidesteps towards the clearer side for up to SIDESTEP_TIME, or until the
+    front is clear, and then resumes straight flight.
+
+    With a grid and an estimate, obstacles mapped earlier count too, both
+    for the front check and when picking the clearer side. With a range
+    filter, the filtered readings and its hysteresis decide what is close,
+    so a single spurious reading no longer starts a sidestep.
+
+    With a collision predictor, the sidestep starts as soon as the time to
+    collision in front is shorter than the time it takes to stop, and the
+    forward speed is capped at the speed from which the drone can still
+    stop at MIN_DISTANCE. That keeps the same margin at a higher cruise speed.
+    """
+
+    def __init__(self, race_time: float = RACE_TIME, grid: Optional[OccupancyGrid] = None, estimate=None,
+                 range_filter: Optional[RangeFilter] = None, predictor: Optional[CollisionPredictor] = None,
+                 cruise: float = VELOCITY):
+        self.race_time = race_time
+        self.grid = grid
+        self.estimate = estimate
+        self.range_filter = range_filter
+        self.predictor = predictor
+        self.cruise = cruise
+        self.setpoint = (cruise, 0.0, 0.0)
+        self.start_time = None
+        self.side_start = None
+        self.lateral = 0.0
+        self.aborted = False
+
+    def _mapped_distance(self, direction: str, max_distance: float) -> Optional[float]:
+        """Distance to the nearest mapped obstacle in a direction, None if there is none."""
+        if self.grid is None or self.estimate is None or self.estimate.position is None:
+            return None
+        return self.grid.obstacle_distance(self.estimate.position, BODY_DIRECTIONS[direction], max_distance)
+
+    def _close(self, sample: RangeSample, direction: str) -> bool:
+        if self.range_filter is not None:
+            return self.range_filter.is_close(direction)
+        return is_close(getattr(sample, direction))
+
+    def _front_close(self, sample: RangeSample) -> bool:
+        if self.predictor is not None and self.predictor.threat('front'):
+            return True
+        return self._close(sample, 'front') or self._mapped_distance('front', MAP_CLEARANCE) is not None
+
+    def _forward(self) -> float:
+        """Forward speed, capped so the drone can still stop in front of what is ahead."""
+        if self.predictor is None:
+            return self.cruise
+        return min(self.cruise, self.predictor.speed_limit('front'))
+
+    def _clearance(self, range_value, direction: str) -> float:
+        """Free space to one side, the closer of the reading and the map (None counts as 10m)."""
+        reading = range_value if range_value is not None else MAP_LOOKAHEAD
+        mapped = self._mapped_distance(direction, MAP_LOOKAHEAD)
+        return reading if mapped is None else min(reading, mapped)
+
+    def __call__(self, sample: RangeSample):
+        if self.range_filter is not None:
+            sample = self.range_filter.update(sample)
+        if self.predictor is not None:
+            self.predictor.update(sample, self.setpoint)
+        setpoint = self._decide(sample)
+        if setpoint is not None:
+            self.setpoint = setpoint
+        return setpoint
+
+    def _decide(self, sample: RangeSample):
+        now = sample.timestamp
+        if self.start_time is None:
+            self.start_time = now
+
+        # Finish line reached
+        if now - self.start_time >= self.race_time:
+            return None
+
+        # Emergency: object above us -> stop race and land
+        if self._close(sample, 'up'):
+            print('Object detected above — stopping race')
+            self.aborted = True
+            return None
+
+        if self.side_start is not None:
+            # Continue sidestepping for SIDESTEP_TIME or until front is clear
+            if now - self.side_start < SIDESTEP_TIME and self._front_close(sample):
+                return self._forward(), self.lateral, 0.0
+            # Resume straight forward
+            self.side_start = None
+
+        # If obstacle in front, perform sidestep while continuing forward
+        if self._front_close(sample):
+            # Choose clearer side: prefer the side with larger reported or mapped distance
+            # Treat None as very large (no obstacle)
+            left = self._clearance(sample.left, 'left')
+            right = self._clearance(sample.right, 'right')
+
+            if left == right:
+                # Tie or both None -> pick a random side
+                side = random.choice(['left', 'right'])
+            else:
+                side = 'left' if left > right else 'right'
+
+            self.lateral = AVOID_LATERAL if side == 'left' else -AVOID_LATERAL
+            self.side_start = now
+            print(f'Front obstacle detected — sidestepping {side}')
+            return self._forward(), self.lateral, 0.0
+
+        # No front obstacle -> continue forward
+        return self._forward(), 0.0, 0.0
+
+
+def fly_race(scf, motion_commander, latency=None, race_time: Optional[float] = None,
+             grid: Optional[OccupancyGrid] = None, filter_ranges: bool = FILTER_RANGES,
+             predictive: bool = PREDICTIVE_AVOIDANCE):
+    """
+    Fly the race, reacting to every range sample as it arrives.
+
+    Args:
+        scf (SyncCrazyflie): connected Crazyflie with a Multi-ranger deck.
+        motion_commander (MotionCommander): commander of the flying drone.
+        latency (LatencyRecorder or None): collects sample-to-setpoint latency.
+        race_time (float or None): seconds of flight before the finish line,
+            the time RACE_DISTANCE takes at the cruise speed when None.
+        grid (OccupancyGrid or None): map to build and avoid, a new one when None.
+        filter_ranges (bool): react to filtered readings with hysteresis instead of raw ones.
+        predictive (bool): avoid by time to collision and cruise at PREDICTIVE_VELOCITY.
+
+    Returns:
+        RaceController: the controller, to inspect whether the race was aborted
+            and the map it built.
+    """
+    grid = grid if grid is not None else OccupancyGrid()
+    cruise = PREDICTIVE_VELOCITY if predictive else VELOCITY
+    race_time = race_time if race_time is not None else RACE_DISTANCE / cruise
+    # Start driving forward immediately
+    motion_commander.start_linear_motion(cruise, 0.0, 0.0)
+    with StateEstimate(scf) as estimate, RangeEventStream(scf) as ranges:
+        # Map first, so the controller already sees this sample in the grid
+        ranges.add_handler(OccupancyMapper(grid, estimate))
+        range_filter = RangeFilter(MIN_DISTANCE) if filter_ranges else None
+        predictor = CollisionPredictor(MIN_DISTANCE) if predictive else None
+        controller = RaceController(race_time, grid, estimate, range_filter, predictor, cruise)
+        run_event_loop(ranges, motion_commander, controller, latency)
+    return controller
+
+
 if __name__ == '__main__':
     # Initialize the low-level drivers for Crazyflie communication
     cflib.crtp.init_drivers()
 
-    # Create a Crazyflie object with a cache for parameters
-    cf = Crazyflie(rw_cache='./cache')
+    # Create a Crazyflie object using the shared TOC cache
+    cf = make_crazyflie()
 
     # Establish a synchronous connection to the Crazyflie
     with SyncCrazyflie(URI, cf=cf) as scf:
+        # Both the Flow deck and the Multi-ranger are needed, exits if one is missing
+        require_decks(scf)
+
         # Send an arming request to enable the drone for flight
         scf.cf.platform.send_arming_request(True)
         time.sleep(1.0)  # Wait for arming process to complete
 
-        # Enter motion control mode
-        with MotionCommander(scf, default_height=MINIMUM_HEIGHT) as motion_commander:
-            # Activate the Multi-ranger deck for distance sensing
-            with Multiranger(scf) as multiranger:
-                # Compute total time we need to drive forward to cover RACE_DISTANCE
-                total_time_needed = 190
-                start_time = time.time()
+        # Log the flight (estimate, ranges, battery, setpoints) as a compressed flight log
+        with FlightLogWriter(default_path(time.strftime('race_%Y%m%d_%H%M%S'), '.hdlog')) as flight_log:
+            flight_log.attach(scf)
 
+            # Enter motion control mode
+            with MotionCommander(scf, default_height=MINIMUM_HEIGHT) as motion_commander:
+                latency = LatencyRecorder()
+                grid = OccupancyGrid()
+                # Only send a setpoint when the velocity changes, or as a keep-alive, and log the ones sent
+                setpoints = SetpointSender(flight_log.commander(motion_commander))
                 try:
-                    # Start driving forward immediately
-                    motion_commander.start_linear_motion(VELOCITY, 0.0, 0.0)
-
-                    while True:
-                        elapsed = time.time() - start_time
-                        # Finish line reached
-                        if elapsed >= total_time_needed:
-                            break
-
-                        # Emergency: object above us -> stop race and land
-                        if is_close(multiranger.up):
-                            print('Object detected above — stopping race')
-                            break
-
-                        # If obstacle in front, perform sidestep while continuing forward
-                        if is_close(multiranger.front):
-                            # Choose clearer side: prefer the side with larger reported distance
-                            # Treat None as very large (no obstacle)
-                            left = multiranger.left if multiranger.left is not None else 10.0
-                            right = multiranger.right if multiranger.right is not None else 10.0
-
-                            if left == right:
-                                # Tie or both None -> pick a random side
-                                side = random.choice(['left', 'right'])
-                            else:
-                                side = 'left' if left > right else 'right'
-
-                            lateral = AVOID_LATERAL if side == 'left' else -AVOID_LATERAL
-                            print(f'Front obstacle detected — sidestepping {side}')
-
-                            # Start sidestep: keep forward speed and add lateral component
-                            motion_commander.start_linear_motion(VELOCITY, lateral, 0.0)
-
-                            # Continue sidestepping for SIDESTEP_TIME or until front is clear
-                            sidestart = time.time()
-                            while time.time() - sidestart < SIDESTEP_TIME:
-                                # If an object appears above during sidestep, abort
-                                if is_close(multiranger.up):
-                                    print('Object detected above during sidestep — aborting')
-                                    raise KeyboardInterrupt
-                                # If front cleared sufficiently, break early
-                                if not is_close(multiranger.front):
-                                    break
-                                time.sleep(LOOP_DT)
-
-                            # Resume straight forward
-                            motion_commander.start_linear_motion(VELOCITY, 0.0, 0.0)
-
-                        # No front obstacle -> continue forward (ensure setpoint active)
-                        time.sleep(LOOP_DT)
+                    fly_race(scf, setpoints, latency, grid=grid)
 
                 except KeyboardInterrupt:
                     # User requested abort (Ctrl-C)
@@ -127,8 +251,14 @@ if __name__ == '__main__':
                 finally:
                     # Stop horizontal motion and allow motion commander context to land
                     try:
-                        motion_commander.stop()
+                        setpoints.stop()
                     except Exception:
                         pass
 
-                print('Race finished or aborted — demo terminated!')
\ No newline at end of file
+                print('Race finished or aborted — demo terminated!')
+                latency.report()
+                setpoints.report()
+                grid.report()
+
+        # Per-stage loop timings, only when DRONE_PROFILE is set
+        instrumentation.report()
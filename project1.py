@@ -1,7 +1,6 @@
 import logging
 import sys
 import time
-import random
 from threading import Event
 
 import cflib.crtp
@@ -14,7 +13,9 @@ from cflib.utils import uri_helper
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 
-from typing import List, Any, Dict, Tuple
+from typing import List, Any, Dict, Optional, Tuple
+
+from waypoint_gen import generate_waypoints, waypoints_to_list
 
 # The following script initiates the drone, checks for the necessary sensor decks,
 # and executes a simple takeoff and landing maneuver.
@@ -41,27 +42,19 @@ MAX_RUN_TIME: float = 30       # Defines the maximum run time for the drone.
 INIT_POS: tuple = (0.0, 0.0)
 
 
-def generate_points(num_points: int) -> List:
+def generate_points(num_points: int, seed: Optional[int] = None) -> List:
     """
     Generate n points within a box (0.5x0.5 for now)
 
     Args:
         num_points (int): amount of random points to generate
+        seed (int or None): seed for repeatable points
 
     Returns:
         w_points (List[tuple[float, float]]): random generated points to traverse 
     """
 
-    w_points = []
-    
-    for _ in range(num_points-1):
-        
-        x = random.uniform(-BOX_LIMIT, BOX_LIMIT)
-        y = random.uniform(-BOX_LIMIT, BOX_LIMIT)
-        
-        w_points.append((x, y))
-    
-    return w_points
+    return waypoints_to_list(generate_waypoints(max(num_points - 1, 0), BOX_LIMIT, seed=seed))
 
 def create_box(curr_pos: tuple, dest: tuple):
     
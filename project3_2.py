@@ -1,47 +1,59 @@
 """
 Example script that allows the Crazyflie to follow a 1-meter forward path
 while avoiding obstacles using the Multi-ranger deck.
+
+With USE_PLANNER the drone plans its way to the goal over a map of what
+the Multi-ranger has seen (D* Lite, see path_planner.py) instead of
+reacting to each reading with fixed left/right/back rules.
 """
 
 import logging
-import sys
+import math
 import time
 import cflib.crtp
-from cflib.crazyflie import Crazyflie
 from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
 from cflib.positioning.motion_commander import MotionCommander
 from cflib.utils import uri_helper
-from cflib.utils.multiranger import Multiranger
-from threading import Event
+from typing import Optional
+
+from collision_predictor import CollisionPredictor
+from occupancy_grid import BODY_DIRECTIONS, OccupancyGrid, OccupancyMapper
+from odometry import ODOMETRY_PERIOD_MS, Odometry
+from path_planner import DStarLite
+import instrumentation
+from range_events import LatencyRecorder, RangeEventStream, RangeSample, run_event_loop
+from range_filter import RangeFilter
+from state_estimate import StateEstimate
+from preflight import require_decks
+from toc_cache import make_crazyflie
 
 URI = uri_helper.uri_from_env(default='radio://0/80/2M/E7E7E7E7E5')
 logging.basicConfig(level=logging.ERROR)
 
-deck_attached_event = Event()
+# Goal parameters
+TARGET_DISTANCE = 1.0  # 1 meter forward
 
+# Movement parameters
+FLIGHT_HEIGHT = 0.2  # Default flight height in meters
+FORWARD_VELOCITY = 0.1  # Base forward speed
+AVOIDANCE_VELOCITY = 0.1  # Speed for obstacle avoidance
+MIN_DISTANCE = 0.3  # Increased for better obstacle avoidance
+MAP_CLEARANCE = 0.3  # Mapped obstacles closer than this count as close, same as is_close()
+FILTER_RANGES = True  # Filter the readings and use hysteresis instead of the raw single cutoff
+PREDICTIVE_AVOIDANCE = True  # Avoid by time to collision, which allows the faster PREDICTIVE_VELOCITY
+PREDICTIVE_VELOCITY = 0.25  # Base forward speed with predictive avoidance
+BODY_CLEARANCE = 0.06  # Meters to keep sidestepping once the front ranger is past an obstacle's edge
 
-def param_deck_flow(name, value_str):
-    """
-    --------------------------------------
-    Callback function that checks if a specific sensor deck is attached.
-
-    Args:
-        name (str): The name of the deck parameter.
-        value_str (str): The value as a string, indicating whether the deck is detected.
+# Planning parameters
+USE_PLANNER = True  # Plan around mapped obstacles instead of the reactive rules
+GOAL_TOLERANCE = 0.05  # Distance in meters at which the goal counts as reached
+ARRIVAL_GAIN = 2.0  # Proportional gain (1/s) used to slow down close to the goal
+PLAN_TIMEOUT = 60.0  # Seconds before giving up on reaching the goal
 
-    If the deck is detected, an event is triggered.
-    """
-    value = int(value_str)
-    if value:
-        deck_attached_event.set()
-        print(f'Deck {name} is attached!')
-    else:
-        print(f'Deck {name} is NOT attached!')
 
 # ---------------------------------------------------------------------------
 def is_close(range_value):
     """Check if an object is too close to the drone."""
-    MIN_DISTANCE = 0.3  # Increased for better obstacle avoidance
     if range_value is None:
         return False
     else:
@@ -49,85 +61,306 @@ def is_close(range_value):
 # ---------------------------------------------------------------------------
 
 
+class PathFollower:
+    """
+    Decides the velocity for each range sample while following a straight
+    path of TARGET_DISTANCE meters, going around obstacles on the way.
+
+    With a grid and an estimate, obstacles mapped earlier count as close
+    too, so an obstacle that has left a sensor's view is not forgotten.
+    With odometry, progress is the forward displacement the state estimate
+    measured; without it, the forward setpoints are added up as before.
+    With a range filter, the filtered readings and its hysteresis decide
+    what is close instead of the raw readings. With a collision predictor,
+    a direction also counts as close once its time to collision is shorter
+    than the time it takes to stop, and the forward speed is capped so the
+    drone can still stop at MIN_DISTANCE. Sidesteps around an obstacle in
+    front then go BODY_CLEARANCE further than the front reading alone would,
+    as the faster drone otherwise clips the obstacle with its airframe.
+    """
+
+    def __init__(self, target_distance: float = TARGET_DISTANCE, grid: Optional[OccupancyGrid] = None,
+                 estimate=None, odometry: Optional[Odometry] = None, range_filter: Optional[RangeFilter] = None,
+                 predictor: Optional[CollisionPredictor] = None, forward_velocity: float = FORWARD_VELOCITY):
+        self.target_distance = target_distance
+        self.grid = grid
+        self.estimate = estimate
+        self.odometry = odometry
+        self.range_filter = range_filter
+        self.predictor = predictor
+        self.forward_velocity = forward_velocity
+        self.setpoint = (0.0, 0.0, 0.0)
+        self.sidestep = 0.0  # Sideways velocity of the last avoidance of an obstacle in front
+        self.sidestep_until = 0.0
+        self.distance_traveled = 0.0
+        self.last_time = None
+        self.last_forward = 0.0  # Forward velocity of the previous setpoint
+
+    def _reading_close(self, range_value, direction: str) -> bool:
+        """Check the reading alone, through the range filter when there is one."""
+        if self.predictor is not None and self.predictor.threat(direction):
+            return True
+        if self.range_filter is not None:
+            return self.range_filter.is_close(direction)
+        return is_close(range_value)
+
+    def _close(self, range_value, direction: str) -> bool:
+        """Check the reading, then the map, for an obstacle in a direction."""
+        if self._reading_close(range_value, direction):
+            return True
+        if self.grid is None or self.estimate is None or self.estimate.position is None:
+            return False
+        return self.grid.obstacle_distance(self.estimate.position, BODY_DIRECTIONS[direction],
+                                           MAP_CLEARANCE) is not None
+
+    def __call__(self, sample: RangeSample):
+        if self.range_filter is not None:
+            sample = self.range_filter.update(sample)
+        if self.predictor is not None:
+            self.predictor.update(sample, self.setpoint)
+        setpoint = self._decide(sample)
+        self.setpoint = setpoint or (0.0, 0.0, 0.0)
+        if self.odometry is not None:
+            self.odometry.command(*(setpoint or (0.0, 0.0, 0.0)))
+        return setpoint
+
+    def _decide(self, sample: RangeSample):
+        if self.odometry is not None:
+            # Forward progress as measured by the onboard state estimate
+            self.distance_traveled = self.odometry.displacement[0]
+        elif self.last_time is not None:
+            # Estimate distance traveled since the previous setpoint (only count forward movement)
+            self.distance_traveled += self.last_forward * (sample.timestamp - self.last_time)
+        self.last_time = sample.timestamp
+
+        if self.distance_traveled >= self.target_distance:
+            return None
+
+        # Stop if object detected above
+        if self._reading_close(sample.up, 'up'):
+            print('Object above detected - landing!')
+            return None
+
+        # Default: move forward toward goal
+        velocity_x = self.forward_velocity
+        if self.predictor is not None:
+            velocity_x = min(velocity_x, self.predictor.speed_limit('front'))
+        velocity_y = 0.0
+
+        # Obstacle avoidance takes priority
+        obstacle_detected = False
+
+        if self._close(sample.front, 'front'):
+            print('Obstacle ahead! Stopping forward movement.')
+            velocity_x = 0.0
+            obstacle_detected = True
+
+            # Try to go around the obstacle
+            if not self._close(sample.left, 'left'):
+                velocity_y = AVOIDANCE_VELOCITY  # Move left
+                print('Moving left to avoid')
+            elif not self._close(sample.right, 'right'):
+                velocity_y = -AVOIDANCE_VELOCITY  # Move right
+                print('Moving right to avoid')
+            else:
+                velocity_x = -AVOIDANCE_VELOCITY  # Move back
+                print('Moving backward to avoid')
+            self.sidestep = velocity_y
+            self.sidestep_until = sample.timestamp + BODY_CLEARANCE / AVOIDANCE_VELOCITY
+        elif self.predictor is not None and sample.timestamp < self.sidestep_until:
+            # The front ranger clears the obstacle's edge before the airframe does, keep going sideways
+            velocity_x = 0.0
+            velocity_y = self.sidestep
+            obstacle_detected = True
+
+        if self._close(sample.left, 'left'):
+            velocity_y -= AVOIDANCE_VELOCITY  # Move right
+            obstacle_detected = True
+
+        if self._close(sample.right, 'right'):
+            velocity_y += AVOIDANCE_VELOCITY  # Move left
+            obstacle_detected = True
+
+        if self._close(sample.back, 'back'):
+            velocity_x += AVOIDANCE_VELOCITY  # Move forward
+            obstacle_detected = True
+
+        self.last_forward = velocity_x if velocity_x > 0 and not obstacle_detected else 0.0
+        print(f'Distance: {self.distance_traveled:.2f}m / {self.target_distance}m')
+        return velocity_x, velocity_y, 0.0
+
+
+def follow_path(scf, motion_commander, latency=None, target_distance: float = TARGET_DISTANCE,
+                grid: Optional[OccupancyGrid] = None, timeout: Optional[float] = None,
+                filter_ranges: bool = FILTER_RANGES, predictive: bool = PREDICTIVE_AVOIDANCE):
+    """
+    Follow the path, reacting to every range sample as it arrives.
+
+    Args:
+        scf (SyncCrazyflie): connected Crazyflie with a Multi-ranger deck.
+        motion_commander (MotionCommander): commander of the flying drone.
+        latency (LatencyRecorder or None): collects sample-to-setpoint latency.
+        target_distance (float): meters to travel forward.
+        grid (OccupancyGrid or None): map to build and avoid, a new one when None.
+        timeout (float or None): give up after this many seconds, never when None.
+        filter_ranges (bool): react to filtered readings with hysteresis instead of raw ones.
+        predictive (bool): avoid by time to collision and fly forward at PREDICTIVE_VELOCITY.
+
+    Returns:
+        PathFollower: the controller, holding the distance traveled, the map
+            and the odometry.
+    """
+    grid = grid if grid is not None else OccupancyGrid()
+    with StateEstimate(scf, ODOMETRY_PERIOD_MS) as estimate, RangeEventStream(scf) as ranges, \
+            Odometry(estimate, goal=(target_distance, 0.0)) as odometry:
+        # Map first, so the controller already sees this sample in the grid
+        ranges.add_handler(OccupancyMapper(grid, estimate))
+        range_filter = RangeFilter(MIN_DISTANCE) if filter_ranges else None
+        predictor = CollisionPredictor(MIN_DISTANCE) if predictive else None
+        forward_velocity = PREDICTIVE_VELOCITY if predictive else FORWARD_VELOCITY
+        follower = PathFollower(target_distance, grid, estimate, odometry, range_filter, predictor, forward_velocity)
+        run_event_loop(ranges, motion_commander, follower, latency, timeout)
+
+    # Stop at the end
+    motion_commander.start_linear_motion(0, 0, 0)
+    return follower
+
+
+class PlanningFollower:
+    """
+    Follows a D* Lite plan to a goal TARGET_DISTANCE ahead of where the
+    odometry started. The plan is repaired on every range sample, after the
+    sample has been added to the map, and the drone is steered towards a
+    point a short way along it. With a range filter, an object above only
+    ends the flight once the filtered reading says so.
+    """
+
+    def __init__(self, grid: OccupancyGrid, estimate, odometry: Odometry,
+                 target_distance: float = TARGET_DISTANCE, range_filter: Optional[RangeFilter] = None):
+        self.grid = grid
+        self.estimate = estimate
+        self.odometry = odometry
+        self.target_distance = target_distance
+        self.range_filter = range_filter
+        self.planner: Optional[DStarLite] = None
+        self.goal = None
+        self.reached = False
+        self.blocked = False  # No path to the goal at the previous sample
+
+    @property
+    def distance_traveled(self) -> float:
+        """Forward displacement, the same measure PathFollower uses."""
+        return self.odometry.displacement[0]
+
+    def __call__(self, sample: RangeSample):
+        if self.range_filter is not None:
+            sample = self.range_filter.update(sample)
+        setpoint = self._decide(sample)
+        self.odometry.command(*(setpoint or (0.0, 0.0, 0.0)))
+        return setpoint
+
+    def _decide(self, sample: RangeSample):
+        position = self.estimate.position
+        origin = self.odometry.origin
+        if position is None or origin is None:
+            return 0.0, 0.0, 0.0  # Wait for the first position estimate
+        if self.planner is None:
+            self.goal = (origin.x + self.target_distance, origin.y)
+            self.planner = DStarLite(self.grid, position, self.goal)
+
+        # Stop if object detected above
+        above = self.range_filter.is_close('up') if self.range_filter is not None else is_close(sample.up)
+        if above:
+            print('Object above detected - landing!')
+            return None
+
+        dx, dy, _ = self.odometry.displacement
+        to_goal = math.hypot(self.target_distance - dx, dy)
+        if to_goal <= GOAL_TOLERANCE:
+            self.reached = True
+            return None
+
+        self.planner.update_start(position)
+        if not self.planner.replan():
+            if self.planner.searching:
+                return 0.0, 0.0, 0.0  # Plan not finished yet, hold position until it is
+            if not self.blocked:
+                print('No path to the goal - hovering')
+            self.blocked = True
+            return 0.0, 0.0, 0.0
+        self.blocked = False
+        waypoint = self.planner.next_waypoint()
+        if self.planner.start == self.planner.goal or to_goal < math.hypot(waypoint[0] - position[0],
+                                                                           waypoint[1] - position[1]):
+            waypoint = self.goal  # Final approach, aim at the goal itself rather than its cell
+        dx, dy = waypoint[0] - position[0], waypoint[1] - position[1]
+        distance = math.hypot(dx, dy)
+        if distance == 0.0:
+            return 0.0, 0.0, 0.0
+        speed = min(FORWARD_VELOCITY, ARRIVAL_GAIN * to_goal)
+        return dx / distance * speed, dy / distance * speed, 0.0
+
+
+def follow_planned_path(scf, motion_commander, latency=None, target_distance: float = TARGET_DISTANCE,
+                        grid: Optional[OccupancyGrid] = None, filter_ranges: bool = FILTER_RANGES):
+    """
+    Fly to the goal along a plan that is repaired as the map grows.
+
+    Args:
+        scf (SyncCrazyflie): connected Crazyflie with a Multi-ranger deck.
+        motion_commander (MotionCommander): commander of the flying drone.
+        latency (LatencyRecorder or None): collects sample-to-setpoint latency.
+        target_distance (float): meters to the goal, straight ahead.
+        grid (OccupancyGrid or None): map to build and plan on, a new one when None.
+        filter_ranges (bool): filter the readings before checking for an object above.
+
+    Returns:
+        PlanningFollower: the controller, holding the distance traveled, the map,
+            the planner and the odometry.
+    """
+    grid = grid if grid is not None else OccupancyGrid()
+    with StateEstimate(scf, ODOMETRY_PERIOD_MS) as estimate, RangeEventStream(scf) as ranges, \
+            Odometry(estimate, goal=(target_distance, 0.0)) as odometry:
+        # Map first, so the plan already accounts for this sample
+        ranges.add_handler(OccupancyMapper(grid, estimate))
+        range_filter = RangeFilter(MIN_DISTANCE) if filter_ranges else None
+        follower = PlanningFollower(grid, estimate, odometry, target_distance, range_filter)
+        run_event_loop(ranges, motion_commander, follower, latency, timeout=PLAN_TIMEOUT)
+
+    # Stop at the end
+    motion_commander.start_linear_motion(0, 0, 0)
+    if follower.planner is not None:
+        follower.planner.close()
+    return follower
+
+
 if __name__ == '__main__':
     cflib.crtp.init_drivers()
-    cf = Crazyflie(rw_cache='./cache')
+    cf = make_crazyflie()
 
     with SyncCrazyflie(URI, cf=cf) as scf:
+        # Both the Flow deck and the Multi-ranger are needed, exits if one is missing
+        require_decks(scf)
+
         scf.cf.platform.send_arming_request(True)
         time.sleep(1.0)
 
-        with MotionCommander(scf, default_height=0.2) as motion_commander:
-            with Multiranger(scf) as multiranger:
-                
-                # Goal parameters
-                TARGET_DISTANCE = 1.0  # 1 meter forward
-                distance_traveled = 0.0
-                start_time = time.time()
-                
-                # Movement parameters
-                FORWARD_VELOCITY = 0.1  # Base forward speed
-                AVOIDANCE_VELOCITY = 0.1  # Speed for obstacle avoidance
-                
-                print('Starting path following...')
-                keep_flying = True
-
-                while keep_flying and distance_traveled < TARGET_DISTANCE:
-                    # Default: move forward toward goal
-                    velocity_x = FORWARD_VELOCITY
-                    velocity_y = 0.0
-                    
-                    # Obstacle avoidance takes priority
-                    obstacle_detected = False
-                    
-                    if is_close(multiranger.front):
-                        print('Obstacle ahead! Stopping forward movement.')
-                        velocity_x = 0.0
-                        obstacle_detected = True
-                        
-                        # Try to go around the obstacle
-                        if not is_close(multiranger.left):
-                            velocity_y = AVOIDANCE_VELOCITY  # Move left
-                            print('Moving left to avoid')
-                        elif not is_close(multiranger.right):
-                            velocity_y = -AVOIDANCE_VELOCITY  # Move right
-                            print('Moving right to avoid')
-                        else:
-                            velocity_x = -AVOIDANCE_VELOCITY  # Move back
-                            print('Moving backward to avoid')
-                    
-                    if is_close(multiranger.left):
-                        velocity_y -= AVOIDANCE_VELOCITY  # Move right
-                        obstacle_detected = True
-                        
-                    if is_close(multiranger.right):
-                        velocity_y += AVOIDANCE_VELOCITY  # Move left
-                        obstacle_detected = True
-                    
-                    if is_close(multiranger.back):
-                        velocity_x += AVOIDANCE_VELOCITY  # Move forward
-                        obstacle_detected = True
-                    
-                    # Stop if object detected above
-                    if is_close(multiranger.up):
-                        print('Object above detected - landing!')
-                        keep_flying = False
-                        break
-                    
-                    # Apply velocity
-                    motion_commander.start_linear_motion(velocity_x, velocity_y, 0)
-                    
-                    # Estimate distance traveled (only count forward movement)
-                    if velocity_x > 0 and not obstacle_detected:
-                        distance_traveled += velocity_x * 0.1
-                    
-                    print(f'Distance: {distance_traveled:.2f}m / {TARGET_DISTANCE}m')
-                    
-                    time.sleep(0.1)
-                
-                # Stop at the end
-                motion_commander.start_linear_motion(0, 0, 0)
-                print(f'Path complete! Traveled: {distance_traveled:.2f}m')
-                time.sleep(1.0)
-
-                print('Demo terminated!')
\ No newline at end of file
+        with MotionCommander(scf, default_height=FLIGHT_HEIGHT) as motion_commander:
+            print('Starting path following...')
+            latency = LatencyRecorder()
+            if USE_PLANNER:
+                follower = follow_planned_path(scf, motion_commander, latency)
+            else:
+                follower = follow_path(scf, motion_commander, latency)
+            print(f'Path complete! Traveled: {follower.distance_traveled:.2f}m')
+            time.sleep(1.0)
+
+            print('Demo terminated!')
+            latency.report()
+            follower.grid.report()
+            follower.odometry.report()
+            if USE_PLANNER and follower.planner is not None:
+                follower.planner.report()
+
+        # Per-stage loop timings, only when DRONE_PROFILE is set
+        instrumentation.report()
@@ -0,0 +1,227 @@
+"""
+Callback-driven Multiranger readings.
+
+cflib's Multiranger only stores the latest log packet, so the avoidance
+scripts had to poll it and sleep. RangeEventStream instead hands every new
+range packet to the registered handlers as soon as it arrives, and
+run_event_loop() uses that to send a new setpoint per sample.
+
+Both run_event_loop() and run_polling_loop() record the sample-to-setpoint
+latency of every setpoint actually sent, so the two control paths can be
+compared directly.
+"""
+
+import time
+from threading import Event
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from cflib.crazyflie.log import LogConfig
+
+import instrumentation
+
+RANGE_PERIOD_MS = 100       # Same rate as cflib's Multiranger default
+IDLE_SLEEP = 0.05           # How often the waiting thread checks if the loop is done
+DIRECTIONS = ('front', 'back', 'left', 'right', 'up')
+
+Setpoint = Tuple[float, float, float]
+
+
+class RangeSample(NamedTuple):
+    """One Multiranger packet. Distances are in meters, None when out of range."""
+    timestamp: float
+    front: Optional[float]
+    back: Optional[float]
+    left: Optional[float]
+    right: Optional[float]
+    up: Optional[float]
+
+
+def _convert_log_to_distance(data: int) -> Optional[float]:
+    if data >= 8000:
+        return None
+    return data / 1000.0
+
+
+class LatencyRecorder:
+    """
+    Collects sample-to-setpoint latencies and summarizes their distribution.
+
+    Latencies go into an instrumentation.Histogram, so memory use is fixed
+    however long the flight and percentiles are within 1/SUB_BUCKETS.
+    """
+
+    def __init__(self):
+        self.histogram = instrumentation.Histogram('latency')
+        self._total_ns = 0
+
+    def record(self, seconds: float) -> None:
+        value = int(seconds * 1e9)
+        self.histogram.record(value)
+        self._total_ns += value
+
+    @property
+    def count(self) -> int:
+        return self.histogram.count
+
+    def percentile(self, p: float) -> float:
+        """
+        Args:
+            p (float): percentile between 0 and 100.
+
+        Returns:
+            float: latency in seconds, upper bound of its histogram bucket,
+                0.0 if nothing was recorded.
+        """
+        return self.histogram.percentile(p) / 1e9
+
+    def summary(self) -> dict:
+        count = self.count
+        return {
+            'count': count,
+            'mean_ms': self._total_ns / count / 1e6 if count else 0.0,
+            'p50_ms': 1000 * self.percentile(50),
+            'p90_ms': 1000 * self.percentile(90),
+            'p99_ms': 1000 * self.percentile(99),
+            'max_ms': self.histogram.max / 1e6,
+        }
+
+    def report(self, label: str = 'sample-to-setpoint') -> None:
+        s = self.summary()
+        print(f"{label} latency over {s['count']} setpoints: "
+              f"mean {s['mean_ms']:.1f}ms, p50 {s['p50_ms']:.1f}ms, p90 {s['p90_ms']:.1f}ms, "
+              f"p99 {s['p99_ms']:.1f}ms, max {s['max_ms']:.1f}ms")
+
+
+class RangeEventStream:
+    """
+    Streams Multiranger readings to handlers as they arrive.
+
+    Handlers are called as handler(sample) on the cflib log thread (or the
+    simulator thread), so they should only do a small amount of work.
+
+    Args:
+        scf (SyncCrazyflie): connected Crazyflie with a Multi-ranger deck.
+        rate_ms (int): log period in milliseconds.
+    """
+
+    def __init__(self, scf, rate_ms: int = RANGE_PERIOD_MS):
+        self._cf = scf.cf
+        self._log_config = LogConfig('rangeEvents', rate_ms)
+        for name in DIRECTIONS:
+            self._log_config.add_variable('range.' + name, 'uint16_t')
+        self._log_config.data_received_cb.add_callback(self._data_received)
+        self._handlers: List[Callable[[RangeSample], None]] = []
+        self.latest: Optional[RangeSample] = None
+
+    def add_handler(self, handler: Callable[[RangeSample], None]) -> None:
+        self._handlers.append(handler)
+
+    def remove_handler(self, handler: Callable[[RangeSample], None]) -> None:
+        self._handlers.remove(handler)
+
+    def _data_received(self, timestamp, data, logconf) -> None:
+        profile = instrumentation.active
+        if profile:
+            start = profile.now()
+        sample = RangeSample(time.perf_counter(),
+                             *(_convert_log_to_distance(data['range.' + name]) for name in DIRECTIONS))
+        self.latest = sample
+        if profile:
+            profile.stages['range_read'].lap(start)
+        for handler in self._handlers:
+            handler(sample)
+
+    def start(self) -> None:
+        self._cf.log.add_config(self._log_config)
+        self._log_config.start()
+
+    def stop(self) -> None:
+        self._log_config.delete()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def run_event_loop(stream: RangeEventStream, motion_commander,
+                   controller: Callable[[RangeSample], Optional[Setpoint]],
+                   latency: Optional[LatencyRecorder] = None, timeout: Optional[float] = None) -> None:
+    """
+    Send a setpoint for every range sample until the controller returns None.
+
+    Args:
+        stream (RangeEventStream): started range stream.
+        motion_commander (MotionCommander): commander of a flying drone.
+        controller (Callable): maps a RangeSample to (vx, vy, vz), or None to finish.
+        latency (LatencyRecorder or None): receives one latency per setpoint sent. A
+            commander that drops repeated setpoints (SetpointSender) returns False
+            for those, and they are not recorded.
+        timeout (float or None): give up after this many seconds.
+    """
+    done = Event()
+    profile = instrumentation.active
+
+    def on_sample(sample: RangeSample) -> None:
+        if done.is_set():
+            return
+        if profile:
+            lap = profile.now()
+        setpoint = controller(sample)
+        if profile:
+            lap = profile.stages['decide'].lap(lap)
+        if setpoint is None:
+            done.set()
+            return
+        sent = motion_commander.start_linear_motion(*setpoint)
+        if profile:
+            profile.stages['setpoint'].lap(lap)
+        if latency is not None and sent is not False:
+            latency.record(time.perf_counter() - sample.timestamp)
+
+    stream.add_handler(on_sample)
+    start = time.time()
+    try:
+        while not done.is_set():
+            if timeout is not None and time.time() - start >= timeout:
+                break
+            if profile:
+                lap = profile.now()
+            time.sleep(IDLE_SLEEP)
+            if profile:
+                profile.stages['sleep'].lap(lap)
+    finally:
+        stream.remove_handler(on_sample)
+
+
+def run_polling_loop(stream: RangeEventStream, motion_commander,
+                     controller: Callable[[RangeSample], Optional[Setpoint]], period: float,
+                     latency: Optional[LatencyRecorder] = None, timeout: Optional[float] = None) -> None:
+    """
+    Original control path: read the latest sample every period seconds.
+    Kept as the reference the event loop is compared against.
+    """
+    profile = instrumentation.active
+    start = time.time()
+    while timeout is None or time.time() - start < timeout:
+        sample = stream.latest
+        if sample is None:
+            time.sleep(period)
+            continue
+        if profile:
+            lap = profile.now()
+        setpoint = controller(sample._replace(timestamp=time.perf_counter()))
+        if profile:
+            lap = profile.stages['decide'].lap(lap)
+        if setpoint is None:
+            break
+        sent = motion_commander.start_linear_motion(*setpoint)
+        if profile:
+            lap = profile.stages['setpoint'].lap(lap)
+        if latency is not None and sent is not False:
+            latency.record(time.perf_counter() - sample.timestamp)
+        time.sleep(period)
+        if profile:
+            profile.stages['sleep'].lap(lap)
@@ -0,0 +1,262 @@
+"""
+Streaming Multi-ranger filter with hysteresis.
+
+The avoidance scripts compared every raw range sample to a single cutoff,
+so one spurious short reading was enough to start a sidestep. RangeFilter
+sits between the RangeEventStream and the controller and runs, per
+direction:
+
+    outlier gate    a reading more than OUTLIER_DISTANCE away from the
+                    current median is held back; it only gets in once
+                    CONFIRM readings in a row agree on it, so short bursts
+                    of spikes are dropped and a real step is accepted
+                    CONFIRM - 1 samples late
+    sliding median  over the last WINDOW accepted readings
+    Kalman filter   optional scalar filter on the median, reset on every
+                    confirmed step so it never lags behind a new obstacle
+    hysteresis      close once the value drops below enter, clear again
+                    only once it rises above exit = enter + HYSTERESIS
+
+Out-of-range readings (None) are filtered as OUT_OF_RANGE meters and come
+out as None again. Every update is a few comparisons and in-place edits of
+WINDOW-sized lists that are allocated once.
+
+Replaying a recording through the filter counts how many avoidance
+maneuvers it would have prevented, one maneuver being a direction going
+from clear to close:
+
+    python range_filter.py telemetry/flight.telem [MIN_DISTANCE]
+"""
+
+import math
+import sys
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from range_events import DIRECTIONS, RangeSample
+
+WINDOW = 3                  # Readings in the sliding median
+OUTLIER_DISTANCE = 0.15     # Meters from the median beyond which a reading needs confirming
+CONFIRM = 3                 # Readings in a row it takes to confirm a step
+HYSTERESIS = 0.05           # Meters between the enter and exit thresholds
+OUT_OF_RANGE = 8.0          # Meters standing in for None inside the filter
+KALMAN_PROCESS = 0.05       # Process noise in m^2/s, how fast a range can drift
+KALMAN_MEASUREMENT = 0.01 ** 2  # Measurement noise in m^2
+
+
+class ChannelFilter:
+    """
+    Filter for one ranger direction.
+
+    Args:
+        enter (float): close below this many meters.
+        exit (float): clear again above this many meters.
+        window (int): readings in the sliding median.
+        outlier_distance (float): meters from the median that make a reading suspect.
+        confirm (int): suspect readings in a row, within outlier_distance of each other, that make a step.
+        kalman (bool): smooth the median with a scalar Kalman filter.
+    """
+
+    def __init__(self, enter: float, exit: float, window: int = WINDOW,
+                 outlier_distance: float = OUTLIER_DISTANCE, confirm: int = CONFIRM, kalman: bool = False):
+        self.enter = enter
+        self.exit = exit
+        self.outlier_distance = outlier_distance
+        self.confirm = confirm
+        self.kalman = kalman
+        self.value: Optional[float] = None
+        self.close = False
+        self.outliers = 0           # Readings dropped by the outlier gate
+        self._ring = [OUT_OF_RANGE] * window
+        self._sorted = [OUT_OF_RANGE] * window
+        self._head = 0
+        self._suspects = [0.0] * max(1, confirm - 1)
+        self._held = 0              # Suspect readings waiting for confirmation
+        self._started = False
+        self._estimate = OUT_OF_RANGE
+        self._variance = KALMAN_MEASUREMENT
+        self._last_time: Optional[float] = None
+
+    def _push(self, reading: float) -> None:
+        old = self._ring[self._head]
+        del self._sorted[bisect_left(self._sorted, old)]
+        insort(self._sorted, reading)
+        self._ring[self._head] = reading
+        self._head = (self._head + 1) % len(self._ring)
+
+    def update(self, reading: Optional[float], timestamp: float) -> Optional[float]:
+        """
+        Filter one reading.
+
+        Args:
+            reading (float or None): distance in meters, None when out of range.
+            timestamp (float): seconds, used by the Kalman filter.
+
+        Returns:
+            float or None: filtered distance, None when out of range.
+        """
+        reading = OUT_OF_RANGE if reading is None else reading
+        if not self._started:
+            self._ring[:] = self._sorted[:] = [reading] * len(self._ring)
+            self._estimate = reading
+            self._started = True
+
+        median = self._sorted[len(self._sorted) // 2]
+        step = False
+        suspects = self._suspects
+        if abs(reading - median) <= self.outlier_distance:
+            self._held = 0
+            self._push(reading)
+        else:
+            if self._held and abs(reading - suspects[self._held - 1]) > self.outlier_distance:
+                self._held = 0      # Not the same step as the readings held so far
+            if self._held + 1 < self.confirm:
+                suspects[self._held] = reading
+                self._held += 1
+                self.outliers += 1
+            else:
+                # Confirmed: a real step, let the held readings in as well
+                for i in range(self._held):
+                    self._push(suspects[i])
+                self.outliers -= self._held
+                self._push(reading)
+                self._held = 0
+                step = True
+        value = self._sorted[len(self._sorted) // 2]
+
+        if self.kalman:
+            if step or value >= OUT_OF_RANGE or self._estimate >= OUT_OF_RANGE or self._last_time is None:
+                self._estimate, self._variance = value, KALMAN_MEASUREMENT
+            else:
+                self._variance += KALMAN_PROCESS * max(0.0, timestamp - self._last_time)
+                gain = self._variance / (self._variance + KALMAN_MEASUREMENT)
+                self._estimate += gain * (value - self._estimate)
+                self._variance *= 1.0 - gain
+            value = self._estimate
+        self._last_time = timestamp
+
+        if self.close:
+            self.close = value <= self.exit
+        else:
+            self.close = value < self.enter
+        self.value = None if value >= OUT_OF_RANGE else value
+        return self.value
+
+
+class RangeFilter:
+    """
+    Filters whole Multi-ranger samples and keeps the close state of every direction.
+
+    Args:
+        enter (float): close below this many meters, the scripts' MIN_DISTANCE.
+        hysteresis (float): the close state clears above enter + hysteresis.
+        window (int): readings in each sliding median.
+        outlier_distance (float): meters from the median that make a reading suspect.
+        confirm (int): suspect readings in a row that make a step.
+        kalman (bool): also run the scalar Kalman filter.
+
+    Example:
+        range_filter = RangeFilter(MIN_DISTANCE)
+        sample = range_filter.update(sample)
+        if range_filter.is_close('front'):
+            ...
+    """
+
+    def __init__(self, enter: float, hysteresis: float = HYSTERESIS, window: int = WINDOW,
+                 outlier_distance: float = OUTLIER_DISTANCE, confirm: int = CONFIRM, kalman: bool = False):
+        self.channels = {name: ChannelFilter(enter, enter + hysteresis, window, outlier_distance, confirm, kalman)
+                         for name in DIRECTIONS}
+        self._ordered = [self.channels[name] for name in DIRECTIONS]
+        self.latest: Optional[RangeSample] = None
+
+    def update(self, sample: RangeSample) -> RangeSample:
+        """Filter a raw sample and return the filtered one, with the same timestamp."""
+        t = sample.timestamp
+        front, back, left, right, up = self._ordered
+        self.latest = RangeSample(t, front.update(sample.front, t), back.update(sample.back, t),
+                                  left.update(sample.left, t), right.update(sample.right, t),
+                                  up.update(sample.up, t))
+        return self.latest
+
+    def is_close(self, direction: str) -> bool:
+        return self.channels[direction].close
+
+    @property
+    def outliers(self) -> int:
+        return sum(channel.outliers for channel in self._ordered)
+
+
+# Replay
+
+def samples_from_telemetry(path: str) -> Iterator[RangeSample]:
+    """
+    Range samples of a TelemetryRecorder file.
+
+    The recorder stores the latest ranges with every state record, so
+    consecutive records with identical ranges are merged back into one
+    sample. Two genuinely identical packets in a row are merged as well,
+    which noise makes rare.
+    """
+    from telemetry_recorder import TelemetryRecorder
+
+    with TelemetryRecorder(path, readonly=True) as telemetry:
+        records = telemetry.snapshot()
+    ranges = np.stack([records[name] for name in DIRECTIONS], axis=1)
+    same = (ranges[1:] == ranges[:-1]) | (np.isnan(ranges[1:]) & np.isnan(ranges[:-1]))
+    keep = np.concatenate(([True], ~same.all(axis=1)))
+    for t, row in zip(records['t'][keep].tolist(), ranges[keep].tolist()):
+        yield RangeSample(t, *(None if math.isnan(value) else value for value in row))
+
+
+def count_maneuvers(samples: Iterable[RangeSample], range_filter: RangeFilter,
+                    enter: float) -> Dict[str, Tuple[int, int]]:
+    """
+    Replay samples and count avoidance maneuvers with and without the filter.
+
+    Args:
+        samples (Iterable[RangeSample]): raw samples in time order.
+        range_filter (RangeFilter): fresh filter to replay through.
+        enter (float): the raw single cutoff the scripts used.
+
+    Returns:
+        Dict[str, Tuple[int, int]]: per direction, maneuvers started on raw
+            readings and on filtered ones.
+    """
+    counts = {name: [0, 0] for name in DIRECTIONS}
+    raw_close = dict.fromkeys(DIRECTIONS, False)
+    filtered_close = dict.fromkeys(DIRECTIONS, False)
+    for sample in samples:
+        range_filter.update(sample)
+        for name in DIRECTIONS:
+            value = getattr(sample, name)
+            close = value is not None and value < enter
+            counts[name][0] += close and not raw_close[name]
+            raw_close[name] = close
+            close = range_filter.is_close(name)
+            counts[name][1] += close and not filtered_close[name]
+            filtered_close[name] = close
+    return {name: (raw, filtered) for name, (raw, filtered) in counts.items()}
+
+
+def report_replay(samples: Iterable[RangeSample], enter: float, **filter_args) -> int:
+    """Print the maneuvers a filter would have prevented and return how many."""
+    range_filter = RangeFilter(enter, **filter_args)
+    counts = count_maneuvers(samples, range_filter, enter)
+    print(f"{'direction':>9} {'raw':>5} {'filtered':>8} {'prevented':>9}")
+    for name, (raw, filtered) in counts.items():
+        print(f"{name:>9} {raw:5d} {filtered:8d} {raw - filtered:9d}")
+    prevented = sum(raw - filtered for raw, filtered in counts.values())
+    print(f"{prevented} maneuvers prevented, {range_filter.outliers} readings rejected as outliers")
+    return prevented
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        print(__doc__)
+        sys.exit(1)
+    min_distance = float(sys.argv[2]) if len(sys.argv) == 3 else 0.2
+    for kalman in (False, True):
+        print(f"\nMedian, outlier gate and hysteresis{' with Kalman filter' if kalman else ''}:")
+        report_replay(samples_from_telemetry(sys.argv[1]), min_distance, kalman=kalman)
@@ -0,0 +1,114 @@
+"""
+Deduplicated velocity setpoints.
+
+The avoidance loops call start_linear_motion() for every range sample, so
+a drone hovering or cruising at a constant velocity sends the same
+setpoint ten times a second. cflib's MotionCommander already repeats the
+last setpoint from its own thread, so each of those calls is an extra
+radio packet that carries no information.
+
+SetpointSender stands in for the MotionCommander in the loops. A setpoint
+that differs from the last one sent goes out immediately. An unchanged one
+is only sent again once KEEP_ALIVE seconds have passed, well inside the
+firmware's 500 ms commander watchdog, so the drone never falls back to
+its failsafe even with a commander that does not repeat setpoints itself.
+stop() is always sent. Takeoff, landing and the other motions in
+PASSTHROUGH are forwarded to the wrapped MotionCommander and make the next
+setpoint go out regardless; anything else is read from it unchanged.
+
+Example:
+    setpoints = SetpointSender(motion_commander)
+    fly_push_away(scf, setpoints)
+    setpoints.report()
+"""
+
+import time
+from typing import Optional, Tuple
+
+KEEP_ALIVE = 0.25           # Seconds after which an unchanged setpoint is sent again
+TOLERANCE = 0.001           # Velocity change in m/s (deg/s for yaw) that counts as a new setpoint
+
+Setpoint = Tuple[float, float, float, float]
+
+# MotionCommander calls that change the velocity without a linear setpoint
+PASSTHROUGH = ('take_off', 'land', 'left', 'right', 'forward', 'back', 'up', 'down',
+               'turn_left', 'turn_right', 'circle_left', 'circle_right', 'move_distance',
+               'start_left', 'start_right', 'start_forward', 'start_back', 'start_up', 'start_down',
+               'start_turn_left', 'start_turn_right', 'start_circle_left', 'start_circle_right')
+
+
+class SetpointSender:
+    """
+    MotionCommander wrapper that drops repeated velocity setpoints.
+
+    Args:
+        motion_commander (MotionCommander): commander of the flying drone.
+        keep_alive (float): seconds after which an unchanged setpoint is resent.
+        tolerance (float): largest per-axis difference still treated as unchanged.
+    """
+
+    def __init__(self, motion_commander, keep_alive: float = KEEP_ALIVE, tolerance: float = TOLERANCE):
+        self.mc = motion_commander
+        self.keep_alive = keep_alive
+        self.tolerance = tolerance
+        self.sent = 0
+        self.keep_alives = 0            # Unchanged setpoints sent because keep_alive had passed
+        self.suppressed = 0
+        self._last: Optional[Setpoint] = None
+        self._last_sent = 0.0
+
+    def start_linear_motion(self, velocity_x_m: float, velocity_y_m: float, velocity_z_m: float,
+                            rate_yaw: float = 0.0) -> bool:
+        """Send the setpoint unless it repeats the last one. Returns whether it was sent."""
+        setpoint = (velocity_x_m, velocity_y_m, velocity_z_m, rate_yaw)
+        now = time.time()
+        last = self._last
+        if last is not None and all(abs(a - b) <= self.tolerance for a, b in zip(setpoint, last)):
+            if now - self._last_sent < self.keep_alive:
+                self.suppressed += 1
+                return False
+            self.keep_alives += 1
+        self.mc.start_linear_motion(*setpoint)
+        self.sent += 1
+        self._last = setpoint
+        self._last_sent = now
+        return True
+
+    def stop(self) -> bool:
+        """Always sent: the drone must stop even if the last setpoint was already zero."""
+        self.mc.stop()
+        self.sent += 1
+        self._last = (0.0, 0.0, 0.0, 0.0)
+        self._last_sent = time.time()
+        return True
+
+    def _forget(self) -> None:
+        """The drone's velocity changed behind the sender's back, so the next setpoint is always sent."""
+        self._last = None
+
+    def __getattr__(self, name):
+        # Anything else (attributes, the Crazyflie, ...) is read from the MotionCommander
+        return getattr(self.mc, name)
+
+    @property
+    def requested(self) -> int:
+        return self.sent + self.suppressed
+
+    def report(self) -> None:
+        saved = self.suppressed / self.requested * 100 if self.requested else 0.0
+        print(f"Setpoints: {self.sent} sent ({self.keep_alives} keep-alives), "
+              f"{self.suppressed} suppressed of {self.requested} ({saved:.0f}% saved)")
+
+
+def _passthrough(name: str):
+    def motion(self, *args, **kwargs):
+        self._forget()
+        return getattr(self.mc, name)(*args, **kwargs)
+    motion.__name__, motion.__qualname__ = name, 'SetpointSender.' + name
+    motion.__doc__ = f'MotionCommander.{name}(), after which the next setpoint is always sent.'
+    return motion
+
+
+# Takeoff, landing, blocking moves and the other start_* motions go straight to the MotionCommander
+for _name in PASSTHROUGH:
+    setattr(SetpointSender, _name, _passthrough(_name))
@@ -0,0 +1,691 @@
+"""
+Simulated Crazyflie backend with a virtual clock.
+
+Provides drop-in stand-ins for SyncCrazyflie, Crazyflie, MotionCommander,
+Multiranger and LogConfig so the mission scripts can be flown without a
+radio. Time only exists on a VirtualClock: every time.sleep() in a patched
+module advances the simulation instead of waiting, so a mission that takes
+tens of seconds on hardware finishes in milliseconds.
+
+Example:
+    import proj2_wes_alejandro as mission
+
+    with simulated(mission) as scf:
+        mission.execute_waypoint_mission(scf)
+"""
+
+import heapq
+import itertools
+import math
+import random
+import sys
+import threading
+import time as _real_time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+SIM_DT = 0.01               # Physics step in seconds
+VELOCITY_TAU = 0.15         # Time constant of the velocity controller in seconds
+CONNECT_TIME = 0.5          # Simulated link setup time in seconds
+PARAM_DELAY = 0.05          # Delay before param update callbacks fire
+MAX_RANGE = 4.0             # Multiranger readings above this are reported as None
+VBAT_FULL = 4.2             # Battery voltage at takeoff
+VBAT_DRAIN = 0.002          # Volts lost per second of flight
+DRONE_RADIUS = 0.05         # Half the width of the airframe in meters
+
+# cflib MotionCommander defaults
+MC_VELOCITY = 0.2
+MC_RATE = 360.0 / 5
+
+# Helper modules that talk to the Crazyflie; simulated() patches the ones already imported
+HELPER_MODULES = ('range_events', 'state_estimate', 'telemetry_recorder', 'swarm_executor',
+                  'toc_cache', 'preflight', 'mission_runtime', 'setpoints', 'trajectory')
+
+# (x, y, radius) of a vertical cylinder in the world frame
+Obstacle = Tuple[float, float, float]
+
+
+class VirtualClock:
+    """
+    Simulation clock. Timers fire in timestamp order while sleep() advances
+    time, so callbacks run synchronously on the thread that sleeps.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+        self._timers = []
+        self._seq = itertools.count()
+
+    def call_later(self, delay: float, callback: Callable[[], None], period: Optional[float] = None):
+        """
+        Schedule a callback on the virtual timeline.
+
+        Args:
+            delay (float): seconds from now until the first call.
+            callback (Callable): function called with no arguments.
+            period (float or None): repeat interval, or None for a one-shot timer.
+
+        Returns:
+            list: handle that can be passed to cancel().
+        """
+        handle = [True]
+        heapq.heappush(self._timers, (self.now + delay, next(self._seq), callback, period, handle))
+        return handle
+
+    def cancel(self, handle) -> None:
+        handle[0] = False
+
+    def sleep(self, seconds: float) -> None:
+        """Advance the clock by seconds, firing every timer that comes due."""
+        target = self.now + max(0.0, seconds)
+        while self._timers and self._timers[0][0] <= target:
+            due, _, callback, period, handle = heapq.heappop(self._timers)
+            if not handle[0]:
+                continue
+            self.now = max(self.now, due)
+            if period is not None:
+                heapq.heappush(self._timers, (due + period, next(self._seq), callback, period, handle))
+            callback()
+        self.now = target
+
+
+_local = threading.local()
+_default_clock = VirtualClock()
+
+
+def current_clock() -> VirtualClock:
+    """Return the clock bound to the calling thread."""
+    return getattr(_local, 'clock', _default_clock)
+
+
+def bind_clock(clock: VirtualClock) -> None:
+    """Make clock the one used by sim_time on the calling thread."""
+    _local.clock = clock
+
+
+class SimTime:
+    """
+    Replacement for the time module. sleep() and the clocks read the virtual
+    clock of the calling thread, everything else falls through to time.
+    """
+
+    def sleep(self, seconds: float) -> None:
+        current_clock().sleep(seconds)
+
+    def time(self) -> float:
+        return current_clock().now
+
+    def monotonic(self) -> float:
+        return current_clock().now
+
+    def perf_counter(self) -> float:
+        return current_clock().now
+
+    def perf_counter_ns(self) -> int:
+        return int(current_clock().now * 1e9)
+
+    def __getattr__(self, name):
+        return getattr(_real_time, name)
+
+
+sim_time = SimTime()
+
+
+class World:
+    """
+    Static environment the simulated drones fly in.
+
+    Args:
+        obstacles (List[Obstacle]): vertical cylinders as (x, y, radius).
+        ceiling (float or None): height of an object above the flight area.
+        noise (float): standard deviation of range noise in meters.
+        outlier_rate (float): probability that a range sample is a spurious short reading.
+        seed (int or None): seed for the sensor noise generator.
+    """
+
+    def __init__(self, obstacles: Optional[List[Obstacle]] = None, ceiling: Optional[float] = None,
+                 noise: float = 0.0, outlier_rate: float = 0.0, seed: Optional[int] = None):
+        self.obstacles = list(obstacles or [])
+        self.ceiling = ceiling
+        self.noise = noise
+        self.outlier_rate = outlier_rate
+        self.rng = random.Random(seed)
+
+    def ray_distance(self, x: float, y: float, heading: float) -> Optional[float]:
+        """Distance from (x, y) along heading to the nearest obstacle, or None."""
+        dx, dy = math.cos(heading), math.sin(heading)
+        best = None
+        for ox, oy, radius in self.obstacles:
+            # Solve |p + t*d - o| = r for the smallest positive t
+            px, py = x - ox, y - oy
+            b = px * dx + py * dy
+            c = px * px + py * py - radius * radius
+            if c < 0:
+                return 0.0  # Inside the obstacle
+            disc = b * b - c
+            if disc < 0:
+                continue
+            t = -b - math.sqrt(disc)
+            if t < 0:
+                continue  # Obstacle is behind the sensor
+            if best is None or t < best:
+                best = t
+        return best
+
+    def sense(self, distance: Optional[float]) -> Optional[float]:
+        """Apply the sensor model to a true distance."""
+        if self.outlier_rate and self.rng.random() < self.outlier_rate:
+            return self.rng.uniform(0.02, 0.15)
+        if distance is None:
+            return None
+        if self.noise:
+            distance += self.rng.gauss(0.0, self.noise)
+        distance = max(0.0, distance)
+        return None if distance > MAX_RANGE else distance
+
+
+class SimDrone:
+    """Point-mass model of one Crazyflie tracking velocity setpoints."""
+
+    def __init__(self, world: World, x: float = 0.0, y: float = 0.0):
+        self.world = world
+        self.x, self.y, self.z = x, y, 0.0
+        self.yaw = 0.0                      # radians
+        self.vx = self.vy = self.vz = 0.0   # world frame
+        self.cmd = (0.0, 0.0, 0.0, 0.0)     # body vx, vy, vz, yaw rate (deg/s)
+        self.flying = False
+        self.armed = False
+        self.vbat = VBAT_FULL
+        self.collisions = 0
+        self.setpoints = 0
+        self._in_contact = False
+
+    def command(self, vx: float, vy: float, vz: float, yaw_rate: float = 0.0) -> None:
+        self.cmd = (vx, vy, vz, yaw_rate)
+        self.setpoints += 1
+
+    def step(self, dt: float) -> None:
+        bvx, bvy, bvz, yaw_rate = self.cmd
+        if not self.flying:
+            bvx = bvy = 0.0
+            bvz = min(bvz, 0.0)
+        cos_y, sin_y = math.cos(self.yaw), math.sin(self.yaw)
+        wvx = bvx * cos_y - bvy * sin_y
+        wvy = bvx * sin_y + bvy * cos_y
+        k = min(1.0, dt / VELOCITY_TAU)
+        self.vx += (wvx - self.vx) * k
+        self.vy += (wvy - self.vy) * k
+        self.vz += (bvz - self.vz) * k
+        self.x += self.vx * dt
+        self.y += self.vy * dt
+        self.z = max(0.0, self.z + self.vz * dt)
+        self.yaw += math.radians(yaw_rate) * dt
+        if self.flying:
+            self.vbat -= VBAT_DRAIN * dt
+            self._check_contact()
+
+    def _check_contact(self) -> None:
+        touching = any(math.hypot(self.x - ox, self.y - oy) < radius + DRONE_RADIUS
+                       for ox, oy, radius in self.world.obstacles)
+        if touching and not self._in_contact:
+            self.collisions += 1
+        self._in_contact = touching
+
+    def ranges(self) -> Dict[str, Optional[float]]:
+        """Multiranger distances in meters, None when nothing is in range."""
+        world = self.world
+        up = None if world.ceiling is None else max(0.0, world.ceiling - self.z)
+        return {
+            'front': world.sense(world.ray_distance(self.x, self.y, self.yaw)),
+            'back': world.sense(world.ray_distance(self.x, self.y, self.yaw + math.pi)),
+            'left': world.sense(world.ray_distance(self.x, self.y, self.yaw + math.pi / 2)),
+            'right': world.sense(world.ray_distance(self.x, self.y, self.yaw - math.pi / 2)),
+            'up': world.sense(up),
+            'down': self.z,
+        }
+
+    def log_values(self) -> Dict[str, float]:
+        """Current values of the log variables the scripts subscribe to."""
+        values = {
+            'stateEstimate.x': self.x, 'stateEstimate.y': self.y, 'stateEstimate.z': self.z,
+            'stateEstimate.vx': self.vx, 'stateEstimate.vy': self.vy, 'stateEstimate.vz': self.vz,
+            'stabilizer.yaw': math.degrees(self.yaw),
+            'pm.vbat': self.vbat,
+        }
+        for name, value in self.ranges().items():
+            key = 'range.zrange' if name == 'down' else 'range.' + name
+            values[key] = 8000 if value is None else int(value * 1000)
+        return values
+
+
+class _Caller:
+    """Minimal stand-in for cflib.utils.callbacks.Caller."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def add_callback(self, cb) -> None:
+        if cb not in self.callbacks:
+            self.callbacks.append(cb)
+
+    def remove_callback(self, cb) -> None:
+        self.callbacks.remove(cb)
+
+    def call(self, *args) -> None:
+        for cb in list(self.callbacks):
+            cb(*args)
+
+
+class _LogVariable:
+    def __init__(self, name: str, fetch_as: Optional[str]):
+        self.name = name
+        self.fetch_as = fetch_as
+
+
+class LogConfig:
+    """Simulated cflib LogConfig, sampled on the owning drone's clock."""
+
+    def __init__(self, name: str, period_in_ms: int):
+        self.name = name
+        self.period_in_ms = period_in_ms
+        self.variables = []
+        self.data_received_cb = _Caller()
+        self.cf = None
+        self.valid = False
+        self._timer = None
+
+    def add_variable(self, name: str, fetch_as: Optional[str] = None) -> None:
+        self.variables.append(_LogVariable(name, fetch_as))
+
+    def start(self) -> None:
+        if self.cf is None:
+            raise AttributeError('LogConfig must be added to a Crazyflie before it is started')
+        if self._timer is None:
+            # Log packets arrive at an arbitrary phase relative to the host's loops
+            period = self.period_in_ms / 1000.0
+            phase = self.cf.world.rng.uniform(0.0, period)
+            self._timer = self.cf.clock.call_later(phase, self._sample, period)
+
+    def stop(self) -> None:
+        if self._timer is not None:
+            self.cf.clock.cancel(self._timer)
+            self._timer = None
+
+    def delete(self) -> None:
+        self.stop()
+
+    def _sample(self) -> None:
+        values = self.cf.drone.log_values()
+        data = {var.name: values.get(var.name, 0) for var in self.variables}
+        timestamp = int(self.cf.clock.now * 1000)
+        self.data_received_cb.call(timestamp, data, self)
+
+
+class _SimLog:
+    def __init__(self, cf):
+        self._cf = cf
+        self.configs = []
+
+    def add_config(self, conf: LogConfig) -> None:
+        conf.cf = self._cf
+        conf.valid = True
+        self.configs.append(conf)
+
+
+class _SimParam:
+    def __init__(self, cf):
+        self._cf = cf
+        self.values = {'deck': {'bcFlow2': '1', 'bcMultiranger': '1'}}
+        self._callbacks = []
+
+    def add_update_callback(self, group: str, name: Optional[str] = None, cb=None) -> None:
+        self._callbacks.append((group, name, cb))
+        value = self.values.get(group, {}).get(name)
+        if value is not None:
+            self._cf.clock.call_later(PARAM_DELAY, lambda: self._notify(group, name, cb, value))
+
+    def remove_update_callback(self, group: str, name: Optional[str] = None, cb=None) -> None:
+        self._callbacks.remove((group, name, cb))
+
+    def _notify(self, group: str, name: Optional[str], cb, value) -> None:
+        if (group, name, cb) in self._callbacks:
+            cb(f'{group}.{name}', value)
+
+    def set_value(self, complete_name: str, value) -> None:
+        group, name = complete_name.split('.', 1)
+        self.values.setdefault(group, {})[name] = str(value)
+
+
+class _SimPlatform:
+    def __init__(self, cf):
+        self._cf = cf
+
+    def send_arming_request(self, do_arm: bool) -> None:
+        self._cf.drone.armed = do_arm
+
+
+class SimCrazyflie:
+    """
+    Simulated Crazyflie. Accepts the same constructor keywords as
+    cflib's Crazyflie so scripts can build it unchanged.
+    """
+
+    def __init__(self, link=None, ro_cache=None, rw_cache=None, world: Optional[World] = None,
+                 clock: Optional[VirtualClock] = None, start: Tuple[float, float] = (0.0, 0.0)):
+        self.clock = clock or VirtualClock()
+        self.world = world or World()
+        self.drone = SimDrone(self.world, *start)
+        self.param = _SimParam(self)
+        self.log = _SimLog(self)
+        self.platform = _SimPlatform(self)
+        self.link_uri = ''
+        self._physics = None
+
+    def open_link(self, link_uri: str) -> None:
+        self.link_uri = link_uri
+        self._physics = self.clock.call_later(SIM_DT, lambda: self.drone.step(SIM_DT), SIM_DT)
+        self.clock.sleep(CONNECT_TIME)
+
+    def close_link(self) -> None:
+        if self._physics is not None:
+            self.clock.cancel(self._physics)
+            self._physics = None
+        for conf in self.log.configs:
+            conf.stop()
+
+
+class SyncCrazyflie:
+    """Simulated SyncCrazyflie. Binds the drone's clock to the entering thread."""
+
+    def __init__(self, link_uri: str, cf: Optional[SimCrazyflie] = None):
+        self._link_uri = link_uri
+        self.cf = cf if cf is not None else SimCrazyflie()
+
+    def open_link(self) -> None:
+        bind_clock(self.cf.clock)
+        self.cf.open_link(self._link_uri)
+
+    def close_link(self) -> None:
+        self.cf.close_link()
+
+    def is_link_open(self) -> bool:
+        return self.cf._physics is not None
+
+    def __enter__(self):
+        self.open_link()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close_link()
+
+
+class MotionCommander:
+    """Simulated cflib MotionCommander with the same blocking/non-blocking API."""
+
+    def __init__(self, crazyflie, default_height: float = 0.3):
+        self._cf = crazyflie.cf if isinstance(crazyflie, SyncCrazyflie) else crazyflie
+        self.default_height = default_height
+        self._is_flying = False
+
+    @property
+    def _drone(self) -> SimDrone:
+        return self._cf.drone
+
+    def _sleep(self, seconds: float) -> None:
+        self._cf.clock.sleep(seconds)
+
+    # Takeoff and landing
+
+    def take_off(self, height: Optional[float] = None, velocity: float = MC_VELOCITY) -> None:
+        if self._is_flying:
+            raise Exception('Already flying')
+        height = self.default_height if height is None else height
+        self._is_flying = True
+        self._drone.flying = True
+        self.up(height, velocity)
+
+    def land(self, velocity: float = MC_VELOCITY) -> None:
+        if self._is_flying:
+            self.down(self._drone.z, velocity)
+            self._drone.flying = False
+            self._drone.z = 0.0
+            self._is_flying = False
+
+    def __enter__(self):
+        self.take_off()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.land()
+
+    # Blocking moves
+
+    def left(self, distance_m: float, velocity: float = MC_VELOCITY) -> None:
+        self.move_distance(0.0, distance_m, 0.0, velocity)
+
+    def right(self, distance_m: float, velocity: float = MC_VELOCITY) -> None:
+        self.move_distance(0.0, -distance_m, 0.0, velocity)
+
+    def forward(self, distance_m: float, velocity: float = MC_VELOCITY) -> None:
+        self.move_distance(distance_m, 0.0, 0.0, velocity)
+
+    def back(self, distance_m: float, velocity: float = MC_VELOCITY) -> None:
+        self.move_distance(-distance_m, 0.0, 0.0, velocity)
+
+    def up(self, distance_m: float, velocity: float = MC_VELOCITY) -> None:
+        self.move_distance(0.0, 0.0, distance_m, velocity)
+
+    def down(self, distance_m: float, velocity: float = MC_VELOCITY) -> None:
+        self.move_distance(0.0, 0.0, -distance_m, velocity)
+
+    def turn_left(self, angle_degrees: float, rate: float = MC_RATE) -> None:
+        self.start_turn_left(rate)
+        self._sleep(angle_degrees / rate)
+        self.stop()
+
+    def turn_right(self, angle_degrees: float, rate: float = MC_RATE) -> None:
+        self.start_turn_right(rate)
+        self._sleep(angle_degrees / rate)
+        self.stop()
+
+    def circle_left(self, radius_m: float, velocity: float = MC_VELOCITY, angle_degrees: float = 360.0) -> None:
+        distance = 2 * radius_m * math.pi * angle_degrees / 360.0
+        self.start_circle_left(radius_m, velocity)
+        self._sleep(distance / velocity)
+        self.stop()
+
+    def circle_right(self, radius_m: float, velocity: float = MC_VELOCITY, angle_degrees: float = 360.0) -> None:
+        distance = 2 * radius_m * math.pi * angle_degrees / 360.0
+        self.start_circle_right(radius_m, velocity)
+        self._sleep(distance / velocity)
+        self.stop()
+
+    def move_distance(self, distance_x_m: float, distance_y_m: float, distance_z_m: float,
+                      velocity: float = MC_VELOCITY) -> None:
+        distance = math.sqrt(distance_x_m ** 2 + distance_y_m ** 2 + distance_z_m ** 2)
+        if distance == 0:
+            return
+        duration = distance / velocity
+        self.start_linear_motion(distance_x_m / duration, distance_y_m / duration, distance_z_m / duration)
+        self._sleep(duration)
+        self.stop()
+
+    # Non-blocking moves
+
+    def start_left(self, velocity: float = MC_VELOCITY) -> None:
+        self.start_linear_motion(0.0, velocity, 0.0)
+
+    def start_right(self, velocity: float = MC_VELOCITY) -> None:
+        self.start_linear_motion(0.0, -velocity, 0.0)
+
+    def start_forward(self, velocity: float = MC_VELOCITY) -> None:
+        self.start_linear_motion(velocity, 0.0, 0.0)
+
+    def start_back(self, velocity: float = MC_VELOCITY) -> None:
+        self.start_linear_motion(-velocity, 0.0, 0.0)
+
+    def start_up(self, velocity: float = MC_VELOCITY) -> None:
+        self.start_linear_motion(0.0, 0.0, velocity)
+
+    def start_down(self, velocity: float = MC_VELOCITY) -> None:
+        self.start_linear_motion(0.0, 0.0, -velocity)
+
+    def start_turn_left(self, rate: float = MC_RATE) -> None:
+        self._drone.command(0.0, 0.0, 0.0, rate)
+
+    def start_turn_right(self, rate: float = MC_RATE) -> None:
+        self._drone.command(0.0, 0.0, 0.0, -rate)
+
+    def start_circle_left(self, radius_m: float, velocity: float = MC_VELOCITY) -> None:
+        circumference = 2 * radius_m * math.pi
+        self._drone.command(velocity, 0.0, 0.0, 360.0 * velocity / circumference)
+
+    def start_circle_right(self, radius_m: float, velocity: float = MC_VELOCITY) -> None:
+        circumference = 2 * radius_m * math.pi
+        self._drone.command(velocity, 0.0, 0.0, -360.0 * velocity / circumference)
+
+    def start_linear_motion(self, velocity_x_m: float, velocity_y_m: float, velocity_z_m: float,
+                            rate_yaw: float = 0.0) -> None:
+        if not self._is_flying:
+            raise Exception('Can not move on the ground. Take off first!')
+        self._drone.command(velocity_x_m, velocity_y_m, velocity_z_m, rate_yaw)
+
+    def stop(self) -> None:
+        self._drone.command(0.0, 0.0, 0.0, 0.0)
+
+
+class Multiranger:
+    """
+    Simulated cflib Multiranger. Like the real one, values only change when
+    a range log packet arrives every rate_ms.
+    """
+
+    def __init__(self, crazyflie, rate_ms: int = 100, zranger: bool = False):
+        self._cf = crazyflie.cf if isinstance(crazyflie, SyncCrazyflie) else crazyflie
+        self._log_config = LogConfig('multiranger', rate_ms)
+        for name in ('front', 'back', 'left', 'right', 'up'):
+            self._log_config.add_variable('range.' + name)
+        if zranger:
+            self._log_config.add_variable('range.zrange')
+        self._log_config.data_received_cb.add_callback(self._data_received)
+        self._values = {}
+
+    @staticmethod
+    def _convert_log_to_distance(data: int) -> Optional[float]:
+        if data >= 8000:
+            return None
+        return data / 1000.0
+
+    def _data_received(self, timestamp, data, logconf) -> None:
+        for key, value in data.items():
+            self._values[key.split('.', 1)[1]] = self._convert_log_to_distance(value)
+
+    def start(self) -> None:
+        self._cf.log.add_config(self._log_config)
+        self._log_config.start()
+
+    def stop(self) -> None:
+        self._log_config.delete()
+
+    @property
+    def front(self):
+        return self._values.get('front')
+
+    @property
+    def back(self):
+        return self._values.get('back')
+
+    @property
+    def left(self):
+        return self._values.get('left')
+
+    @property
+    def right(self):
+        return self._values.get('right')
+
+    @property
+    def up(self):
+        return self._values.get('up')
+
+    @property
+    def down(self):
+        return self._values.get('zrange')
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+@contextmanager
+def simulated(*modules, world: Optional[World] = None, uri: str = 'sim://0'):
+    """
+    Swap the cflib classes and the time module of the given modules, and of
+    the imported HELPER_MODULES, for simulated ones and yield a connected
+    SyncCrazyflie.
+
+    Args:
+        modules: imported mission modules to patch.
+        world (World or None): environment to fly in, empty when None.
+        uri (str): URI reported by the simulated link.
+
+    Yields:
+        SyncCrazyflie: an open simulated connection.
+    """
+    world = world or World()
+    previous_clock = getattr(_local, 'clock', None)
+
+    def make_crazyflie(link=None, ro_cache=None, rw_cache=None):
+        # Every drone keeps its own clock, so drones flown from separate threads run independently
+        return SimCrazyflie(world=world)
+
+    replacements = {
+        'time': sim_time,
+        'Crazyflie': make_crazyflie,
+        'SyncCrazyflie': SyncCrazyflie,
+        'MotionCommander': MotionCommander,
+        'Multiranger': Multiranger,
+        'LogConfig': LogConfig,
+    }
+    modules += tuple(sys.modules[name] for name in HELPER_MODULES if name in sys.modules)
+    saved = []
+    for module in modules:
+        for name, replacement in replacements.items():
+            if hasattr(module, name):
+                saved.append((module, name, getattr(module, name)))
+                setattr(module, name, replacement)
+    try:
+        with SyncCrazyflie(uri, cf=make_crazyflie()) as scf:
+            yield scf
+    finally:
+        for module, name, original in reversed(saved):
+            setattr(module, name, original)
+        if previous_clock is None:
+            del _local.clock
+        else:
+            _local.clock = previous_clock
+
+
+def run_simulated(mission: Callable, *modules, world: Optional[World] = None):
+    """
+    Run mission(scf) in the simulator and time it.
+
+    Returns:
+        Tuple[Any, float, float]: mission result, simulated seconds and wall-clock seconds.
+    """
+    wall_start = _real_time.perf_counter()
+    with simulated(*modules, world=world) as scf:
+        sim_start = scf.cf.clock.now
+        result = mission(scf)
+        sim_seconds = scf.cf.clock.now - sim_start
+    return result, sim_seconds, _real_time.perf_counter() - wall_start
+
+
+if __name__ == '__main__':
+    import proj2_wes_alejandro as mission
+
+    _, sim_seconds, wall_seconds = run_simulated(mission.execute_waypoint_mission, mission)
+    print(f"Simulated mission time: {sim_seconds:.2f}s")
+    print(f"Wall-clock time: {wall_seconds * 1000:.1f}ms ({sim_seconds / wall_seconds:.0f}x real time)")
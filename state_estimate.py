@@ -0,0 +1,151 @@
+"""
+Onboard state estimate streaming and arrival-based waypoint flight.
+
+StateEstimate subscribes to the stateEstimate log group and keeps the
+latest position and velocity. fly_to() uses it to steer towards a target
+and returns as soon as the drone is within a tolerance of it, instead of
+flying for a fixed time.
+"""
+
+import math
+import time
+from threading import Event
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from cflib.crazyflie.log import LogConfig
+
+import instrumentation
+
+STATE_PERIOD_MS = 20        # stateEstimate log period (50 Hz)
+ARRIVAL_TOLERANCE = 0.05    # Distance in meters at which a target counts as reached
+ARRIVAL_TIMEOUT = 4.0       # Seconds before giving up on a target
+ARRIVAL_GAIN = 2.0          # Proportional gain (1/s) used to slow down close to the target
+WAIT_SLICE = 0.02           # How often the waiting thread checks for arrival
+STATE_VARIABLES = ('x', 'y', 'z', 'vx', 'vy', 'vz')
+
+
+class State(NamedTuple):
+    """One stateEstimate sample. Positions in meters, velocities in m/s."""
+    timestamp: float
+    x: float
+    y: float
+    z: float
+    vx: float
+    vy: float
+    vz: float
+
+
+class StateEstimate:
+    """
+    Streams the onboard position/velocity estimate.
+
+    Callbacks are called as callback(state) on the cflib log thread.
+
+    Args:
+        scf (SyncCrazyflie): connected Crazyflie.
+        period_ms (int): log period in milliseconds.
+    """
+
+    def __init__(self, scf, period_ms: int = STATE_PERIOD_MS):
+        self._cf = scf.cf
+        self._log_config = LogConfig('stateEstimate', period_ms)
+        for name in STATE_VARIABLES:
+            self._log_config.add_variable('stateEstimate.' + name, 'float')
+        self._log_config.data_received_cb.add_callback(self._data_received)
+        self._callbacks: List[Callable[[State], None]] = []
+        self.latest: Optional[State] = None
+
+    def add_callback(self, callback: Callable[[State], None]) -> None:
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[State], None]) -> None:
+        self._callbacks.remove(callback)
+
+    @property
+    def position(self) -> Optional[Tuple[float, float, float]]:
+        state = self.latest
+        return None if state is None else (state.x, state.y, state.z)
+
+    def _data_received(self, timestamp, data, logconf) -> None:
+        profile = instrumentation.active
+        if profile:
+            start = profile.now()
+        state = State(time.perf_counter(), *(data['stateEstimate.' + name] for name in STATE_VARIABLES))
+        self.latest = state
+        if profile:
+            profile.stages['state_read'].lap(start)
+        for callback in self._callbacks:
+            callback(state)
+
+    def start(self) -> None:
+        self._cf.log.add_config(self._log_config)
+        self._log_config.start()
+
+    def stop(self) -> None:
+        self._log_config.delete()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def fly_to(motion_commander, estimate: StateEstimate, target: Tuple[float, float], velocity: float,
+           tolerance: float = ARRIVAL_TOLERANCE, timeout: float = ARRIVAL_TIMEOUT) -> bool:
+    """
+    Fly in a straight line to target at constant height.
+
+    A new velocity setpoint is sent for every state sample, slowing down
+    close to the target so it is not overshot. Assumes the drone has not
+    yawed since takeoff, so body and world axes line up.
+
+    Args:
+        motion_commander (MotionCommander): commander of the flying drone.
+        estimate (StateEstimate): started state estimate stream.
+        target (Tuple[float, float]): x, y position in meters.
+        velocity (float): cruise speed in m/s.
+        tolerance (float): distance in meters at which the target counts as reached.
+        timeout (float): seconds to try before giving up.
+
+    Returns:
+        bool: True if the target was reached, False on timeout.
+    """
+    arrived = Event()
+    target_x, target_y = target
+    profile = instrumentation.active
+
+    def steer(state: State) -> None:
+        if arrived.is_set():
+            return
+        if profile:
+            lap = profile.now()
+        dx, dy = target_x - state.x, target_y - state.y
+        distance = math.hypot(dx, dy)
+        if distance <= tolerance:
+            arrived.set()
+            vx = vy = 0.0
+        else:
+            speed = min(velocity, ARRIVAL_GAIN * distance)
+            vx, vy = dx / distance * speed, dy / distance * speed
+        if profile:
+            lap = profile.stages['decide'].lap(lap)
+        motion_commander.start_linear_motion(vx, vy, 0.0)
+        if profile:
+            profile.stages['setpoint'].lap(lap)
+
+    estimate.add_callback(steer)
+    start = time.time()
+    try:
+        while not arrived.is_set() and time.time() - start < timeout:
+            if profile:
+                lap = profile.now()
+            time.sleep(WAIT_SLICE)
+            if profile:
+                profile.stages['sleep'].lap(lap)
+    finally:
+        estimate.remove_callback(steer)
+        if not arrived.is_set():
+            motion_commander.start_linear_motion(0.0, 0.0, 0.0)
+    return arrived.is_set()
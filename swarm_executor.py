@@ -0,0 +1,144 @@
+"""
+Concurrent multi-drone mission executor.
+
+run_swarm() flies the same mission on several Crazyflies at once. Every
+drone gets its own thread, which opens the link, waits until the whole
+swarm is connected and then runs the mission, so connections are opened
+in parallel and the total time is close to that of the slowest drone.
+
+Example:
+    python swarm_executor.py radio://0/80/2M/E7E7E7E7E7 radio://0/80/2M/E7E7E7E7E8
+"""
+
+import logging
+import sys
+import threading
+import time
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+import cflib.crtp
+from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
+
+from toc_cache import make_crazyflie
+
+CONNECT_TIMEOUT = 10.0      # Seconds to wait for every drone to connect
+
+logger = logging.getLogger(__name__)
+
+
+class DroneResult(NamedTuple):
+    """Outcome of one drone's mission."""
+    uri: str
+    ok: bool
+    connect_time: float     # seconds to open the link
+    mission_time: float     # seconds spent in the mission
+    waypoints: int          # waypoints flown, as returned by the mission
+    error: Optional[str]
+
+    @property
+    def throughput(self) -> float:
+        """Waypoints flown per second of mission time."""
+        return self.waypoints / self.mission_time if self.mission_time > 0 else 0.0
+
+
+class SwarmReport(NamedTuple):
+    """Per-drone results and the aggregate numbers over the swarm."""
+    drones: List[DroneResult]
+
+    @property
+    def makespan(self) -> float:
+        """Time until the last drone finished, connection included."""
+        return max((d.connect_time + d.mission_time for d in self.drones), default=0.0)
+
+    @property
+    def serial_time(self) -> float:
+        """Time the same missions would take one after another."""
+        return sum(d.connect_time + d.mission_time for d in self.drones)
+
+    @property
+    def throughput(self) -> float:
+        """Waypoints flown per second across the swarm."""
+        total = sum(d.waypoints for d in self.drones)
+        return total / self.makespan if self.makespan > 0 else 0.0
+
+    def print_report(self) -> None:
+        for d in self.drones:
+            status = 'ok' if d.ok else f'FAILED ({d.error})'
+            print(f"{d.uri}: {status}, connect {d.connect_time:.2f}s, mission {d.mission_time:.2f}s, "
+                  f"{d.waypoints} waypoints, {d.throughput:.2f} waypoints/s")
+        speedup = self.serial_time / self.makespan if self.makespan > 0 else 0.0
+        print(f"Swarm: {len(self.drones)} drones in {self.makespan:.2f}s "
+              f"(serial {self.serial_time:.2f}s, {speedup:.1f}x), {self.throughput:.2f} waypoints/s")
+
+
+def run_swarm(uris: Sequence[str], mission: Callable, cache: Optional[str] = None,
+              connect_timeout: float = CONNECT_TIMEOUT) -> SwarmReport:
+    """
+    Fly mission on every URI concurrently.
+
+    Args:
+        uris (Sequence[str]): radio URIs, one per drone.
+        mission (Callable): called as mission(scf) on the drone's own thread.
+            It may return the number of waypoints it flew.
+        cache (str or None): TOC cache directory, the shared one when None.
+        connect_timeout (float): seconds to wait for the whole swarm to connect.
+
+    Returns:
+        SwarmReport: per-drone results. Drones that failed to connect are
+            reported as failed and the rest fly without them. Empty when
+            uris is.
+    """
+    if not uris:
+        return SwarmReport([])
+    results: List[Optional[DroneResult]] = [None] * len(uris)
+    connected = threading.Barrier(len(uris), timeout=connect_timeout)
+
+    def fly(index: int, uri: str) -> None:
+        start = time.time()
+        connect_time = mission_time = 0.0
+        waypoints = 0
+        try:
+            try:
+                scf = SyncCrazyflie(uri, cf=make_crazyflie(cache))
+                scf.open_link()
+            finally:
+                connect_time = time.time() - start
+                # Wait for the rest of the swarm even if this drone failed, so they are not held up
+                try:
+                    connected.wait()
+                except threading.BrokenBarrierError:
+                    logger.warning('%s: not every drone connected in time, flying anyway', uri)
+            begin = time.time()
+            try:
+                waypoints = mission(scf) or 0
+            finally:
+                mission_time = time.time() - begin
+                scf.close_link()
+            results[index] = DroneResult(uri, True, connect_time, mission_time, waypoints, None)
+        except Exception as e:
+            logger.exception('%s: mission failed', uri)
+            results[index] = DroneResult(uri, False, connect_time, mission_time, waypoints, str(e))
+
+    threads = [threading.Thread(target=fly, args=(i, uri), name=f'drone-{i}') for i, uri in enumerate(uris)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return SwarmReport(list(results))
+
+
+if __name__ == '__main__':
+    import proj1_part2_wes_alejandro as waypoints
+
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} URI [URI ...]")
+        sys.exit(1)
+
+    cflib.crtp.init_drivers()
+    histories = {uri: [] for uri in sys.argv[1:]}
+
+    def mission(scf):
+        return waypoints.execute_waypoint_mission(scf, history=histories[scf.cf.link_uri])
+
+    report = run_swarm(sys.argv[1:], mission)
+    report.print_report()
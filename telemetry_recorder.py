@@ -0,0 +1,247 @@
+"""
+Streaming telemetry recorder backed by a memory-mapped ring buffer.
+
+Every stateEstimate sample is written, together with the latest
+Multi-ranger distances and battery voltage, as one fixed-size record into
+a preallocated file. The file is memory-mapped, so an append is a single
+in-place write, the file never grows and a flight of any length uses the
+same amount of memory. Once the ring is full the oldest records are
+overwritten.
+
+File layout:
+    64 byte header: magic, version, record size, capacity, records written
+    capacity * RECORD_DTYPE.itemsize bytes of records
+
+Readers get NumPy views straight into the mapping, no copies:
+
+    with TelemetryRecorder('flight.telem', readonly=True) as telemetry:
+        for chunk in telemetry.records():
+            print(chunk['x'].max())
+"""
+
+import abc
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from cflib.crazyflie.log import LogConfig
+
+from state_estimate import State, StateEstimate
+
+MAGIC = b'HDTELEM1'
+VERSION = 1
+HEADER_SIZE = 64
+DEFAULT_CAPACITY = 1 << 20      # ~58 MB, about 5.8 hours at 50 Hz
+RANGE_PERIOD_MS = 100
+RANGE_DIRECTIONS = ('front', 'back', 'left', 'right', 'up')
+
+RECORD_DTYPE = np.dtype([
+    ('t', '<f8'),                                   # host time in seconds
+    ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),       # position in meters
+    ('vx', '<f4'), ('vy', '<f4'), ('vz', '<f4'),    # velocity in m/s
+    ('front', '<f4'), ('back', '<f4'), ('left', '<f4'), ('right', '<f4'), ('up', '<f4'),  # meters, NaN = out of range
+    ('vbat', '<f4'),                                # battery voltage
+])
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('record_size', '<u4'),
+    ('capacity', '<u8'),
+    ('count', '<u8'),
+    ('reserved', 'V32'),
+])
+
+
+class TelemetrySource(abc.ABC):
+    """
+    Feeds stateEstimate samples, with the latest ranges and battery voltage,
+    to self.append() from a connected Crazyflie. Shared by the recorders,
+    which implement append().
+    """
+
+    def __init__(self):
+        self._estimate: Optional[StateEstimate] = None
+        self._owns_estimate = False
+        self._range_config = None
+        self._ranges = [np.nan] * len(RANGE_DIRECTIONS)
+        self._vbat = np.nan
+
+    @abc.abstractmethod
+    def append(self, t: float, x: float, y: float, z: float, vx: float, vy: float, vz: float,
+               front: float, back: float, left: float, right: float, up: float, vbat: float) -> None:
+        """Store one record."""
+
+    def attach(self, scf, estimate: Optional[StateEstimate] = None, range_period_ms: int = RANGE_PERIOD_MS) -> None:
+        """
+        Start recording from a connected Crazyflie.
+
+        Args:
+            scf (SyncCrazyflie): connected Crazyflie.
+            estimate (StateEstimate or None): an already started stream to share,
+                a new one is started when None.
+            range_period_ms (int): log period of the range and battery values.
+        """
+        if estimate is None:
+            estimate = StateEstimate(scf)
+            estimate.start()
+            self._owns_estimate = True
+        self._estimate = estimate
+        estimate.add_callback(self._on_state)
+
+        self._range_config = LogConfig('telemetry', range_period_ms)
+        for name in RANGE_DIRECTIONS:
+            self._range_config.add_variable('range.' + name, 'uint16_t')
+        self._range_config.add_variable('pm.vbat', 'float')
+        self._range_config.data_received_cb.add_callback(self._on_ranges)
+        scf.cf.log.add_config(self._range_config)
+        self._range_config.start()
+
+    def detach(self) -> None:
+        if self._estimate is not None:
+            self._estimate.remove_callback(self._on_state)
+            if self._owns_estimate:
+                self._estimate.stop()
+            self._estimate = None
+        if self._range_config is not None:
+            self._range_config.delete()
+            self._range_config = None
+
+    def _on_state(self, state: State) -> None:
+        self.append(*state, *self._ranges, self._vbat)
+
+    def _on_ranges(self, timestamp, data, logconf) -> None:
+        for i, name in enumerate(RANGE_DIRECTIONS):
+            value = data['range.' + name]
+            self._ranges[i] = np.nan if value >= 8000 else value / 1000.0
+        self._vbat = data['pm.vbat']
+
+
+class TelemetryRecorder(TelemetrySource):
+    """
+    Fixed-record ring buffer in a memory-mapped file.
+
+    Args:
+        path (str): file to create (or open when readonly).
+        capacity (int): number of records the ring holds, ignored when readonly.
+        readonly (bool): open an existing recording for reading.
+    """
+
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY, readonly: bool = False):
+        super().__init__()
+        self.path = path
+        if readonly:
+            self._map = np.memmap(path, dtype=np.uint8, mode='r')
+            header = self._map[:HEADER_SIZE].view(HEADER_DTYPE)
+            if header['magic'][0] != MAGIC or header['record_size'][0] != RECORD_DTYPE.itemsize:
+                raise ValueError(f'{path} is not a telemetry recording')
+            capacity = int(header['capacity'][0])
+        else:
+            size = HEADER_SIZE + capacity * RECORD_DTYPE.itemsize
+            with open(path, 'wb') as f:
+                f.truncate(size)
+            self._map = np.memmap(path, dtype=np.uint8, mode='r+', shape=size)
+            header = self._map[:HEADER_SIZE].view(HEADER_DTYPE)
+            header['magic'] = MAGIC
+            header['version'] = VERSION
+            header['record_size'] = RECORD_DTYPE.itemsize
+            header['capacity'] = capacity
+            header['count'] = 0
+        self.capacity = capacity
+        self._header = header
+        self._count = header['count']  # One-element view, so updates land in the file
+        self._records = self._map[HEADER_SIZE:HEADER_SIZE + capacity * RECORD_DTYPE.itemsize].view(RECORD_DTYPE)
+
+    # Writing
+
+    def append(self, t: float, x: float, y: float, z: float, vx: float, vy: float, vz: float,
+               front: float, back: float, left: float, right: float, up: float, vbat: float) -> None:
+        """Write one record. Constant time; overwrites the oldest record when full."""
+        n = int(self._count[0])
+        self._records[n % self.capacity] = (t, x, y, z, vx, vy, vz, front, back, left, right, up, vbat)
+        self._count[0] = n + 1
+
+    # Reading
+
+    def __len__(self) -> int:
+        return min(int(self._count[0]), self.capacity)
+
+    @property
+    def written(self) -> int:
+        """Records appended since the file was created, including overwritten ones."""
+        return int(self._count[0])
+
+    @property
+    def dropped(self) -> int:
+        """Records overwritten because the ring was full."""
+        return max(0, int(self._count[0]) - self.capacity)
+
+    def records(self) -> List[np.ndarray]:
+        """
+        All stored records, oldest first.
+
+        Returns:
+            List[np.ndarray]: one view, or two once the ring has wrapped. The
+                views alias the file, so copy them if the recorder keeps writing.
+        """
+        n = int(self._count[0])
+        if n <= self.capacity:
+            return [self._records[:n]]
+        head = n % self.capacity
+        return [self._records[head:], self._records[:head]]
+
+    def latest(self, count: int) -> List[np.ndarray]:
+        """The newest count records as views, oldest first (two views across the wrap)."""
+        count = min(count, len(self))
+        n = int(self._count[0])
+        end = n % self.capacity or (self.capacity if n else 0)
+        if count <= end:
+            return [self._records[end - count:end]]
+        return [self._records[self.capacity - (count - end):], self._records[:end]]
+
+    def between(self, start: int, stop: int) -> List[np.ndarray]:
+        """
+        Records start to stop, counted like written, as views, oldest first.
+
+        Unlike latest() this does not read the write counter, so a reader can
+        take one written snapshot and slice up to it while the recorder keeps
+        appending. Records already overwritten are left out.
+
+        Args:
+            start (int): index of the first record.
+            stop (int): index after the last record, at most written.
+        """
+        start = max(start, stop - self.capacity, 0)
+        if start >= stop:
+            return [self._records[:0]]
+        lo = start % self.capacity
+        hi = lo + stop - start
+        if hi <= self.capacity:
+            return [self._records[lo:hi]]
+        return [self._records[lo:], self._records[:hi - self.capacity]]
+
+    def snapshot(self) -> np.ndarray:
+        """Contiguous copy of all stored records, oldest first."""
+        return np.concatenate(self.records())
+
+    def flush(self) -> None:
+        if self._map.mode != 'r':
+            self._map.flush()
+
+    def close(self) -> None:
+        self.detach()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def default_path(name: str = 'flight', extension: str = '.telem') -> str:
+    """Recording file in the telemetry directory next to the scripts."""
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'telemetry')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name + extension)
@@ -0,0 +1,56 @@
+import math
+
+from collision_predictor import DECELERATION, MAX_RATE_GAP, REACTION_TIME, CollisionPredictor
+from range_events import RangeSample
+
+MARGIN = 0.2
+
+
+def ahead(t, front, back=None):
+    return RangeSample(t, front, back, None, None, None)
+
+
+def test_static_obstacle_is_predicted_from_the_first_reading():
+    predictor = CollisionPredictor(MARGIN)
+    ttc = predictor.update(ahead(0.0, 1.2, 0.5), (0.5, 0.0, 0.0))
+    assert math.isclose(ttc[0], (1.2 - MARGIN) / 0.5)
+    # Flying away from what is behind, and nothing on the sides
+    assert math.isinf(ttc[1]) and math.isinf(ttc[2])
+    assert not predictor.threat('front') and not predictor.threat('back')
+
+    # Closer than the stopping time allows at this speed
+    predictor.update(ahead(0.1, 0.5), (0.5, 0.0, 0.0))
+    assert predictor.time_to_collision[0] <= REACTION_TIME + 0.5 / (2 * DECELERATION)
+    assert predictor.threat('front')
+
+
+def test_moving_obstacle_is_predicted_from_the_range_rate():
+    predictor = CollisionPredictor(MARGIN)
+    predictor.update(ahead(0.0, 1.0), (0.0, 0.0, 0.0))
+    assert math.isinf(predictor.time_to_collision[0])
+    predictor.update(ahead(0.1, 0.9), (0.0, 0.0, 0.0))
+    # Smoothed rate after one step is half the measured -1 m/s
+    assert math.isclose(predictor.rates[0], -0.5)
+    assert math.isclose(predictor.time_to_collision[0], (0.9 - MARGIN) / 0.5)
+
+    # A long gap between readings starts the rate over
+    predictor.update(ahead(0.1 + 2 * MAX_RATE_GAP, 0.5), (0.0, 0.0, 0.0))
+    assert predictor.rates[0] == 0.0
+    assert math.isinf(predictor.time_to_collision[0])
+
+
+def test_safe_speed_stops_exactly_at_the_margin():
+    predictor = CollisionPredictor(MARGIN)
+    predictor.update(ahead(0.0, 1.0, MARGIN / 2), (0.0, 0.0, 0.0))
+    v = predictor.speed_limit('front')
+    assert math.isclose(v * REACTION_TIME + v * v / (2 * DECELERATION), 1.0 - MARGIN)
+    # Already inside the margin: no speed towards it is safe
+    assert predictor.speed_limit('back') == 0.0
+    # Out of range
+    assert math.isinf(predictor.speed_limit('left'))
+
+    # Cruising at the safe speed is right at the threat boundary, a bit faster is a threat
+    predictor.update(ahead(0.1, 1.0), (v * 1.01, 0.0, 0.0))
+    assert predictor.threat('front')
+    predictor.update(ahead(0.2, 1.0), (v * 0.99, 0.0, 0.0))
+    assert not predictor.threat('front')
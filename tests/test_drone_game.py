@@ -0,0 +1,74 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import mission_runtime
+import proj2_wes_alejandro
+from mission_runtime import MissionRuntime
+from sim_drone import run_simulated
+
+SAFETY_NET = 10.0           # Real seconds the first maneuver waits for the player at most
+
+
+def play(monkeypatch, answers, drone_moves):
+    """Play drone_game's rounds in the simulator, holding the first maneuver until every answer is in."""
+    remaining, drone_moves = list(answers), iter(drone_moves)
+    all_answered = threading.Event()
+    flown = []
+    held = []
+
+    def answer(prompt):
+        choice = remaining.pop(0)
+        if not remaining:
+            all_answered.set()
+        return choice
+
+    monkeypatch.setattr(proj2_wes_alejandro, 'input', answer, raising=False)
+    monkeypatch.setattr(proj2_wes_alejandro, 'random', SimpleNamespace(choice=lambda seq: next(drone_moves)))
+
+    async def mission(rt):
+        def recorded(name):
+            maneuver = getattr(rt, name)
+
+            async def run(*args, **kwargs):
+                if not flown:
+                    # The player keeps answering while the drone flies the first round
+                    deadline = time.perf_counter() + SAFETY_NET
+                    while not all_answered.is_set() and time.perf_counter() < deadline:
+                        await rt.next_tick()
+                    held.append(all_answered.is_set())
+                flown.append(name)
+                await maneuver(*args, **kwargs)
+            return run
+
+        for name in ('up', 'down', 'circle_left', 'circle_right'):
+            setattr(rt, name, recorded(name))
+        await proj2_wes_alejandro.game_rounds(rt)
+
+    def fly(scf):
+        with mission_runtime.MotionCommander(scf, default_height=0.3) as mc:
+            return MissionRuntime(mc).run(mission)
+
+    reason, _, _ = run_simulated(fly, proj2_wes_alejandro, mission_runtime)
+    all_answered.set()
+    return reason, flown, held
+
+
+def test_prompts_run_ahead_of_the_queued_maneuvers(monkeypatch, capsys):
+    # Win, tie, loss, win: the tie flies nothing
+    reason, flown, held = play(monkeypatch, ['R', 'r', 'r', 'r'], ['s', 'r', 'p', 's'])
+    assert reason is None
+    # Every round was answered before the first maneuver started
+    assert held == [True]
+    assert flown == ['up', 'circle_left', 'down', 'circle_right', 'up', 'circle_left']
+    out = capsys.readouterr().out
+    assert 'This round is a tie!' in out
+    assert out.index('Score: Wins = 2, Losses = 1') < out.index('Game over!')
+    assert 'Congratulations! You won the game.' in out
+
+
+def test_game_ends_after_two_losses(monkeypatch, capsys):
+    reason, flown, held = play(monkeypatch, ['p', 'p'], ['s', 's'])
+    assert reason is None and held == [True]
+    assert flown == ['down', 'circle_right', 'down', 'circle_right']
+    assert 'Better luck next time! The drone won.' in capsys.readouterr().out
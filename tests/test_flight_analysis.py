@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+
+import flight_analysis
+from flight_analysis import AIRBORNE_HEIGHT, CHANNELS, FlightAnalyzer, analyze_flight
+from sim_drone import MotionCommander, run_simulated
+from telemetry_recorder import TelemetryRecorder
+
+
+def synthetic_flight(count=3000, seed=1):
+    """Take off, wander with pauses, pass obstacles and land, sampled at 50 Hz."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(count) * 0.02
+    vx = np.where((t % 4.0) < 1.0, 0.0, rng.normal(0.1, 0.02, count))
+    vy = np.where((t % 4.0) < 1.0, 0.0, rng.normal(0.0, 0.05, count))
+    z = np.clip(np.minimum(t, t[-1] - t) * 0.5, 0.0, 0.3)
+    ranges = rng.uniform(0.1, 2.0, (4, count))
+    ranges[:, rng.random(count) < 0.1] = np.nan
+    return {
+        't': t, 'x': np.cumsum(vx) * 0.02 - 0.4, 'y': np.cumsum(vy) * 0.02, 'z': z,
+        'vx': vx, 'vy': vy, 'vz': np.gradient(z, t),
+        'front': ranges[0], 'back': ranges[1], 'left': ranges[2], 'right': ranges[3],
+        'vbat': np.where(rng.random(count) < 0.05, np.nan, np.linspace(4.2, 3.8, count)),
+    }
+
+
+def analyze(flight, cuts):
+    analyzer = FlightAnalyzer()
+    edges = [0] + list(cuts) + [len(flight['t'])]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        analyzer.update({name: values[lo:hi] for name, values in flight.items()})
+    return analyzer.result()
+
+
+def test_chunked_analysis_matches_a_single_pass():
+    flight = synthetic_flight()
+    assert set(flight) == set(CHANNELS)
+    whole = analyze(flight, [])
+    assert whole.path_length > 0 and whole.hover_time > 0 and whole.avoidance_events > 0
+    assert 0 < whole.coverage < 1 and whole.battery_drop > 0
+
+    rng = np.random.default_rng(2)
+    for cuts in ([1500], [1, 2, 3, 2999], list(range(0, 3000, 7))[1:], sorted(rng.choice(3000, 40, replace=False))):
+        chunked = analyze(flight, cuts)
+        assert chunked.rows == whole.rows
+        assert chunked.avoidance_events == whole.avoidance_events
+        assert chunked.coverage == whole.coverage
+        for name in ('duration', 'path_length', 'hover_time', 'battery_drop'):
+            assert math.isclose(getattr(chunked, name), getattr(whole, name), rel_tol=1e-9, abs_tol=1e-12)
+
+
+def test_empty_chunks_change_nothing():
+    flight = synthetic_flight(500)
+    analyzer = FlightAnalyzer()
+    empty = {name: values[:0] for name, values in flight.items()}
+    analyzer.update(empty)
+    analyzer.update(flight)
+    analyzer.update(empty)
+    assert analyzer.result() == analyze(flight, [])
+    assert FlightAnalyzer().result().rows == 0
+
+
+def test_streams_a_simulated_recording(tmp_path, monkeypatch):
+    path = str(tmp_path / 'flight.telem')
+
+    def fly(scf):
+        with TelemetryRecorder(path) as recorder:
+            recorder.attach(scf)
+            with MotionCommander(scf, default_height=0.3) as mc:
+                mc.forward(0.4)
+                mc.left(0.2)
+
+    run_simulated(fly)
+    whole = analyze_flight(path)
+    monkeypatch.setattr(flight_analysis, 'CHUNK_ROWS', 17)
+    assert analyze_flight(path) == whole
+    # 0.6m across plus the part of the climb and the landing above AIRBORNE_HEIGHT,
+    # less what falls between samples at the ends
+    assert 0.6 + (0.3 - AIRBORNE_HEIGHT) < whole.path_length <= 0.6 + 2 * 0.3
+    assert whole.avoidance_events == 0
@@ -0,0 +1,117 @@
+import csv
+import math
+
+import numpy as np
+import pytest
+
+from flight_log import CHANNELS, FlightLog, FlightLogWriter, ROW_DTYPE, convert_telemetry, export_csv
+from sim_drone import MotionCommander, run_simulated
+from telemetry_recorder import TelemetryRecorder
+
+
+def synthetic_rows(count, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = np.zeros(count, ROW_DTYPE)
+    rows['t'] = np.arange(count) * 0.02
+    rows['x'] = np.cumsum(rng.normal(0, 0.001, count))
+    rows['z'] = 0.3
+    rows['vx'] = rng.normal(0, 0.05, count)
+    for name in ('front', 'back', 'left', 'right', 'up'):
+        rows[name] = rng.uniform(0.1, 3.0, count)
+    rows['front'][::7] = np.nan
+    rows['vbat'] = np.linspace(4.2, 3.9, count)
+    rows['sp_vx'] = np.repeat([0.0, 0.2, -0.1], count // 3 + 1)[:count]
+    return rows
+
+
+def test_round_trip_within_quantization(tmp_path):
+    path = str(tmp_path / 'round.hdlog')
+    rows = synthetic_rows(10000)
+    with FlightLogWriter(path, chunk_rows=1024) as log:
+        log.append_records(rows)
+
+    with FlightLog(path) as log:
+        assert len(log) == len(rows)
+        assert len(log.chunks) == 10
+        assert log.duration == pytest.approx(rows['t'][-1])
+        data = log.read()
+    for name, scale in CHANNELS.items():
+        expected = rows[name].astype(np.float64)
+        nan = np.isnan(expected)
+        assert np.array_equal(np.isnan(data[name]), nan), name
+        assert np.abs(data[name][~nan] - expected[~nan]).max() <= 0.5 / scale + 1e-6, name
+
+
+def test_window_and_chunks_match_a_full_read(tmp_path):
+    path = str(tmp_path / 'window.hdlog')
+    with FlightLogWriter(path, chunk_rows=500) as log:
+        log.append_records(synthetic_rows(3000))
+
+    with FlightLog(path) as log:
+        full = log.read(['t', 'x'])
+        window = log.read(['t', 'x'], start=12.345, end=30.0)
+        chunks = list(log.iter_chunks(['x']))
+        with pytest.raises(KeyError):
+            log.read(['nope'])
+    inside = (full['t'] >= 12.345) & (full['t'] <= 30.0)
+    assert np.array_equal(window['x'], full['x'][inside])
+    assert [len(chunk['x']) for chunk in chunks] == [500] * 6
+    assert np.array_equal(np.concatenate([chunk['x'] for chunk in chunks]), full['x'])
+
+
+def test_commander_logs_setpoints(tmp_path):
+    class Commander:
+        def start_linear_motion(self, *setpoint):
+            pass
+
+    path = str(tmp_path / 'setpoints.hdlog')
+    with FlightLogWriter(path) as log:
+        commander = log.commander(Commander())
+        log.append(0.0, *[0.0] * 12)
+        commander.start_linear_motion(0.2, -0.1, 0.0, 30.0)
+        log.append(0.1, *[0.0] * 12)
+        commander.stop()
+        log.append(0.2, *[0.0] * 12)
+    with FlightLog(path) as log:
+        data = log.read(['sp_vx', 'sp_vy', 'sp_yaw'])
+    assert data['sp_vx'].tolist() == [0.0, 0.2, 0.0]
+    assert data['sp_vy'].tolist() == [0.0, -0.1, 0.0]
+    assert data['sp_yaw'].tolist() == [0.0, 30.0, 0.0]
+
+
+def test_unclosed_log_is_rejected(tmp_path):
+    path = str(tmp_path / 'open.hdlog')
+    log = FlightLogWriter(path)
+    log.append_records(synthetic_rows(10))
+    log._file.flush()
+    with pytest.raises(ValueError):
+        FlightLog(path)
+    log.close()
+
+
+def test_converts_a_simulated_recording(tmp_path):
+    telem = str(tmp_path / 'flight.telem')
+
+    def fly(scf):
+        with TelemetryRecorder(telem, capacity=4096) as recorder:
+            recorder.attach(scf)
+            with MotionCommander(scf, default_height=0.3) as mc:
+                mc.left(0.3)
+
+    run_simulated(fly)
+    hdlog = convert_telemetry(telem)
+    with TelemetryRecorder(telem, readonly=True) as telemetry:
+        records = telemetry.snapshot()
+    with FlightLog(hdlog) as log:
+        data = log.read()
+    assert len(data['t']) == len(records)
+    assert np.abs(data['y'] - records['y']).max() <= 0.0005 + 1e-6
+    assert np.array_equal(np.isnan(data['front']), np.isnan(records['front']))
+
+    csv_path = str(tmp_path / 'flight.csv')
+    export_csv(hdlog, csv_path)
+    with open(csv_path) as f:
+        lines = list(csv.reader(f))
+    assert lines[0] == list(CHANNELS)
+    assert len(lines) == len(records) + 1
+    assert math.isclose(float(lines[-1][0]), data['t'][-1], abs_tol=1e-6)
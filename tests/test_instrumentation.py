@@ -0,0 +1,66 @@
+import random
+
+import instrumentation
+from instrumentation import BUCKETS, MAX_EXPONENT, SUB_BUCKETS, Histogram
+from sim_drone import MotionCommander, run_simulated
+from state_estimate import StateEstimate, fly_to
+
+
+def test_small_values_are_exact():
+    histogram = Histogram('small')
+    for value in range(1, 2 * SUB_BUCKETS):
+        histogram.record(value)
+    assert histogram.percentile(50) == SUB_BUCKETS
+    assert histogram.percentile(100) == histogram.max == 2 * SUB_BUCKETS - 1
+    assert histogram.percentile(0) == 1
+
+
+def test_percentiles_within_bucket_error():
+    rng = random.Random(1)
+    values = [int(rng.lognormvariate(11, 1.5)) for _ in range(20000)]
+    histogram = Histogram('latency')
+    for value in values:
+        histogram.record(value)
+    assert histogram.count == len(values) and histogram.max == max(values)
+    ordered = sorted(values)
+    for p in (1, 50, 90, 99, 99.9):
+        # Nearest rank, as the histogram counts it
+        exact = ordered[max(1, int(p / 100 * len(values) + 0.5)) - 1]
+        # The bucket's upper bound: never below the true value, at most one bucket width above it
+        assert exact <= histogram.percentile(p) <= exact * (1 + 1 / SUB_BUCKETS)
+
+
+def test_buckets_cover_every_value_once():
+    for value in [0, 1, 31, 32, 33, 1000, 123456789, 2 ** 30 + 7]:
+        index = Histogram.bucket(value)
+        assert value <= Histogram.bucket_limit(index)
+        assert index == 0 or Histogram.bucket_limit(index - 1) < value
+    # Durations past the last bucket are clamped into it, the max is still exact
+    histogram = Histogram('long')
+    histogram.record(2 ** (MAX_EXPONENT + 3))
+    assert histogram.counts[BUCKETS - 1] == 1
+    assert histogram.percentile(50) == 2 ** MAX_EXPONENT - 1
+    assert histogram.max == 2 ** (MAX_EXPONENT + 3)
+
+
+def test_empty_and_reset():
+    histogram = Histogram('empty')
+    assert histogram.percentile(99) == 0
+    histogram.record(500)
+    histogram.reset()
+    assert histogram.count == 0 and histogram.max == 0 and not any(histogram.counts)
+
+
+def test_enabled_profile_times_the_loop_stages():
+    def fly(scf):
+        with MotionCommander(scf, default_height=0.3) as mc, StateEstimate(scf) as estimate:
+            fly_to(mc, estimate, (0.3, 0.0), velocity=0.3)
+
+    profile = instrumentation.enable()
+    try:
+        run_simulated(fly)
+    finally:
+        instrumentation.disable()
+    for stage in ('state_read', 'decide', 'setpoint', 'sleep'):
+        assert profile.stage(stage).count > 0
+    assert instrumentation.active is None
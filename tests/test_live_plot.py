@@ -0,0 +1,74 @@
+import threading
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from live_plot import LivePathPlot, lttb
+from telemetry_recorder import TelemetryRecorder
+
+
+def append(recorder, i):
+    recorder.append(float(i), i * 0.001, 0.0, 0.3, 0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 1.0, 1.0, 4.0)
+
+
+def test_lttb_keeps_endpoints_and_count():
+    t = np.linspace(0.0, 10.0, 5000)
+    z = np.sin(t) + 0.01 * np.cos(37 * t)
+    kept = lttb(t, z, 300)
+    assert len(kept) == 300
+    assert kept[0] == 0 and kept[-1] == len(t) - 1
+    assert (np.diff(kept) > 0).all()
+    # The extremes survive the decimation
+    assert abs(z[kept].max() - z.max()) < 0.02
+    # Too few points to decimate come back unchanged
+    assert lttb(t[:10], z[:10], 300).tolist() == list(range(10))
+
+
+def test_frames_see_every_record_once(tmp_path):
+    with TelemetryRecorder(str(tmp_path / 'live.telem'), capacity=64) as recorder:
+        plot = LivePathPlot(recorder, 0.5)
+        seen = []
+        i = 0
+        for frame in range(20):
+            for _ in range(frame % 7 * 5):
+                append(recorder, i)
+                i += 1
+            written = recorder.written
+            # The log thread keeps writing between the snapshot and the copy
+            append(recorder, i)
+            i += 1
+            new = plot._new_records(written)
+            if new is not None:
+                seen.extend(new['t'].tolist())
+        assert seen == [float(n) for n in range(len(seen))]
+        assert len(seen) == i - 1
+        plt.close(plot.fig)
+
+
+def test_update_tracks_the_path_and_times_frames(tmp_path):
+    with TelemetryRecorder(str(tmp_path / 'live.telem'), capacity=64) as recorder:
+        plot = LivePathPlot(recorder, 0.5, max_points=20)
+        for frame in range(10):
+            for _ in range(30):
+                append(recorder, recorder.written)
+            plot.update()
+        x, _ = plot.path_line.get_data()
+        assert len(x) <= 2 * plot.max_points
+        assert abs(x[-1] - (recorder.written - 1) * 0.001) < 1e-6
+        assert plot.frame_times.count == 10
+        plt.close(plot.fig)
+
+
+def test_window_is_closed_on_the_gui_thread_only(tmp_path):
+    with TelemetryRecorder(str(tmp_path / 'live.telem'), capacity=64) as recorder:
+        plot = LivePathPlot(recorder, 0.5)
+        plot.start()
+        worker = threading.Thread(target=plot.done.set)
+        worker.start()
+        worker.join()
+        assert plt.fignum_exists(plot.fig.number)
+        plot.close_if_done()
+        assert not plt.fignum_exists(plot.fig.number)
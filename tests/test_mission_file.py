@@ -0,0 +1,64 @@
+import pytest
+
+from mission_file import GeofenceError, MissionBuilder, fly_mission, load_mission
+from sim_drone import World, run_simulated
+
+
+def square(box_limit=0.5):
+    b = MissionBuilder('square', box_limit, 0.3)
+    b.hover(0.5)
+    b.forward(0.3)
+    b.turn_left(90)
+    b.forward(0.3)
+    b.goto(0.0, 0.0, 0.25)
+    return b.compile()
+
+
+def test_round_trip(tmp_path):
+    mission = square()
+    path = str(tmp_path / 'square.mission')
+    mission.save(path)
+    for mmap in (False, True):
+        loaded = load_mission(path, mmap=mmap)
+        assert (loaded.name, loaded.box_limit, loaded.height) == ('square', 0.5, pytest.approx(0.3))
+        assert loaded.duration == pytest.approx(mission.duration)
+        assert loaded.primitives.tobytes() == mission.primitives.tobytes()
+    assert abs(mission.primitives['x'][-1]) < 1e-6 and abs(mission.primitives['y'][-1]) < 1e-6
+
+
+def test_corrupted_and_truncated_files_are_rejected(tmp_path):
+    path = tmp_path / 'square.mission'
+    square().save(str(path))
+    data = bytearray(path.read_bytes())
+
+    data[-3] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match='corrupted'):
+        load_mission(str(path))
+
+    path.write_bytes(bytes(data[:-5]))
+    with pytest.raises(ValueError, match='truncated'):
+        load_mission(str(path))
+
+
+def test_geofence_is_checked_along_arcs():
+    b = MissionBuilder('arc', 0.25, 0.3)
+    b.forward(0.2)
+    with pytest.raises(GeofenceError):
+        b.circle_left(0.1, angle_degrees=180)  # Ends inside, bulges out on the way
+    with pytest.raises(GeofenceError):
+        b.down(0.25)
+
+
+def test_flies_to_the_planned_pose():
+    mission = square()
+
+    def fly(scf):
+        reason = fly_mission(scf, mission)
+        drone = scf.cf.drone
+        return reason, drone.x, drone.y
+
+    (reason, x, y), sim_seconds, _ = run_simulated(fly, world=World())
+    assert reason is None
+    assert sim_seconds >= mission.duration
+    assert abs(x) < 0.05 and abs(y) < 0.05
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+import mission_runtime
+from mission_runtime import MissionRuntime, TICK, obstacle_within
+from range_events import RangeEventStream
+from sim_drone import World, run_simulated
+
+SAFETY_NET = 10.0           # Real seconds after which a stuck prompt is released anyway
+
+
+def fly_until_interrupted(scf, mission):
+    with mission_runtime.MotionCommander(scf, default_height=0.3) as mc, RangeEventStream(scf) as ranges:
+        runtime = MissionRuntime(mc)
+        runtime.watch(obstacle_within(ranges, 0.2), 'obstacle')
+        reason = runtime.run(mission)
+        return reason, runtime, mission_runtime.time.time()
+
+
+def test_interrupt_during_blocking_prompt_lands_within_one_tick():
+    prompt = threading.Event()      # Stands in for the player never pressing Enter
+    net = threading.Timer(SAFETY_NET, prompt.set)
+    net.start()
+
+    async def mission(rt):
+        rt.mc.start_forward(0.2)
+        await rt.run_blocking(prompt.wait)
+
+    try:
+        (reason, runtime, returned_at), _, _ = run_simulated(
+            lambda scf: fly_until_interrupted(scf, mission), world=World([(0.8, 0.0, 0.1)]))
+        answered = prompt.is_set()
+    finally:
+        prompt.set()
+        net.cancel()
+
+    assert reason == 'obstacle'
+    assert not answered
+    assert returned_at - runtime.interrupted_at <= TICK + 1e-9
+
+
+def test_blocking_result_is_returned():
+    results = []
+
+    async def mission(rt):
+        results.append(await rt.run_blocking(lambda a, b: a + b, 2, 3))
+
+    def fly(scf):
+        with mission_runtime.MotionCommander(scf, default_height=0.3) as mc:
+            return MissionRuntime(mc).run(mission)
+
+    reason, _, _ = run_simulated(fly)
+    assert reason is None
+    assert results == [5]
+
+
+def test_blocking_error_is_raised_in_the_mission():
+    async def mission(rt):
+        await rt.run_blocking(int, 'not a number')
+
+    def fly(scf):
+        with mission_runtime.MotionCommander(scf, default_height=0.3) as mc:
+            return MissionRuntime(mc).run(mission)
+
+    with pytest.raises(ValueError):
+        run_simulated(fly)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+import monte_carlo
+from monte_carlo import COLUMNS, SWEEP, UNUSED_MOVE_DURATION, ColumnWriter, load_columns, summary, tasks
+
+
+def rows(count):
+    return [(seed, 0.2 + 0.1 * (seed % 3), 2 + seed % 4, 2.0, seed % 2, seed * 0.5, seed * 0.001, 10, seed % 3, 0)
+            for seed in range(count)]
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_columns_round_trip(tmp_path, monkeypatch, mmap):
+    # Small flushes so the columns are written in several blocks
+    monkeypatch.setattr(monte_carlo, 'FLUSH_ROWS', 7)
+    directory = str(tmp_path / 'results')
+    expected = np.array(rows(50), dtype=np.dtype(COLUMNS['waypoints']))
+    with ColumnWriter(directory, COLUMNS['waypoints']) as writer:
+        for row in rows(50):
+            writer.append(row)
+    assert writer.rows == 50
+
+    columns = load_columns(directory, mmap=mmap)
+    assert list(columns) == [name for name, _ in COLUMNS['waypoints']]
+    for name in expected.dtype.names:
+        assert np.array_equal(columns[name], expected[name])
+        assert columns[name].dtype == expected.dtype[name]
+    # One column can be read on its own
+    assert list(load_columns(directory, ['timeouts'], mmap=mmap)) == ['timeouts']
+
+
+def test_empty_results_load(tmp_path):
+    directory = str(tmp_path / 'empty')
+    with ColumnWriter(directory, COLUMNS['avoider']):
+        pass
+    assert all(len(column) == 0 for column in load_columns(directory).values())
+
+
+def test_smooth_runs_are_not_repeated_per_move_duration():
+    settings = [args[1:] for _, args in tasks('waypoints', 1)]
+    assert len(settings) == len(set(settings))
+    smooth = [s for s in settings if s[3]]
+    stop_and_go = [s for s in settings if not s[3]]
+    assert len(smooth) == len(SWEEP['box_limit']) * len(SWEEP['max_dummy'])
+    assert {s[2] for s in smooth} == {UNUSED_MOVE_DURATION}
+    assert len(stop_and_go) == len(smooth) * len(SWEEP['move_duration'])
+    # Runs are seeded by their index
+    assert [args[0] for _, args in tasks('waypoints', 2)] == list(range(2 * len(settings)))
+
+
+def test_summary_labels_the_move_duration(tmp_path, capsys):
+    directory = str(tmp_path / 'results')
+    with ColumnWriter(directory, COLUMNS['waypoints']) as writer:
+        writer.append((0, 0.2, 2, 2.0, 0, 30.0, 0.1, 10, 1, 0))
+        writer.append((1, 0.2, 2, UNUSED_MOVE_DURATION, 1, 20.0, 0.1, 10, 0, 0))
+    summary(directory)
+    header, *lines = capsys.readouterr().out.splitlines()[1:]
+    assert header.split()[:4] == ['box', 'dummy', 'move', 'smooth']
+    moves = {line.split()[3]: line.split()[2] for line in lines}
+    assert moves == {'no': '2.0s', 'yes': '-'}
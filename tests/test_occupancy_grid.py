@@ -0,0 +1,78 @@
+import math
+
+from occupancy_grid import (FREE_RANGE, LOG_ODDS_HIT, LOG_ODDS_MISS, OCCUPIED_THRESHOLD, OccupancyGrid,
+                            OccupancyMapper)
+from range_events import RangeSample
+
+ORIGIN = (0.025, 0.025, 0.3)     # Center of a 5cm cell
+
+
+def test_ray_clears_its_path_and_marks_the_hit():
+    grid = OccupancyGrid(resolution=0.05)
+    grid.insert_ray(ORIGIN, (1.0, 0.0, 0.0), 0.5)
+    hit = grid.key(0.525, 0.025, 0.3)
+    assert grid.cells[hit] == LOG_ODDS_HIT
+    path = [grid.key(0.025 + 0.05 * i, 0.025, 0.3) for i in range(10)]
+    assert all(grid.cells[cell] == LOG_ODDS_MISS for cell in path)
+    # Nothing was touched beyond the hit or off the ray
+    assert len(grid) == 11 and grid.rays == 1
+    assert grid.is_occupied(0.525, 0.025, 0.3)
+    assert grid.is_free(0.3, 0.025, 0.3)
+    # Distance to where the ray enters the occupied cell
+    assert math.isclose(grid.obstacle_distance(ORIGIN, (1.0, 0.0, 0.0), 1.0), 0.5 - 0.025)
+    assert grid.obstacle_distance(ORIGIN, (-1.0, 0.0, 0.0), 1.0) is None
+
+
+def test_stray_reading_is_undone_by_the_next_ray():
+    grid = OccupancyGrid(resolution=0.05)
+    grid.insert_ray(ORIGIN, (1.0, 0.0, 0.0), 0.3)
+    stray = grid.key(0.325, 0.025, 0.3)
+    assert grid.is_occupied(0.325, 0.025, 0.3)
+    changes = []
+    grid.add_listener(lambda cell, occupied: changes.append((cell, occupied)))
+    # Nothing is there: the next ray passes through the cell
+    grid.insert_ray(ORIGIN, (1.0, 0.0, 0.0), 1.0)
+    assert not grid.is_occupied(0.325, 0.025, 0.3)
+    far = grid.key(1.025, 0.025, 0.3)
+    assert changes == [(stray, False), (far, True)]
+
+
+def test_out_of_range_clears_free_range():
+    grid = OccupancyGrid(resolution=0.05)
+    grid.insert_ray(ORIGIN, (0.0, 1.0, 0.0), None)
+    assert not grid.occupied_cells()
+    # Every cell the first FREE_RANGE meters touch, no more
+    assert round(FREE_RANGE / 0.05) <= len(grid) <= round(FREE_RANGE / 0.05) + 1
+    assert all(value < OCCUPIED_THRESHOLD for value in grid.cells.values())
+
+
+def test_diagonal_ray_visits_connected_cells():
+    grid = OccupancyGrid(resolution=0.05)
+    direction = (math.cos(0.4), math.sin(0.4), 0.0)
+    grid.insert_ray(ORIGIN, direction, 0.8)
+    cells = sorted(grid.cells)
+    # Every step of the traversal moves to a face neighbour
+    ordered = [cell for cell, _ in grid._traverse(ORIGIN, direction, 0.8)]
+    assert all(sum(abs(a - b) for a, b in zip(p, q)) == 1 for p, q in zip(ordered, ordered[1:]))
+    assert sorted(ordered) == cells
+    end = tuple(o + d * 0.8 for o, d in zip(ORIGIN, direction))
+    assert grid.cells[grid.key(*end)] == LOG_ODDS_HIT
+
+
+def test_mapper_integrates_every_direction_at_the_estimate():
+    class Estimate:
+        position = None
+
+    grid = OccupancyGrid(resolution=0.05)
+    estimate = Estimate()
+    mapper = OccupancyMapper(grid, estimate)
+    sample = RangeSample(0.0, 0.4, 0.4, 0.4, 0.4, None)
+    mapper(sample)
+    assert mapper.skipped == 1 and grid.rays == 0
+
+    estimate.position = ORIGIN
+    mapper(sample)
+    mapper(sample)
+    assert grid.rays == 10
+    for x, y in ((0.425, 0.025), (-0.375, 0.025), (0.025, 0.425), (0.025, -0.375)):
+        assert grid.is_occupied(x, y, 0.3)
@@ -0,0 +1,65 @@
+import math
+
+from odometry import ODOMETRY_PERIOD_MS, Odometry
+from sim_drone import MotionCommander, run_simulated
+from state_estimate import State, StateEstimate
+
+
+class FakeEstimate:
+    def __init__(self):
+        self.callbacks = []
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self.callbacks.remove(callback)
+
+    def feed(self, t, x, y, z=0.3):
+        for callback in self.callbacks:
+            callback(State(t, x, y, z, 0.0, 0.0, 0.0))
+
+
+def test_displacement_is_relative_to_the_first_sample():
+    estimate = FakeEstimate()
+    with Odometry(estimate, goal=(1.0, 0.0)) as odometry:
+        assert odometry.displacement == (0.0, 0.0, 0.0)
+        estimate.feed(0.0, 0.2, -0.1)
+        # Out to x = 0.7 with a sidestep, and partly back
+        for i, (x, y) in enumerate([(0.4, -0.1), (0.4, 0.1), (0.7, 0.1), (0.5, 0.1)], start=1):
+            estimate.feed(i * 0.1, x, y)
+    assert estimate.callbacks == []
+    dx, dy, dz = odometry.displacement
+    assert math.isclose(dx, 0.3) and math.isclose(dy, 0.2) and dz == 0.0
+    assert math.isclose(odometry.path_length, 0.2 + 0.2 + 0.3 + 0.2)
+    assert math.isclose(odometry.max_cross_track, 0.2)
+    assert odometry.samples == 5
+
+
+def test_commands_are_dead_reckoned_against_the_estimate():
+    estimate = FakeEstimate()
+    odometry = Odometry(estimate)
+    odometry.start()
+    odometry.command(0.5, 0.0, 0.0)
+    estimate.feed(0.0, 0.0, 0.0)
+    # Commanded 0.5 m/s for a second, but the drone only made 0.4m
+    estimate.feed(1.0, 0.4, 0.0)
+    odometry.stop()
+    assert odometry.commanded_displacement == (0.5, 0.0, 0.0)
+    assert math.isclose(odometry.drift, 0.1)
+    assert math.isclose(odometry.max_drift, 0.1)
+
+
+def test_follows_a_simulated_flight():
+    def fly(scf):
+        with MotionCommander(scf, default_height=0.3) as mc, StateEstimate(scf, ODOMETRY_PERIOD_MS) as estimate:
+            with Odometry(estimate) as odometry:
+                mc.forward(0.5)
+                mc.back(0.2)
+                mc.left(0.1)
+            return odometry
+
+    odometry, _, _ = run_simulated(fly)
+    dx, dy, _ = odometry.displacement
+    assert abs(dx - 0.3) < 0.03 and abs(dy - 0.1) < 0.03
+    assert abs(odometry.path_length - 0.8) < 0.1
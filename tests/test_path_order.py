@@ -0,0 +1,39 @@
+import itertools
+import math
+
+from path_order import CRUISE_VELOCITY, order_waypoints, path_length
+from waypoint_gen import generate_waypoints, waypoints_to_list
+
+START, END = (0.0, 0.0), (0.5, 0.5)
+
+
+def brute_force(points):
+    return min(path_length([START] + list(order) + [END]) for order in itertools.permutations(points))
+
+
+def test_close_to_the_shortest_order():
+    optimal = 0
+    for seed in range(40):
+        points = waypoints_to_list(generate_waypoints(7, 0.5, seed=seed))
+        ordered, report = order_waypoints(points, START, END)
+        assert sorted(ordered) == sorted(points)
+        assert math.isclose(report.ordered_length, path_length([START] + ordered + [END]))
+        best = brute_force(points)
+        # 2-opt and Or-opt are local search: usually optimal, never far off
+        assert report.ordered_length <= best * 1.1
+        optimal += math.isclose(report.ordered_length, best)
+    assert optimal >= 35
+
+
+def test_never_longer_than_the_original_order():
+    points = waypoints_to_list(generate_waypoints(300, 0.5, seed=4))
+    ordered, report = order_waypoints(points, START, END)
+    assert sorted(ordered) == sorted(points)
+    assert report.ordered_length <= report.original_length
+    assert math.isclose(report.time_saved, (report.original_length - report.ordered_length) / CRUISE_VELOCITY)
+
+
+def test_too_few_points_are_kept_as_they_are():
+    assert order_waypoints([], START, END)[0] == []
+    ordered, report = order_waypoints([(0.2, 0.1)], START, END)
+    assert ordered == [(0.2, 0.1)] and report.time_saved == 0.0
@@ -0,0 +1,83 @@
+import contextlib
+import io
+import math
+
+import project3_2 as mission
+from occupancy_grid import LOG_ODDS_MAX, OccupancyGrid
+from path_planner import CLEARANCE, DStarLite
+from sim_drone import World, run_simulated
+
+HEIGHT = 0.3
+
+
+def block(grid, x, y0, y1):
+    """Occupy the column of cells at x from y0 to y1, at flight height."""
+    r = grid.resolution
+    for j in range(int(round(y0 / r)), int(round(y1 / r)) + 1):
+        grid.update_cell(grid.key(x, j * r, HEIGHT), LOG_ODDS_MAX)
+
+
+def clearance(planner, grid):
+    """Smallest distance from a cell center on the plan to an occupied cell center."""
+    obstacles = [grid.center(cell)[:2] for cell in grid.occupied_cells()]
+    return min(math.dist(planner.center(cell), o) for cell in planner.path() for o in obstacles)
+
+
+def test_open_grid_plans_a_straight_line():
+    grid = OccupancyGrid(resolution=0.05)
+    planner = DStarLite(grid, (0.0, 0.0, HEIGHT), (1.0, 0.0))
+    assert planner.replan(budget=1.0)
+    path = planner.path()
+    assert path[0] == planner.start and path[-1] == planner.goal
+    assert all(cell[1] == 0 for cell in path)
+    assert len(path) == planner.goal[0] - planner.start[0] + 1
+    planner.close()
+
+
+def test_new_obstacle_is_repaired_incrementally():
+    grid = OccupancyGrid(resolution=0.05)
+    planner = DStarLite(grid, (0.0, 0.0, HEIGHT), (1.0, 0.0))
+    assert planner.replan(budget=1.0)
+
+    block(grid, 0.5, -0.2, 0.2)
+    assert planner.replan(budget=1.0)
+    assert clearance(planner, grid) > CLEARANCE
+    assert planner.path()[-1] == planner.goal
+    # The repaired plan is as good as planning from scratch on the new map
+    fresh = DStarLite(grid, (0.0, 0.0, HEIGHT), (1.0, 0.0))
+    assert fresh.replan(budget=1.0)
+    assert math.isclose(planner.g[planner.start], fresh.g[fresh.start])
+    fresh.close()
+
+    # Flying on and replanning from the new start keeps a valid plan
+    waypoint = planner.next_waypoint()
+    planner.update_start((waypoint[0], waypoint[1], HEIGHT))
+    assert planner.replan(budget=1.0)
+    assert planner.path()[0] == planner.start
+    planner.close()
+
+
+def test_enclosed_goal_has_no_path():
+    grid = OccupancyGrid(resolution=0.05)
+    planner = DStarLite(grid, (0.0, 0.0, HEIGHT), (1.0, 0.0), margin=0.3)
+    # A wall across the whole search area
+    block(grid, 0.5, -0.5, 0.5)
+    assert not planner.replan(budget=1.0)
+    assert not planner.searching
+    assert planner.path() == []
+    assert planner.next_waypoint() is None
+    planner.close()
+
+
+def test_planned_and_reactive_followers_report_the_same_distance():
+    def fly(scf):
+        with mission.MotionCommander(scf, default_height=mission.FLIGHT_HEIGHT) as mc:
+            return mission.follow_planned_path(scf, mc)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        follower, _, _ = run_simulated(fly, mission, world=World([(0.5, 0.0, 0.1)]))
+    assert follower.reached
+    # Forward progress like PathFollower, not the longer path flown around the obstacle
+    assert follower.distance_traveled == follower.odometry.displacement[0]
+    assert abs(follower.distance_traveled - mission.TARGET_DISTANCE) <= mission.GOAL_TOLERANCE
+    assert follower.odometry.path_length > follower.distance_traveled
@@ -0,0 +1,74 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import preflight
+from preflight import REQUIRED_DECKS, check_decks, require_decks
+from sim_drone import run_simulated
+
+
+class FakeParam:
+    """cflib Param stand-in that reports deck values from another thread after a delay."""
+
+    def __init__(self, reports, delay=0.05):
+        self.reports = reports          # deck -> value string, silent when absent
+        self.delay = delay
+        self.callbacks = []
+
+    def add_update_callback(self, group, name=None, cb=None):
+        self.callbacks.append((group, name, cb))
+        if name in self.reports:
+            threading.Timer(self.delay, cb, args=(f'{group}.{name}', self.reports[name])).start()
+
+    def remove_update_callback(self, group, name=None, cb=None):
+        self.callbacks.remove((group, name, cb))
+
+
+def fake_scf(reports, delay=0.05):
+    return SimpleNamespace(cf=SimpleNamespace(param=FakeParam(reports, delay)))
+
+
+def timed(scf, timeout=2.0):
+    begin = time.perf_counter()
+    result = check_decks(scf, timeout=timeout)
+    return result, time.perf_counter() - begin
+
+
+def test_returns_as_soon_as_every_deck_reported():
+    scf = fake_scf({'bcFlow2': '1', 'bcMultiranger': '1'})
+    result, elapsed = timed(scf)
+    assert result.ok and result.attached == list(REQUIRED_DECKS)
+    assert elapsed < 0.5
+    assert scf.cf.param.callbacks == []
+
+
+def test_missing_deck_ends_the_check_early():
+    # The flow deck never answers, but the Multi-ranger says it is not there
+    scf = fake_scf({'bcMultiranger': '0'})
+    result, elapsed = timed(scf)
+    assert not result.ok
+    assert result.missing == ['bcFlow2', 'bcMultiranger']
+    assert elapsed < 0.5
+    assert scf.cf.param.callbacks == []
+
+
+def test_silent_deck_counts_as_missing_after_the_timeout():
+    scf = fake_scf({'bcFlow2': '1'})
+    result, elapsed = timed(scf, timeout=0.3)
+    assert result.attached == ['bcFlow2'] and result.missing == ['bcMultiranger']
+    assert 0.3 <= elapsed < 1.0
+    assert scf.cf.param.callbacks == []
+
+
+def test_simulated_drone_without_multiranger_exits():
+    def fly(scf):
+        scf.cf.param.set_value('deck.bcMultiranger', 0)
+        with pytest.raises(SystemExit):
+            require_decks(scf)
+        scf.cf.param.set_value('deck.bcMultiranger', 1)
+        return require_decks(scf)
+
+    result, _, _ = run_simulated(fly, preflight)
+    assert result.ok
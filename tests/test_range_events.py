@@ -0,0 +1,30 @@
+import mission_runtime
+from range_events import LatencyRecorder, RangeEventStream, run_event_loop
+from setpoints import SetpointSender
+from sim_drone import run_simulated
+
+
+def test_latency_recorder_is_bounded():
+    latency = LatencyRecorder()
+    for i in range(1, 100001):
+        latency.record(i * 1e-6)
+    summary = latency.summary()
+    assert summary['count'] == 100000
+    assert abs(summary['mean_ms'] - 50.0005) < 1e-3
+    assert 46.0 <= summary['p50_ms'] <= 54.0
+    assert 93.0 <= summary['p99_ms'] <= 100.0
+    assert abs(summary['max_ms'] - 100.0) < 1e-6
+    assert len(latency.histogram.counts) < 1000
+
+
+def test_event_loop_records_only_sent_setpoints():
+    def fly(scf):
+        with mission_runtime.MotionCommander(scf, default_height=0.3) as mc, RangeEventStream(scf) as stream:
+            setpoints = SetpointSender(mc)
+            latency = LatencyRecorder()
+            run_event_loop(stream, setpoints, lambda sample: (0.0, 0.0, 0.0), latency, timeout=3.0)
+            return setpoints, latency
+
+    (setpoints, latency), _, _ = run_simulated(fly)
+    assert setpoints.suppressed > 0
+    assert latency.count == setpoints.sent
@@ -0,0 +1,76 @@
+import contextlib
+import io
+
+import proj3_part2_wes_alejandro as race
+from range_events import RangeSample
+from range_filter import CONFIRM, HYSTERESIS, ChannelFilter, RangeFilter
+from sim_drone import World, run_simulated
+
+ENTER = 0.2
+
+
+def feed(channel, readings, t=0.0):
+    return [channel.update(reading, t + i * 0.01) for i, reading in enumerate(readings)]
+
+
+def test_short_burst_of_outliers_is_dropped():
+    channel = ChannelFilter(ENTER, ENTER + HYSTERESIS)
+    feed(channel, [1.0] * 5)
+    values = feed(channel, [0.05] * (CONFIRM - 1) + [1.0])
+    assert values == [1.0] * CONFIRM
+    assert not channel.close
+    assert channel.outliers == CONFIRM - 1
+
+
+def test_real_step_is_accepted_after_confirm_readings():
+    channel = ChannelFilter(ENTER, ENTER + HYSTERESIS)
+    feed(channel, [1.0] * 5)
+    values = feed(channel, [0.1] * CONFIRM)
+    assert values[:-1] == [1.0] * (CONFIRM - 1)
+    assert abs(values[-1] - 0.1) < 1e-9
+    assert channel.close
+    # Confirmed readings are not counted as outliers
+    assert channel.outliers == 0
+
+
+def test_close_state_has_hysteresis():
+    channel = ChannelFilter(ENTER, ENTER + HYSTERESIS, outlier_distance=1.0)
+    feed(channel, [0.3] * 3)
+    assert not channel.close
+    feed(channel, [0.19] * 3)
+    assert channel.close
+    # Between the enter and exit thresholds it stays close
+    feed(channel, [ENTER + HYSTERESIS / 2] * 3)
+    assert channel.close
+    feed(channel, [ENTER + 2 * HYSTERESIS] * 3)
+    assert not channel.close
+
+
+def test_out_of_range_passes_through_as_none():
+    range_filter = RangeFilter(ENTER)
+    sample = RangeSample(0.0, None, 1.0, None, 0.5, None)
+    filtered = range_filter.update(sample)
+    assert filtered == sample
+    assert not any(range_filter.is_close(name) for name in ('front', 'back', 'left', 'right', 'up'))
+
+
+def _race(filter_ranges):
+    def fly(scf):
+        with race.MotionCommander(scf, default_height=race.MINIMUM_HEIGHT) as mc:
+            controller = race.fly_race(scf, mc, race_time=5.0, filter_ranges=filter_ranges, predictive=False)
+            return controller, scf.cf.drone.x
+
+    # Spurious short readings, some of them from the up ranger that aborts the race
+    with contextlib.redirect_stdout(io.StringIO()):
+        result, _, _ = run_simulated(fly, race, world=World(outlier_rate=0.02, seed=0))
+    return result
+
+
+def test_filtered_race_ignores_spurious_readings():
+    raw, raw_x = _race(filter_ranges=False)
+    assert raw.aborted
+
+    filtered, filtered_x = _race(filter_ranges=True)
+    assert not filtered.aborted
+    assert filtered.range_filter.outliers > 0
+    assert filtered_x > raw_x
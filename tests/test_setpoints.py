@@ -0,0 +1,48 @@
+from setpoints import SetpointSender
+
+
+class RecordingCommander:
+    def __init__(self):
+        self.calls = []
+        self.default_height = 0.3
+
+    def start_linear_motion(self, *setpoint):
+        self.calls.append(('start_linear_motion', setpoint))
+
+    def stop(self):
+        self.calls.append(('stop', ()))
+
+    def forward(self, distance_m, velocity=0.2):
+        self.calls.append(('forward', (distance_m, velocity)))
+
+
+def test_repeated_setpoints_are_suppressed():
+    sender = SetpointSender(RecordingCommander(), keep_alive=60.0)
+    assert sender.start_linear_motion(0.2, 0.0, 0.0) is True
+    assert sender.start_linear_motion(0.2, 0.0, 0.0) is False
+    assert (sender.sent, sender.suppressed) == (1, 1)
+
+
+def test_attribute_reads_keep_the_last_setpoint():
+    sender = SetpointSender(RecordingCommander(), keep_alive=60.0)
+    sender.start_linear_motion(0.2, 0.0, 0.0)
+    assert sender.default_height == 0.3
+    assert sender.start_linear_motion(0.2, 0.0, 0.0) is False
+
+
+def test_blocking_move_forces_the_next_setpoint():
+    mc = RecordingCommander()
+    sender = SetpointSender(mc, keep_alive=60.0)
+    sender.start_linear_motion(0.0, 0.0, 0.0)
+    sender.forward(0.5)
+    assert sender.start_linear_motion(0.0, 0.0, 0.0) is True
+    assert [name for name, _ in mc.calls] == ['start_linear_motion', 'forward', 'start_linear_motion']
+
+
+def test_stop_is_always_sent():
+    mc = RecordingCommander()
+    sender = SetpointSender(mc, keep_alive=60.0)
+    sender.start_linear_motion(0.0, 0.0, 0.0)
+    assert sender.stop() is True
+    assert sender.start_linear_motion(0.0, 0.0, 0.0) is False
+    assert [name for name, _ in mc.calls] == ['start_linear_motion', 'stop']
@@ -0,0 +1,35 @@
+import math
+
+import state_estimate
+from sim_drone import MotionCommander, run_simulated
+from state_estimate import ARRIVAL_TOLERANCE, StateEstimate, fly_to
+
+
+def test_fly_to_returns_on_arrival():
+    def fly(scf):
+        with MotionCommander(scf, default_height=0.3) as mc, StateEstimate(scf) as estimate:
+            begin = scf.cf.clock.now
+            reached = fly_to(mc, estimate, (0.4, -0.2), velocity=0.3)
+            elapsed = scf.cf.clock.now - begin
+            drone = scf.cf.drone
+            return reached, elapsed, math.hypot(drone.x - 0.4, drone.y + 0.2), estimate.latest
+
+    (reached, elapsed, miss, latest), _, _ = run_simulated(fly, state_estimate)
+    assert reached
+    assert miss <= ARRIVAL_TOLERANCE + 0.02
+    # About the flight time, not a fixed MOVE_DURATION
+    assert math.hypot(0.4, 0.2) / 0.3 <= elapsed < 3.0
+    assert latest is not None
+
+
+def test_fly_to_gives_up_and_stops_on_timeout():
+    def fly(scf):
+        with MotionCommander(scf, default_height=0.3) as mc, StateEstimate(scf) as estimate:
+            begin = scf.cf.clock.now
+            reached = fly_to(mc, estimate, (1.0, 0.0), velocity=0.05, timeout=1.0)
+            return reached, scf.cf.clock.now - begin, scf.cf.drone.cmd
+
+    (reached, elapsed, command), _, _ = run_simulated(fly, state_estimate)
+    assert not reached
+    assert 1.0 <= elapsed < 1.2
+    assert command[:3] == (0.0, 0.0, 0.0)
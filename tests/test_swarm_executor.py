@@ -0,0 +1,105 @@
+import threading
+import time
+
+import swarm_executor
+from sim_drone import MotionCommander, SimCrazyflie, run_simulated
+from swarm_executor import SwarmReport, run_swarm
+
+URIS = ['sim://0', 'sim://1', 'sim://2']
+
+
+def square(scf):
+    with MotionCommander(scf, default_height=0.3) as mc:
+        for _ in range(4):
+            mc.forward(0.2)
+            mc.turn_left(90)
+    return 4
+
+
+class BrokenLink(SimCrazyflie):
+    def open_link(self, link_uri):
+        raise ConnectionError(f'no answer from {link_uri}')
+
+
+def swarm(mission, factory=None, connect_timeout=swarm_executor.CONNECT_TIMEOUT):
+    """run_swarm on simulated drones, with make_crazyflie swapped for factory when given."""
+    def fly(scf):
+        original = swarm_executor.make_crazyflie
+        if factory is not None:
+            swarm_executor.make_crazyflie = factory
+        try:
+            begin = time.perf_counter()
+            report = run_swarm(URIS, mission, connect_timeout=connect_timeout)
+            return report, time.perf_counter() - begin
+        finally:
+            swarm_executor.make_crazyflie = original
+
+    (report, wall_seconds), _, _ = run_simulated(fly, swarm_executor)
+    return report, wall_seconds
+
+
+def test_empty_swarm_returns_an_empty_report():
+    report = run_swarm([], lambda scf: 1)
+    assert report == SwarmReport([])
+    assert report.makespan == 0.0 and report.throughput == 0.0
+
+
+def test_every_drone_flies_after_the_whole_swarm_connected():
+    drones = []
+    connected = []
+    lock = threading.Lock()
+
+    def factory(cache=None):
+        drone = SimCrazyflie()
+        with lock:
+            drones.append(drone)
+        return drone
+
+    def mission(scf):
+        with lock:
+            connected.append(sum(1 for drone in drones if drone.link_uri))
+        return square(scf)
+
+    report, _ = swarm(mission, factory)
+    assert [d.uri for d in report.drones] == URIS
+    assert all(d.ok and d.error is None for d in report.drones)
+    assert [d.waypoints for d in report.drones] == [4, 4, 4]
+    assert all(d.mission_time > 0 for d in report.drones)
+    # No mission started before every link was open
+    assert connected == [len(URIS)] * len(URIS)
+    assert report.throughput > 0
+
+
+def test_failed_connection_is_reported_and_the_rest_fly():
+    def factory(cache=None):
+        return BrokenLink() if threading.current_thread().name == 'drone-1' else SimCrazyflie()
+
+    report, _ = swarm(square, factory)
+    assert [d.ok for d in report.drones] == [True, False, True]
+    assert 'no answer from sim://1' in report.drones[1].error
+    assert [d.waypoints for d in report.drones] == [4, 0, 4]
+
+
+def test_failing_constructor_does_not_hold_up_the_swarm():
+    def factory(cache=None):
+        if threading.current_thread().name == 'drone-0':
+            raise OSError('cache directory is not writable')
+        return SimCrazyflie()
+
+    report, wall_seconds = swarm(square, factory, connect_timeout=5.0)
+    assert [d.ok for d in report.drones] == [False, True, True]
+    assert 'not writable' in report.drones[0].error
+    # The others get past the barrier right away instead of waiting for connect_timeout
+    assert wall_seconds < 2.0
+
+
+def test_mission_error_is_reported_per_drone():
+    def mission(scf):
+        if scf.cf.link_uri == 'sim://2':
+            raise RuntimeError('battery too low')
+        return square(scf)
+
+    report, _ = swarm(mission)
+    assert [d.ok for d in report.drones] == [True, True, False]
+    assert report.drones[2].error == 'battery too low'
+    assert report.drones[2].mission_time >= 0.0
@@ -0,0 +1,45 @@
+import math
+
+import numpy as np
+
+from sim_drone import MotionCommander, run_simulated
+from telemetry_recorder import TelemetryRecorder
+
+
+def record(i):
+    return (float(i), i * 0.01, 0.0, 0.3, 0.1, 0.0, 0.0, 1.0, math.nan, 0.5, 0.5, math.nan, 4.0)
+
+
+def test_ring_keeps_the_newest_records_in_order(tmp_path):
+    path = str(tmp_path / 'ring.telem')
+    with TelemetryRecorder(path, capacity=8) as recorder:
+        for i in range(19):
+            recorder.append(*record(i))
+        assert (len(recorder), recorder.written, recorder.dropped) == (8, 19, 11)
+        assert len(recorder.records()) == 2
+        assert recorder.snapshot()['t'].tolist() == list(range(11, 19))
+        assert np.concatenate(recorder.latest(5))['t'].tolist() == list(range(14, 19))
+
+    with TelemetryRecorder(path, readonly=True) as telemetry:
+        records = telemetry.snapshot()
+    assert records['t'].tolist() == list(range(11, 19))
+    assert np.isnan(records['back']).all() and (records['front'] == 1.0).all()
+
+
+def test_records_a_simulated_flight(tmp_path):
+    path = str(tmp_path / 'flight.telem')
+
+    def fly(scf):
+        with TelemetryRecorder(path, capacity=4096) as recorder:
+            recorder.attach(scf)
+            with MotionCommander(scf, default_height=0.3) as mc:
+                mc.forward(0.4)
+
+    _, sim_seconds, _ = run_simulated(fly)
+    with TelemetryRecorder(path, readonly=True) as telemetry:
+        records = telemetry.snapshot()
+    assert len(records) > 10 * sim_seconds
+    assert np.all(np.diff(records['t']) > 0)
+    assert abs(records['x'].max() - 0.4) < 0.05
+    assert records['z'].max() > 0.25
+    assert np.nanmax(records['vbat']) <= 4.2
@@ -0,0 +1,68 @@
+import copy
+import json
+import os
+import threading
+
+import toc_cache
+
+TOC = {'log': {'pm.vbat': {'__class__': 'LogTocElement', 'ident': 0}}}
+
+
+class FakeTocCache:
+    """Reads and writes <CRC>.json the way cflib's TocCache does."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, crc):
+        try:
+            with open(os.path.join(self.directory, '%08X.json' % crc)) as f:
+                return json.load(f)
+        except OSError:
+            return None
+
+    def insert(self, crc, toc):
+        with open(os.path.join(self.directory, '%08X.json' % crc), 'w') as f:
+            json.dump(toc, f)
+
+
+def test_parallel_first_connects_keep_every_crc(tmp_path):
+    errors = []
+
+    def connect(first):
+        try:
+            for crc in range(first, first + 25):
+                toc_cache._record_crc(str(tmp_path), crc)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=connect, args=(i * 100,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(toc_cache._load_manifest(str(tmp_path))) == 8 * 25
+    assert sorted(os.listdir(tmp_path)) == [toc_cache.MANIFEST]
+
+
+def test_modified_toc_is_a_miss_and_validated_away(tmp_path):
+    directory = str(tmp_path)
+    cache = toc_cache._RecordingTocCache(FakeTocCache(directory), directory)
+    assert cache.fetch(0xABCD) is None
+    cache.insert(0xABCD, TOC)
+    assert cache.fetch(0xABCD) == TOC
+    assert toc_cache.validate(directory) == []
+
+    changed = copy.deepcopy(TOC)
+    changed['log']['pm.vbat']['ident'] = 1
+    FakeTocCache(directory).insert(0xABCD, changed)
+    assert cache.fetch(0xABCD) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert toc_cache.validate(directory) == ['0000ABCD']
+
+
+def test_list_manifest_still_loads(tmp_path):
+    (tmp_path / toc_cache.MANIFEST).write_text(json.dumps(['0000ABCD']))
+    assert toc_cache._load_manifest(str(tmp_path)) == {'0000ABCD': None}
@@ -0,0 +1,52 @@
+import random
+
+import numpy as np
+
+from trajectory import MAX_VELOCITY, SAMPLES_PER_SEGMENT, plan_trajectory
+
+
+def random_waypoints(seed, count=8, box=0.5):
+    rng = random.Random(seed)
+    return [(0.0, 0.0)] + [(rng.uniform(-box, box), rng.uniform(-box, box)) for _ in range(count)] + [(0.0, 0.0)]
+
+
+def test_spline_stays_inside_the_waypoint_box():
+    for seed in range(50):
+        waypoints = np.array(random_waypoints(seed))
+        trajectory = plan_trajectory(waypoints)
+        lo, hi = waypoints.min(axis=0), waypoints.max(axis=0)
+        assert (trajectory.position >= lo - 1e-9).all() and (trajectory.position <= hi + 1e-9).all()
+
+
+def test_passes_every_waypoint_within_limits():
+    waypoints = random_waypoints(7)
+    trajectory = plan_trajectory(waypoints)
+    assert np.allclose(trajectory.position[::SAMPLES_PER_SEGMENT], waypoints)
+    speed = np.hypot(*trajectory.velocity.T)
+    assert speed[0] == 0.0 and speed[-1] == 0.0
+    assert speed.max() <= MAX_VELOCITY + 1e-9
+    assert (np.diff(trajectory.t) >= 0).all()
+    assert trajectory.sample(trajectory.duration + 1.0) == (0.0, 0.0, 0.0, 0.0)
+
+
+def test_stops_at_a_cusp():
+    # Out and straight back: the drone has to come to rest at the turn
+    trajectory = plan_trajectory([(0.0, 0.0), (0.3, 0.0), (0.0, 0.0)])
+    turn = SAMPLES_PER_SEGMENT
+    assert np.allclose(trajectory.position[turn], (0.3, 0.0))
+    assert np.hypot(*trajectory.velocity[turn]) == 0.0
+    assert np.isfinite(trajectory.t).all()
+    assert trajectory.position[:, 0].max() <= 0.3 + 1e-9
+
+
+def test_duplicate_waypoints_are_ignored():
+    plain = plan_trajectory([(0.0, 0.0), (0.3, 0.0), (0.3, 0.3)])
+    repeated = plan_trajectory([(0.0, 0.0), (0.0, 0.0), (0.3, 0.0), (0.3, 0.0), (0.3, 0.0), (0.3, 0.3)])
+    assert np.allclose(plain.position, repeated.position)
+    assert np.allclose(plain.t, repeated.t)
+    assert np.isfinite(repeated.velocity).all()
+
+    # Nowhere to go
+    still = plan_trajectory([(0.2, 0.1), (0.2, 0.1)])
+    assert still.duration == 0.0
+    assert still.sample(1.0) == (0.2, 0.1, 0.0, 0.0)
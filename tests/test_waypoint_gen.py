@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from waypoint_gen import DISTRIBUTIONS, generate_waypoints, waypoints_to_list
+
+BOX = 0.5
+
+
+@pytest.mark.parametrize('distribution', DISTRIBUTIONS)
+def test_points_stay_inside_the_box(distribution):
+    points = generate_waypoints(2000, BOX, distribution, seed=3)
+    assert points.dtype == np.float64 and points.flags['C_CONTIGUOUS']
+    assert points.shape[1] == 2 and 0 < len(points) <= 2000
+    assert (np.abs(points) <= BOX).all()
+
+
+@pytest.mark.parametrize('distribution', DISTRIBUTIONS)
+def test_seed_makes_the_points_repeatable(distribution):
+    a = generate_waypoints(500, BOX, distribution, seed=11)
+    b = generate_waypoints(500, BOX, distribution, seed=11)
+    c = generate_waypoints(500, BOX, distribution, seed=12)
+    assert np.array_equal(a, b)
+    assert not np.array_equal(a, c)
+
+
+def test_jittered_points_fill_distinct_cells():
+    points = generate_waypoints(100, BOX, 'jittered', seed=5)
+    assert len(points) == 100
+    cells = np.floor((points + BOX) / (2 * BOX / 10)).clip(0, 9).astype(int)
+    assert len({tuple(c) for c in cells}) == 100
+
+
+def test_poisson_points_keep_their_spacing():
+    points = generate_waypoints(200, BOX, 'poisson', seed=2, min_distance=0.05)
+    assert len(points) == 200
+    d = np.hypot(*(points[:, None, :] - points[None, :, :]).transpose(2, 0, 1))
+    np.fill_diagonal(d, np.inf)
+    assert d.min() >= 0.05
+
+
+def test_bad_arguments_are_rejected():
+    with pytest.raises(ValueError):
+        generate_waypoints(-1, BOX)
+    with pytest.raises(ValueError):
+        generate_waypoints(10, BOX, 'gaussian')
+    assert generate_waypoints(0, BOX).shape == (0, 2)
+    assert waypoints_to_list(np.array([[0.1, -0.2]])) == [(0.1, -0.2)]
@@ -0,0 +1,282 @@
+"""
+Shared TOC cache for every script.
+
+cflib downloads the log and param tables of contents (TOC) at connect
+time unless it finds them in its cache, stored as <CRC>.json where CRC
+is what the firmware reports for its TOC. The scripts used to pass
+rw_cache='./cache', so launching from another directory meant a cold
+cache and a slow connect. make_crazyflie() always uses one location
+(HELLODRONE_TOC_CACHE, or ~/.cache/hellodrone/toc).
+
+The cache can be pre-warmed offline from a recorded cache directory. Every
+connection made through make_crazyflie() also records the CRCs the
+firmware asked for and, when cflib downloads a TOC, a SHA-256 digest of
+the file it wrote. The CRC is computed by the firmware over its own TOC
+layout and cannot be recomputed from the JSON, so the digest is what ties
+a file's content to its CRC: a cached file that no longer matches it is
+treated as a miss at connect time, and validate() drops it along with
+entries that are malformed or that no known firmware reports.
+
+Usage:
+    python toc_cache.py prewarm ./cache
+    python toc_cache.py validate
+    python toc_cache.py bench radio://0/80/2M/E7E7E7E7E7
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import cflib.crtp
+from cflib.crazyflie import Crazyflie
+from cflib.crazyflie.syncCrazyflie import SyncCrazyflie
+
+CACHE_ENV = 'HELLODRONE_TOC_CACHE'
+DEFAULT_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'hellodrone', 'toc')
+MANIFEST = 'firmware_crcs.json'     # CRC -> digest of the downloaded TOC, null when not downloaded here
+ENTRY_PATTERN = re.compile(r'^([0-9A-F]{8})\.json$')
+TOC_CLASSES = ('LogTocElement', 'ParamTocElement')
+BENCH_RUNS = 3
+
+_manifest_lock = threading.Lock()   # Drones connecting in parallel share the manifest
+
+
+def cache_dir() -> str:
+    """The shared cache directory, created if needed."""
+    path = os.environ.get(CACHE_ENV, DEFAULT_CACHE)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class _RecordingTocCache:
+    """Wraps cflib's TocCache to note which CRCs the firmware asked for and check what it returns."""
+
+    def __init__(self, toc_cache, directory: str):
+        self._toc_cache = toc_cache
+        self._directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def fetch(self, crc):
+        _record_crc(self._directory, crc)
+        data = None
+        if _content_matches(self._directory, '%08X' % crc):
+            data = self._toc_cache.fetch(crc)
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def insert(self, crc, toc) -> None:
+        self._toc_cache.insert(crc, toc)
+        path = os.path.join(self._directory, '%08X.json' % crc)
+        if os.path.exists(path):
+            _record_crc(self._directory, crc, _digest(path))
+
+    def __getattr__(self, name):
+        return getattr(self._toc_cache, name)
+
+
+def make_crazyflie(directory: Optional[str] = None, **kwargs):
+    """
+    Crazyflie that uses the shared TOC cache.
+
+    Args:
+        directory (str or None): cache directory, the shared one when None.
+        kwargs: passed on to Crazyflie.
+
+    Returns:
+        Crazyflie: ready to hand to SyncCrazyflie.
+    """
+    directory = directory or cache_dir()
+    cf = Crazyflie(rw_cache=directory, **kwargs)
+    # The fetchers look the cache up through this attribute at connect time
+    toc_cache = getattr(cf, '_toc_cache', None)
+    if toc_cache is not None:
+        cf._toc_cache = _RecordingTocCache(toc_cache, directory)
+    return cf
+
+
+def _load_manifest(directory: str) -> Dict[str, Optional[str]]:
+    """CRC -> digest of its downloaded TOC. Older manifests are a plain list of CRCs."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if isinstance(manifest, list):
+        return dict.fromkeys(manifest)
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _record_crc(directory: str, crc: int, digest: Optional[str] = None) -> None:
+    name = '%08X' % crc
+    with _manifest_lock:
+        known = _load_manifest(directory)
+        if name in known and (digest is None or known[name] == digest):
+            return
+        known[name] = digest or known.get(name)
+        fd, tmp = tempfile.mkstemp(prefix=MANIFEST, suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(known, f, sort_keys=True)
+            os.replace(tmp, os.path.join(directory, MANIFEST))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def _digest(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _content_matches(directory: str, crc: str, manifest: Optional[Dict[str, Optional[str]]] = None) -> bool:
+    """False if the cached TOC for crc differs from the one downloaded for it; True when nothing was recorded."""
+    expected = (_load_manifest(directory) if manifest is None else manifest).get(crc)
+    path = os.path.join(directory, crc + '.json')
+    if expected is None or not os.path.exists(path):
+        return True
+    return _digest(path) == expected
+
+
+def _entry_is_valid(path: str) -> bool:
+    """True if path holds a TOC in the format cflib's TocCache writes."""
+    try:
+        with open(path) as f:
+            toc = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not isinstance(toc, dict) or not toc:
+        return False
+    for group in toc.values():
+        if not isinstance(group, dict):
+            return False
+        for element in group.values():
+            if not isinstance(element, dict) or element.get('__class__') not in TOC_CLASSES or 'ident' not in element:
+                return False
+    return True
+
+
+def entries(directory: Optional[str] = None) -> Dict[str, str]:
+    """Map of CRC (8 hex digits) to cache file path."""
+    directory = directory or cache_dir()
+    found = {}
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        match = ENTRY_PATTERN.match(os.path.basename(path))
+        if match:
+            found[match.group(1)] = path
+    return found
+
+
+def prewarm(source: str, directory: Optional[str] = None, firmware_crcs: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Copy recorded TOC files into the cache.
+
+    Args:
+        source (str): directory with <CRC>.json files, e.g. an old ./cache.
+        directory (str or None): cache to fill, the shared one when None.
+        firmware_crcs (Iterable[str] or None): only copy these CRCs when given.
+
+    Returns:
+        List[str]: CRCs that were copied.
+    """
+    directory = directory or cache_dir()
+    wanted = None if firmware_crcs is None else {c.upper() for c in firmware_crcs}
+    copied = []
+    for crc, path in sorted(entries(source).items()):
+        if wanted is not None and crc not in wanted:
+            continue
+        if not _entry_is_valid(path):
+            print(f"Skipping malformed TOC {path}")
+            continue
+        shutil.copy2(path, os.path.join(directory, os.path.basename(path)))
+        copied.append(crc)
+    return copied
+
+
+def validate(directory: Optional[str] = None, firmware_crcs: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Remove cache entries that are malformed, not reported by any known
+    firmware, or whose content differs from the TOC downloaded for their CRC.
+
+    Args:
+        directory (str or None): cache to check, the shared one when None.
+        firmware_crcs (Iterable[str] or None): CRCs to keep. Defaults to the
+            ones recorded from real connections; when none are known only the
+            format is checked. Content is checked wherever a digest was
+            recorded, i.e. for TOCs cflib downloaded into this cache.
+
+    Returns:
+        List[str]: CRCs that were removed.
+    """
+    directory = directory or cache_dir()
+    manifest = _load_manifest(directory)
+    known = {c.upper() for c in firmware_crcs} if firmware_crcs is not None else set(manifest)
+    removed = []
+    for crc, path in sorted(entries(directory).items()):
+        if (not _entry_is_valid(path) or (known and crc not in known)
+                or not _content_matches(directory, crc, manifest)):
+            os.remove(path)
+            removed.append(crc)
+    return removed
+
+
+def _time_connect(uri: str, directory: str) -> float:
+    start = time.perf_counter()
+    cflib.crtp.init_drivers()
+    with SyncCrazyflie(uri, cf=make_crazyflie(directory)):
+        pass
+    return time.perf_counter() - start
+
+
+def benchmark_startup(uri: str, runs: int = BENCH_RUNS) -> Dict[str, List[float]]:
+    """
+    Time init_drivers() plus a full connect with a cold and a warm cache.
+
+    Cold runs use a fresh empty directory each time. Warm runs use a copy of
+    the shared cache, pre-warmed by the first cold run.
+
+    Returns:
+        Dict[str, List[float]]: seconds per run for 'cold' and 'warm'.
+    """
+    results = {'cold': [], 'warm': []}
+    with tempfile.TemporaryDirectory() as scratch:
+        warm = os.path.join(scratch, 'warm')
+        shutil.copytree(cache_dir(), warm)
+        for i in range(runs):
+            cold = os.path.join(scratch, f'cold{i}')
+            os.makedirs(cold)
+            results['cold'].append(_time_connect(uri, cold))
+            prewarm(cold, warm)
+        for _ in range(runs):
+            results['warm'].append(_time_connect(uri, warm))
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('prewarm', 'validate', 'bench'):
+        print(__doc__)
+        sys.exit(1)
+
+    command = sys.argv[1]
+    if command == 'prewarm':
+        copied = prewarm(sys.argv[2])
+        print(f"Copied {len(copied)} TOC entries into {cache_dir()}")
+    elif command == 'validate':
+        removed = validate(firmware_crcs=sys.argv[2:] or None)
+        print(f"Removed {len(removed)} stale or malformed entries: {', '.join(removed) or 'none'}")
+    else:
+        timings = benchmark_startup(sys.argv[2])
+        for name, runs in timings.items():
+            print(f"{name:>4}: mean {sum(runs) / len(runs):.2f}s over {len(runs)} runs "
+                  f"({', '.join(f'{t:.2f}s' for t in runs)})")
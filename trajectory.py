@@ -0,0 +1,232 @@
+"""
+Smooth velocity- and acceleration-limited trajectories through waypoints.
+
+Flying a waypoint list with fly_to() stops the drone at every waypoint.
+plan_trajectory() instead fits a cubic Hermite spline through all of them
+(shape-preserving tangents over chord-length knots, so the path is C1,
+passes exactly through each waypoint and, between two waypoints, moves
+monotonically along each axis: it never leaves the box the waypoints span,
+e.g. BOX_LIMIT) and then picks the fastest speed along it that respects:
+
+    MAX_VELOCITY        the mission's cruise speed
+    MAX_ACCELERATION    along the path, when speeding up and slowing down
+    MAX_ACCELERATION    across the path, v**2 * curvature, so corners are slowed down for
+
+The speed profile is computed on SAMPLES_PER_SEGMENT points of every
+segment with one forward and one backward pass, which gives constant
+acceleration between samples. The result is the planned position and
+velocity against time, and the planned duration of the whole flight.
+
+fly_trajectory() follows it from the state estimate, one setpoint per
+sample: the planned velocity plus a correction towards the planned
+position. Like fly_to(), it assumes the drone has not yawed since takeoff.
+"""
+
+import math
+import time
+from threading import Event
+from typing import List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from state_estimate import State, StateEstimate
+
+MAX_VELOCITY = 0.5          # m/s
+MAX_ACCELERATION = 2.0      # m/s^2, both along and across the path, well within a Crazyflie 2.x
+SAMPLES_PER_SEGMENT = 16    # Speed profile points per spline segment
+POSITION_GAIN = 1.5         # 1/s, correction towards the planned position
+ARRIVAL_TOLERANCE = 0.05    # Meters from the last waypoint at which the flight is over
+SETTLE_TIMEOUT = 3.0        # Seconds allowed after the planned duration to reach the last waypoint
+WAIT_SLICE = 0.02
+
+Point = Tuple[float, float]
+
+
+class Trajectory(NamedTuple):
+    """Planned flight, sampled along the spline."""
+    t: np.ndarray               # (N,) seconds since the start
+    position: np.ndarray        # (N, 2) meters
+    velocity: np.ndarray        # (N, 2) m/s
+    waypoints: np.ndarray       # (M, 2) the points the spline passes through
+
+    @property
+    def duration(self) -> float:
+        return float(self.t[-1])
+
+    @property
+    def length(self) -> float:
+        return float(np.hypot(*np.diff(self.position, axis=0).T).sum())
+
+    def sample(self, t: float) -> Tuple[float, float, float, float]:
+        """Planned x, y, vx, vy at t seconds, held at the end after the duration."""
+        times = self.t
+        if t >= times[-1]:
+            x, y = self.position[-1]
+            return x, y, 0.0, 0.0
+        i = max(0, int(np.searchsorted(times, t, side='right')) - 1)
+        f = (t - times[i]) / (times[i + 1] - times[i])
+        (x0, y0), (x1, y1) = self.position[i], self.position[i + 1]
+        (vx0, vy0), (vx1, vy1) = self.velocity[i], self.velocity[i + 1]
+        return x0 + (x1 - x0) * f, y0 + (y1 - y0) * f, vx0 + (vx1 - vx0) * f, vy0 + (vy1 - vy0) * f
+
+
+class TrajectoryReport(NamedTuple):
+    predicted: float        # planned seconds
+    achieved: float         # seconds until the last waypoint was reached
+    reached: bool
+    max_error: float        # largest distance from the planned position, meters
+    max_miss: float         # largest distance by which a waypoint was passed, meters
+    length: float           # planned path length, meters
+    planning_ms: float
+
+    def print_report(self) -> None:
+        outcome = 'reached' if self.reached else 'NOT reached'
+        print(f"Trajectory: {self.length:.2f}m, predicted {self.predicted:.2f}s, achieved {self.achieved:.2f}s "
+              f"({outcome}), planned in {self.planning_ms:.1f}ms")
+        print(f"Trajectory: max tracking error {self.max_error * 100:.1f}cm, "
+              f"waypoints passed within {self.max_miss * 100:.1f}cm")
+
+
+def _deduplicate(points: np.ndarray) -> np.ndarray:
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = np.hypot(*np.diff(points, axis=0).T) > 1e-6
+    return points[keep]
+
+
+def plan_trajectory(waypoints: Sequence[Point], max_velocity: float = MAX_VELOCITY,
+                    max_acceleration: float = MAX_ACCELERATION) -> Trajectory:
+    """
+    Fit a trajectory that starts and ends at rest and passes through every waypoint.
+
+    Args:
+        waypoints (Sequence[Point]): x, y points in meters, the first one is the start.
+        max_velocity (float): speed limit in m/s.
+        max_acceleration (float): limit in m/s^2 along and across the path.
+
+    Returns:
+        Trajectory: positions and velocities against time.
+    """
+    points = _deduplicate(np.asarray(waypoints, dtype=float).reshape(-1, 2))
+    if len(points) < 2:
+        p = points[:1] if len(points) else np.zeros((1, 2))
+        return Trajectory(np.zeros(1), p.copy(), np.zeros((1, 2)), p.copy())
+
+    # Shape-preserving (PCHIP) tangents, d position / d knot over chord-length knots, per axis:
+    # zero where an axis turns around, else the weighted harmonic mean of the neighbouring slopes
+    h = np.hypot(*np.diff(points, axis=0).T)
+    slopes = np.diff(points, axis=0) / h[:, None]
+    tangents = np.empty_like(points)
+    tangents[0], tangents[-1] = slopes[0], slopes[-1]
+    before, after = slopes[:-1], slopes[1:]
+    w1 = (2 * h[1:] + h[:-1])[:, None]
+    w2 = (h[1:] + 2 * h[:-1])[:, None]
+    monotone = before * after > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        harmonic = (w1 + w2) / (w1 / before + w2 / after)
+    tangents[1:-1] = np.where(monotone, harmonic, 0.0)
+
+    # Every segment sampled at once: (segments, samples, 2)
+    s = np.linspace(0.0, 1.0, SAMPLES_PER_SEGMENT, endpoint=False)[None, :, None]
+    p0, p1 = points[:-1, None, :], points[1:, None, :]
+    m0, m1 = (tangents[:-1] * h[:, None])[:, None, :], (tangents[1:] * h[:, None])[:, None, :]
+    s2, s3 = s * s, s * s * s
+    position = (2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * m0 + (-2 * s3 + 3 * s2) * p1 + (s3 - s2) * m1
+    d1 = (6 * s2 - 6 * s) * p0 + (3 * s2 - 4 * s + 1) * m0 + (-6 * s2 + 6 * s) * p1 + (3 * s2 - 2 * s) * m1
+    d2 = (12 * s - 6) * p0 + (6 * s - 4) * m0 + (-12 * s + 6) * p1 + (6 * s - 2) * m1
+    position = np.concatenate((position.reshape(-1, 2), points[-1:]))
+    d1 = np.concatenate((d1.reshape(-1, 2), (tangents[-1] * h[-1])[None]))
+    d2 = np.concatenate((d2.reshape(-1, 2), np.zeros((1, 2))))
+
+    # Speed limit from the curvature, then one forward and one backward acceleration pass
+    speed = np.hypot(d1[:, 0], d1[:, 1])
+    cross = np.abs(d1[:, 0] * d2[:, 1] - d1[:, 1] * d2[:, 0])
+    curvature = np.divide(cross, speed ** 3, out=np.zeros_like(speed), where=speed > 1e-9)
+    limit = np.minimum(max_velocity, np.sqrt(max_acceleration / np.maximum(curvature, 1e-9)))
+    limit[speed <= 1e-9] = 0.0  # Both axes turn around: a cusp the drone has to stop at
+    limit[0] = limit[-1] = 0.0
+    ds = np.hypot(*np.diff(position, axis=0).T)
+    two_a_ds = (2 * max_acceleration * ds).tolist()
+    v = limit.tolist()
+    for i in range(len(v) - 1):
+        v[i + 1] = min(v[i + 1], math.sqrt(v[i] * v[i] + two_a_ds[i]))
+    for i in range(len(v) - 2, -1, -1):
+        v[i] = min(v[i], math.sqrt(v[i + 1] * v[i + 1] + two_a_ds[i]))
+    v = np.array(v)
+
+    # Constant acceleration between samples: dt = 2 ds / (v0 + v1)
+    mean_v = v[:-1] + v[1:]
+    dt = np.divide(2 * ds, mean_v, out=np.zeros_like(ds), where=mean_v > 0)
+    t = np.concatenate(([0.0], np.cumsum(dt)))
+    direction = np.divide(d1, speed[:, None], out=np.zeros_like(d1), where=speed[:, None] > 1e-9)
+    return Trajectory(t, position, direction * v[:, None], points)
+
+
+def fly_trajectory(motion_commander, estimate: StateEstimate, waypoints: Sequence[Point],
+                   max_velocity: float = MAX_VELOCITY, max_acceleration: float = MAX_ACCELERATION,
+                   tolerance: float = ARRIVAL_TOLERANCE) -> TrajectoryReport:
+    """
+    Fly through waypoints in one continuous motion, starting from the current position.
+
+    Args:
+        motion_commander (MotionCommander): commander of the flying drone.
+        estimate (StateEstimate): started state estimate stream.
+        waypoints (Sequence[Point]): x, y points in meters to pass through, in order.
+        max_velocity (float): speed limit in m/s.
+        max_acceleration (float): acceleration limit in m/s^2.
+        tolerance (float): distance to the last waypoint at which the flight is over.
+
+    Returns:
+        TrajectoryReport: planned against flown time and the tracking errors.
+    """
+    while estimate.latest is None:
+        time.sleep(WAIT_SLICE)
+    begin = time.perf_counter()
+    start = estimate.latest
+    trajectory = plan_trajectory([(start.x, start.y)] + list(waypoints), max_velocity, max_acceleration)
+    planning_ms = (time.perf_counter() - begin) * 1000
+
+    done = Event()
+    flown: List[Tuple[float, float]] = []
+    errors: List[float] = []
+    goal_x, goal_y = trajectory.position[-1]
+    t0 = time.perf_counter()    # Same clock as the state timestamps
+    finished_at = [None]
+    speed_cap = max_velocity * 1.5  # Room for the position correction on top of the planned velocity
+
+    def steer(state: State) -> None:
+        if done.is_set():
+            return
+        elapsed = state.timestamp - t0
+        x, y, vx, vy = trajectory.sample(elapsed)
+        flown.append((state.x, state.y))
+        errors.append(math.hypot(x - state.x, y - state.y))
+        if elapsed >= trajectory.duration and math.hypot(goal_x - state.x, goal_y - state.y) <= tolerance:
+            finished_at[0] = elapsed
+            done.set()
+            motion_commander.start_linear_motion(0.0, 0.0, 0.0)
+            return
+        vx += POSITION_GAIN * (x - state.x)
+        vy += POSITION_GAIN * (y - state.y)
+        speed = math.hypot(vx, vy)
+        if speed > speed_cap:
+            vx, vy = vx / speed * speed_cap, vy / speed * speed_cap
+        motion_commander.start_linear_motion(vx, vy, 0.0)
+
+    estimate.add_callback(steer)
+    try:
+        while not done.is_set() and time.perf_counter() - t0 < trajectory.duration + SETTLE_TIMEOUT:
+            time.sleep(WAIT_SLICE)
+    finally:
+        estimate.remove_callback(steer)
+        if not done.is_set():
+            motion_commander.start_linear_motion(0.0, 0.0, 0.0)
+
+    reached = finished_at[0] is not None
+    achieved = finished_at[0] if reached else time.perf_counter() - t0
+    miss = 0.0
+    if flown:
+        path = np.asarray(flown)
+        targets = trajectory.waypoints[1:]
+        miss = float(np.sqrt(((path[:, None, :] - targets[None, :, :]) ** 2).sum(axis=2)).min(axis=0).max())
+    return TrajectoryReport(trajectory.duration, achieved, reached, max(errors, default=0.0), miss,
+                            trajectory.length, planning_ms)